@@ -0,0 +1,597 @@
+import threading
+import socket
+import time
+import json
+import queue
+import numpy as np
+import cv2
+
+from StereoStreamer import (LEGACY_HEADER, EXT_HEADER, EXT_MAGIC, CODEC_JPEG,
+                            FLAG_KEYFRAME, FLAG_TRACE, FLAG_DELTA, TRACE_BLOCK)
+from latency_trace import LatencyTracer, RECEIVER_STAGES
+from video_codec import VideoDecoder
+from depth_codec import decode_depth, CODEC_DEPTH
+
+try:
+    # pip install PyTurboJPEG
+    from turbojpeg import TurboJPEG
+    _USE_TURBOJPEG = True
+except ImportError:
+    TurboJPEG = None
+    _USE_TURBOJPEG = False
+
+MAX_SUBSTREAMS = 256  # SubIdx/SubCount는 1바이트
+_FRAME_ID_MASK = 0xFFFFFFFF
+
+
+def _is_newer(a, b):
+    """32bit FrameID 순환(wrap-around)을 고려하여 a가 b보다 최신인지 판단"""
+    return a != b and ((a - b) & _FRAME_ID_MASK) < 0x80000000
+
+
+class _FrameSlot:
+    """
+    프레임 1개의 재조립 슬롯 (미리 할당된 버퍼 + 조각 수신 비트맵)
+
+    서브스트림마다 첫 조각이 도착할 때 TotalPackets 만큼의 조각/바이트 영역을 순서대로 예약하므로
+    패킷 수신 중에는 메모리 할당이 일어나지 않습니다.
+    """
+    def __init__(self, max_frame_bytes, max_fragments):
+        self.buf = bytearray(max_frame_bytes)
+        self.mv = memoryview(self.buf)
+        self.received = bytearray(max_fragments)  # 조각 수신 비트맵 (0/1)
+        self.frag_len = [0] * max_fragments
+        self.sub_frag_base = [-1] * MAX_SUBSTREAMS
+        self.sub_byte_base = [0] * MAX_SUBSTREAMS
+        self.sub_total = [0] * MAX_SUBSTREAMS
+        self.sub_received = [0] * MAX_SUBSTREAMS
+        self.sub_payload = [0] * MAX_SUBSTREAMS
+        self.sub_region = [(0, 0, 0, 0)] * MAX_SUBSTREAMS
+        self.sub_codec = [CODEC_JPEG] * MAX_SUBSTREAMS
+        self.sub_flags = [0] * MAX_SUBSTREAMS
+        self.frame_id = None
+        self.sub_count = 0
+        self.subs_done = 0
+        self.frags_used = 0
+        self.bytes_used = 0
+        self.frags_received = 0
+        self.t_first = 0.0
+        self.t_last = 0.0
+        self.trace = None          # [capture_ts, 첫 encoded_ts, 마지막 encoded_ts] — FLAG_TRACE 패킷일 때
+        self.wall_first = 0.0      # 첫 조각 도착 벽시계 시각 (trace용)
+        self._zeros = bytes(max_fragments)
+
+    def reset(self, frame_id, now):
+        n = self.frags_used
+        if n:
+            self.received[:n] = self._zeros[:n]
+        for i in range(self.sub_count):
+            self.sub_frag_base[i] = -1
+            self.sub_received[i] = 0
+        self.frame_id = frame_id
+        self.sub_count = 0
+        self.subs_done = 0
+        self.frags_used = 0
+        self.bytes_used = 0
+        self.frags_received = 0
+        self.t_first = now
+        self.t_last = now
+        self.trace = None
+
+    def release(self):
+        self.reset(None, 0.0)
+
+    @property
+    def complete(self):
+        return self.sub_count > 0 and self.subs_done == self.sub_count
+
+    def expected_fragments(self):
+        """헤더로 알려진 조각 수 (조각이 하나도 도착하지 않은 서브스트림은 알 수 없음)"""
+        return self.frags_used
+
+    def substream_bytes(self, sub_idx):
+        base = self.sub_byte_base[sub_idx]
+        total = self.sub_total[sub_idx]
+        last = self.sub_frag_base[sub_idx] + total - 1
+        n = (total - 1) * self.sub_payload[sub_idx] + self.frag_len[last]
+        return bytes(self.mv[base:base + n])
+
+
+class UdpImageReceiver:
+    """
+    UdpImageSender 스트림 수신/재조립기 (loopback 테스트 상대 및 데스크톱 모니터링용)
+
+    - legacy 8바이트 헤더와 확장 헤더("SX", 서브스트림) 모두 지원
+    - 미리 할당된 프레임 슬롯 + 조각 비트맵으로 재조립, 순서가 뒤바뀐 조각 허용
+    - 더 최신 프레임이 완성되면 그보다 오래된 미완성 프레임은 제거(evict)하고 손실로 집계
+    - decode=True면 별도 스레드에서 JPEG 디코딩 (TurboJPEG 있으면 사용) 후 get()으로 최신 프레임 제공
+    - feedback_addr를 주면 손실 보고(JSON)를 주기적으로 송신 → UdpImageSender(feedback_port)의 adaptive 제어에 사용
+      (lost = 미완성으로 제거된 프레임의 빠진 조각 + FrameID 공백으로 통째로 사라진 프레임 × 평균 조각 수)
+    - H.264/HEVC 스트림은 PyAV로 순서대로 디코딩하며, FrameID가 끊기면 keyframe까지 기다리고
+      feedback_addr로 {"keyframe": true}를 보내 즉시 IDR을 요청
+    - tiled 모드(FLAG_DELTA)는 이전 프레임 위에 변경 타일만 덮어쓰며, FrameID가 끊기면 전체 갱신을 요청
+
+    - trace=True면 FLAG_TRACE 패킷의 캡처/인코딩 시각으로 캡처→재조립 지연을 self.tracer에 기록
+      (벽시계 기준이므로 같은 PC의 loopback 또는 시간 동기화된 PC 간에서만 의미 있음)
+
+    max_payload는 송신측(UdpImageSender.max_payload)과 같아야 합니다.
+    """
+    def __init__(self, port, bind_ip="0.0.0.0", max_payload=1400, num_slots=8,
+                 max_frame_bytes=4 * 1024 * 1024, max_age=0.5, decode=True,
+                 feedback_addr=None, feedback_interval=0.5, history=512, resync_window=120,
+                 trace=False):
+        self.port = port
+        self.bind_ip = bind_ip
+        self.max_payload = max_payload
+        self.max_age = max_age
+        self.decode = decode
+        self.feedback_addr = feedback_addr
+        self.feedback_interval = feedback_interval
+        self.resync_window = resync_window  # 이보다 더 과거의 FrameID가 오면 송신측 재시작으로 간주
+
+        self._legacy_payload = max_payload
+        self._ext_payload = max_payload - (EXT_HEADER.size - LEGACY_HEADER.size)
+        max_fragments = max_frame_bytes // self._ext_payload + MAX_SUBSTREAMS
+        self._slots = [_FrameSlot(max_frame_bytes, max_fragments) for _ in range(num_slots)]
+        self._active = {}  # frame_id -> _FrameSlot
+        self._rx_buf = bytearray(65536)
+        self._rx_mv = memoryview(self._rx_buf)
+
+        self.sock: socket.socket | None = None
+        self._stop_event = threading.Event()
+        self._rx_thread = None
+        self._decode_thread = None
+        self._decode_queue = queue.Queue(maxsize=1)
+        self._lock = threading.Lock()
+        self._latest = None   # (frame_id, image, info)
+        self._latest_raw = None
+        self._video_decoders = {}   # codec id -> VideoDecoder
+        self._last_video_fid = None
+        self._canvas = None          # 서브스트림 합성 캔버스 (delta 프레임은 이 위에 덮어씀)
+        self._last_compose_fid = None
+        self.jpeg = TurboJPEG() if (_USE_TURBOJPEG and decode) else None
+        self.tracer = LatencyTracer(RECEIVER_STAGES, history) if trace else None
+
+        # 통계
+        self._history = history
+        self._hist_latency = np.zeros(history, dtype=np.float64)
+        self._hist_completeness = np.zeros(history, dtype=np.float64)
+        self._hist_n = 0
+        self.packets = 0
+        self.bytes = 0
+        self.malformed = 0
+        self.duplicates = 0
+        self.late_packets = 0
+        self.frames_complete = 0
+        self.frames_late = 0
+        self.frames_evicted = 0
+        self.frames_missing = 0
+        self.frames_decoded = 0
+        self.decode_errors = 0
+        self.fragments_received = 0
+        self.fragments_lost = 0
+        self._last_delivered = None
+        self._highest_seen = None
+        self._fps_t0 = time.monotonic()
+        self._fps_count = 0
+        self._fps = 0.0
+        self._fb_received = 0
+        self._fb_lost = 0
+        self._fb_missing = 0
+        self._fb_t0 = time.monotonic()
+        self._frags_per_frame = 1.0  # 프레임당 조각 수 이동 평균 (통째로 사라진 프레임의 손실 조각 수 추정용)
+
+    # ------------------------------------------------------------------
+    def open(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        self.sock.bind((self.bind_ip, self.port))
+        self.sock.settimeout(0.1)
+        self.port = self.sock.getsockname()[1]
+        self._stop_event.clear()
+        self._rx_thread = threading.Thread(target=self._receiver_loop, daemon=True)
+        self._rx_thread.start()
+        if self.decode:
+            self._decode_thread = threading.Thread(target=self._decode_loop, daemon=True)
+            self._decode_thread.start()
+
+    def close(self):
+        self._stop_event.set()
+        for t in (self._rx_thread, self._decode_thread):
+            if t is not None and t.is_alive():
+                t.join(timeout=1.0)
+        self._rx_thread = None
+        self._decode_thread = None
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+
+    def get(self):
+        """가장 최근에 디코딩된 프레임 (frame_id, image, info) 반환 (없으면 None)"""
+        with self._lock:
+            return self._latest
+
+    def get_raw(self):
+        """가장 최근에 완성된 프레임의 인코딩된 서브스트림 목록 (frame_id, [(region, codec, flags, bytes)], info)"""
+        with self._lock:
+            return self._latest_raw
+
+    # ------------------------------------------------------------------
+    def _receiver_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                n = self.sock.recv_into(self._rx_buf)
+            except socket.timeout:
+                self._evict_stale(time.monotonic())
+                continue
+            except OSError:
+                break
+            now = time.monotonic()
+            self.handle_packet(self._rx_mv, n, now)
+            self._evict_stale(now)
+            if self.feedback_addr is not None and now - self._fb_t0 >= self.feedback_interval:
+                self._send_feedback(now)
+
+    def handle_packet(self, mv, n, now):
+        """패킷 1개 처리 (mv[:n]). 소켓 없이 직접 호출하여 재조립 로직만 사용할 수도 있음"""
+        self.packets += 1
+        self.bytes += n
+        if n >= EXT_HEADER.size and mv[:2] == EXT_MAGIC:
+            # 주의: legacy FrameID 상위 2바이트가 "SX"(0x5358)가 되는 일은 14억 프레임 이후에만 발생
+            (_, flags, codec, fid, idx, total, sub_idx, sub_count,
+             x, y, w, h) = EXT_HEADER.unpack_from(mv, 0)
+            hdr = EXT_HEADER.size
+            payload = self._ext_payload
+            region = (x, y, w, h)
+            if flags & FLAG_TRACE:
+                if n < hdr + TRACE_BLOCK.size:
+                    self.malformed += 1
+                    return
+                trace = TRACE_BLOCK.unpack_from(mv, hdr)
+                hdr += TRACE_BLOCK.size
+                payload -= TRACE_BLOCK.size
+        elif n >= LEGACY_HEADER.size:
+            fid, idx, total = LEGACY_HEADER.unpack_from(mv, 0)
+            flags, codec, sub_idx, sub_count = 0, CODEC_JPEG, 0, 1
+            hdr = LEGACY_HEADER.size
+            payload = self._legacy_payload
+            region = (0, 0, 0, 0)
+        else:
+            self.malformed += 1
+            return
+        if total == 0 or idx >= total or sub_count == 0 or sub_idx >= sub_count or n - hdr > payload:
+            self.malformed += 1
+            return
+
+        slot = self._active.get(fid)
+        if slot is None:
+            if self._last_delivered is not None and not _is_newer(fid, self._last_delivered):
+                if ((self._last_delivered - fid) & _FRAME_ID_MASK) <= self.resync_window:
+                    self.late_packets += 1
+                    return
+                # FrameID가 크게 뒤로 돌아감 → 송신측 재시작으로 보고 재동기화
+                self._resync()
+            slot = self._acquire_slot(fid, now)
+        slot.t_last = now
+        slot.sub_count = sub_count
+        if flags & FLAG_TRACE and self.tracer is not None:
+            if slot.trace is None:
+                # [capture_ts, 첫 패킷의 encoded_ts, 서브스트림 중 가장 늦은 encoded_ts]
+                slot.trace = [trace[0], trace[2], trace[2]]
+                slot.wall_first = time.time()
+            elif trace[2] > slot.trace[2]:
+                slot.trace[2] = trace[2]
+
+        base = slot.sub_frag_base[sub_idx]
+        if base < 0:
+            # 서브스트림 첫 조각: 조각/바이트 영역 예약
+            need_bytes = total * payload
+            if (slot.frags_used + total > len(slot.received)
+                    or slot.bytes_used + need_bytes > len(slot.buf)):
+                self.malformed += 1
+                return
+            base = slot.frags_used
+            slot.sub_frag_base[sub_idx] = base
+            slot.sub_byte_base[sub_idx] = slot.bytes_used
+            slot.sub_total[sub_idx] = total
+            slot.sub_payload[sub_idx] = payload
+            slot.sub_region[sub_idx] = region
+            slot.sub_codec[sub_idx] = codec
+            slot.sub_flags[sub_idx] = flags
+            slot.frags_used += total
+            slot.bytes_used += need_bytes
+        elif total != slot.sub_total[sub_idx]:
+            self.malformed += 1
+            return
+
+        frag = base + idx
+        if slot.received[frag]:
+            self.duplicates += 1
+            return
+        slot.received[frag] = 1
+        size = n - hdr
+        slot.frag_len[frag] = size
+        off = slot.sub_byte_base[sub_idx] + idx * payload
+        slot.mv[off:off + size] = mv[hdr:n]
+        slot.frags_received += 1
+        self.fragments_received += 1
+        self._fb_received += 1
+
+        slot.sub_received[sub_idx] += 1
+        if slot.sub_received[sub_idx] == total:
+            slot.subs_done += 1
+            if slot.complete:
+                self._complete(slot, now)
+
+    def _resync(self):
+        for slot in list(self._active.values()):
+            self._evict(slot)
+        self._last_delivered = None
+        self._highest_seen = None
+
+    def _acquire_slot(self, fid, now):
+        if self._highest_seen is None:
+            self._highest_seen = fid
+        elif _is_newer(fid, self._highest_seen):
+            gap = ((fid - self._highest_seen) & _FRAME_ID_MASK) - 1
+            self.frames_missing += gap
+            self._fb_missing += gap
+            self._highest_seen = fid
+        for slot in self._slots:
+            if slot.frame_id is None:
+                break
+        else:
+            # 빈 슬롯이 없으면 가장 오래된 프레임 제거
+            oldest = min(self._active.values(), key=lambda s: s.t_first)
+            self._evict(oldest)
+            slot = oldest
+        slot.reset(fid, now)
+        self._active[fid] = slot
+        return slot
+
+    def _record(self, latency_s, completeness):
+        i = self._hist_n % self._history
+        self._hist_latency[i] = latency_s * 1000.0
+        self._hist_completeness[i] = completeness
+        self._hist_n += 1
+
+    def _evict(self, slot):
+        expected = slot.expected_fragments()
+        lost = expected - slot.frags_received
+        self.frames_evicted += 1
+        self.fragments_lost += lost
+        self._fb_lost += lost
+        if expected:
+            self._frags_per_frame += 0.1 * (expected - self._frags_per_frame)
+        self._record(slot.t_last - slot.t_first, slot.frags_received / expected if expected else 0.0)
+        del self._active[slot.frame_id]
+        slot.release()
+
+    def _evict_stale(self, now):
+        if not self._active:
+            return
+        for slot in [s for s in self._active.values() if now - s.t_first > self.max_age]:
+            self._evict(slot)
+
+    def _complete(self, slot, now):
+        fid = slot.frame_id
+        latency = now - slot.t_first
+        self._frags_per_frame += 0.1 * (slot.frags_received - self._frags_per_frame)
+        if self._last_delivered is not None and not _is_newer(fid, self._last_delivered):
+            # 더 최신 프레임이 이미 전달됨 → 늦게 완성된 프레임은 버림
+            self.frames_late += 1
+        else:
+            self.frames_complete += 1
+            self._record(latency, 1.0)
+            if slot.trace is not None:
+                capture_ts, first_encoded_ts, last_encoded_ts = slot.trace
+                wall_now = time.time()
+                self.tracer.record((last_encoded_ts - capture_ts, slot.wall_first - first_encoded_ts,
+                                    latency, wall_now - capture_ts))
+            self._last_delivered = fid
+            subs = [(slot.sub_region[i], slot.sub_codec[i], slot.sub_flags[i], slot.substream_bytes(i))
+                    for i in range(slot.sub_count)]
+            info = {"frame_id": fid, "reassembly_ms": latency * 1000.0,
+                    "fragments": slot.frags_received, "t_complete": now}
+            with self._lock:
+                self._latest_raw = (fid, subs, info)
+            if self.decode:
+                try:
+                    self._decode_queue.put_nowait((fid, subs, info))
+                except queue.Full:
+                    # (인터프레임 코덱은 디코딩 스레드가 FrameID 불연속을 보고 keyframe을 기다림)
+                    # 디코딩이 밀리면 가장 최신 프레임만 유지
+                    try:
+                        self._decode_queue.get_nowait()
+                    except queue.Empty:
+                        pass
+                    self._decode_queue.put_nowait((fid, subs, info))
+            self._fps_count += 1
+            if now - self._fps_t0 >= 1.0:
+                self._fps = self._fps_count / (now - self._fps_t0)
+                self._fps_t0 = now
+                self._fps_count = 0
+        del self._active[fid]
+        slot.release()
+        # 완성된 프레임보다 오래된 미완성 프레임은 더 이상 의미가 없으므로 제거
+        for old in [s for s in self._active.values() if not _is_newer(s.frame_id, fid)]:
+            self._evict(old)
+
+    def _send_feedback(self, now):
+        # 조각이 하나도 오지 않은 프레임(FrameID 공백)은 평균 조각 수만큼 잃은 것으로 계산
+        lost = self._fb_lost + int(round(self._fb_missing * self._frags_per_frame))
+        report = {"received": self._fb_received, "lost": lost, "frames_missing": self._fb_missing}
+        self._fb_received = 0
+        self._fb_lost = 0
+        self._fb_missing = 0
+        self._fb_t0 = now
+        try:
+            self.sock.sendto(json.dumps(report).encode("utf-8"), self.feedback_addr)
+        except OSError:
+            pass
+
+    # ------------------------------------------------------------------
+    def decode_jpeg(self, data):
+        if self.jpeg is not None:
+            return self.jpeg.decode(data)
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+
+    def _decode_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                fid, subs, info = self._decode_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            t0 = time.perf_counter()
+            try:
+                img = self._compose(fid, subs)
+            except Exception:
+                img = None
+            if img is None:
+                self.decode_errors += 1
+                continue
+            info["decode_ms"] = (time.perf_counter() - t0) * 1000.0
+            self.frames_decoded += 1
+            with self._lock:
+                self._latest = (fid, img, info)
+
+    def _request_keyframe(self):
+        if self.feedback_addr is None or self.sock is None:
+            return
+        try:
+            self.sock.sendto(b'{"keyframe": true}', self.feedback_addr)
+        except OSError:
+            pass
+
+    def _decode_video(self, fid, codec, flags, data):
+        decoder = self._video_decoders.get(codec)
+        if decoder is None:
+            decoder = VideoDecoder(codec)
+            self._video_decoders[codec] = decoder
+        last = self._last_video_fid
+        self._last_video_fid = fid
+        if last is not None and fid != ((last + 1) & _FRAME_ID_MASK) and not decoder.waiting_keyframe:
+            # 참조 프레임 손실 → 다음 keyframe까지 대기
+            decoder.mark_loss()
+            self._request_keyframe()
+        return decoder.decode(data, bool(flags & FLAG_KEYFRAME))
+
+    def _compose(self, fid, subs):
+        """서브스트림을 디코딩하여 하나의 프레임으로 합성"""
+        if len(subs) == 1 and not subs[0][2] & FLAG_DELTA:
+            (x, y, w, h), codec, flags, data = subs[0]
+            if codec == CODEC_DEPTH:
+                return decode_depth(data)
+            if codec != CODEC_JPEG:
+                return self._decode_video(fid, codec, flags, data)
+            dec = self.decode_jpeg(data)
+            if w == 0 or dec is None or (x, y, w, h) == (0, 0, dec.shape[1], dec.shape[0]):
+                return dec
+
+        width = max(r[0] + r[2] for r, _, _, _ in subs)
+        height = max(r[1] + r[3] for r, _, _, _ in subs)
+        delta = bool(subs[0][2] & FLAG_DELTA)
+        last = self._last_compose_fid
+        self._last_compose_fid = fid
+        if delta and last is not None and fid != ((last + 1) & _FRAME_ID_MASK):
+            # 중간 delta 프레임 손실 → 일부 타일이 오래된 상태이므로 전체 갱신 요청
+            self._request_keyframe()
+        canvas = self._canvas
+        if canvas is not None and (canvas.shape[0] < height or canvas.shape[1] < width
+                                   or (not delta and canvas.shape[:2] != (height, width))):
+            canvas = None
+        if canvas is None and delta:
+            # 기준 프레임 없이 delta만 도착 → 전체 갱신 전까지 표시하지 않음
+            self._request_keyframe()
+            return None
+        for (x, y, w, h), codec, flags, data in subs:
+            if codec != CODEC_JPEG:
+                return None
+            dec = self.decode_jpeg(data)
+            if dec is None:
+                return None
+            if canvas is None or canvas.shape[2:] != dec.shape[2:]:
+                canvas = np.zeros((height, width) + dec.shape[2:], dtype=dec.dtype)
+            if dec.shape[:2] != (h, w):
+                dec = cv2.resize(dec, (w, h), interpolation=cv2.INTER_LINEAR)
+            canvas[y:y + h, x:x + w] = dec
+        self._canvas = canvas
+        # canvas는 다음 프레임 합성에 재사용되므로 복사본을 전달
+        return canvas.copy()
+
+    # ------------------------------------------------------------------
+    def stats(self):
+        n = min(self._hist_n, self._history)
+        lat = self._hist_latency[:n]
+        comp = self._hist_completeness[:n]
+        expected = self.fragments_received + self.fragments_lost
+        return {
+            "packets": self.packets,
+            "bytes": self.bytes,
+            "malformed": self.malformed,
+            "duplicates": self.duplicates,
+            "late_packets": self.late_packets,
+            "frames_complete": self.frames_complete,
+            "frames_late": self.frames_late,
+            "frames_evicted": self.frames_evicted,
+            "frames_missing": self.frames_missing,
+            "frames_decoded": self.frames_decoded,
+            "decode_errors": self.decode_errors,
+            "fps": self._fps,
+            "fragment_loss": (self.fragments_lost / expected) if expected else 0.0,
+            "completeness_mean": float(comp.mean()) if n else 0.0,
+            "reassembly_ms_p50": float(np.percentile(lat, 50)) if n else 0.0,
+            "reassembly_ms_p95": float(np.percentile(lat, 95)) if n else 0.0,
+            "reassembly_ms_max": float(lat.max()) if n else 0.0,
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="UdpImageSender 스트림 수신/모니터링")
+    parser.add_argument("--port", type=int, default=9003, help="UDP 수신 포트")
+    parser.add_argument("--max-payload", type=int, default=1400, help="송신측 max_payload")
+    parser.add_argument("--loopback", action="store_true", help="로컬 UdpImageSender로 합성 영상 송신 테스트")
+    parser.add_argument("--show", action="store_true", help="cv2.imshow로 표시")
+    args = parser.parse_args()
+
+    receiver = UdpImageReceiver(args.port, max_payload=args.max_payload)
+    receiver.open()
+    print(f"[INFO] 수신 대기 중: UDP {receiver.port}")
+
+    sender = None
+    if args.loopback:
+        from StereoStreamer import UdpImageSender
+        sender = UdpImageSender("127.0.0.1", receiver.port, 1280, 480, max_payload=args.max_payload)
+        sender.open()
+        sender.connect()
+        xx, yy = np.meshgrid(np.arange(1280), np.arange(480))
+
+    try:
+        t_print = time.monotonic()
+        k = 0
+        while True:
+            if sender is not None:
+                frame = ((xx + 8 * k) % 256).astype(np.uint8)
+                sender.send_image(cv2.merge([frame, (yy % 256).astype(np.uint8), frame]))
+                k += 1
+            if args.show:
+                latest = receiver.get()
+                if latest is not None:
+                    cv2.imshow("StereoReceiver", latest[1])
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+            time.sleep(1 / 60)
+            if time.monotonic() - t_print >= 1.0:
+                t_print = time.monotonic()
+                st = receiver.stats()
+                print(f"[통계] fps: {st['fps']:.1f} | 완성 {st['frames_complete']} / 제거 {st['frames_evicted']}"
+                      f" | 손실률 {st['fragment_loss'] * 100:.2f}% | 재조립 p50 {st['reassembly_ms_p50']:.2f} ms"
+                      f" p95 {st['reassembly_ms_p95']:.2f} ms")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if sender is not None:
+            sender.close()
+        receiver.close()
@@ -4,9 +4,17 @@ import struct
 import time
 import json  # 위로 이동
 import queue # Deque 대신 Thread-safe Queue 사용
+import ipaddress
+from concurrent.futures import Future
 import numpy as np
 import cv2
 
+from latency_trace import LatencyTracer, SENDER_STAGES
+from video_codec import VideoEncoder
+from depth_codec import DepthEncoder, CODEC_DEPTH
+from control_channel import JsonLineClient
+import stream_metrics
+
 try:
     # pip install PyTurboJPEG
     from turbojpeg import TurboJPEG, TJPF_GRAY, TJSAMP_GRAY, TJPF_BGR
@@ -16,10 +24,352 @@ except ImportError:
     _USE_TURBOJPEG = False
     print("[INFO] TurboJPEG 모듈이 없어 OpenCV(imencode)로 fallback합니다.")
 
+# 기본(legacy) 헤더: FrameID(4) + PacketIdx(2) + TotalPackets(2) = 8 bytes
+LEGACY_HEADER = struct.Struct('!IHH')
+
+# 확장 헤더 (한 프레임을 여러 서브스트림으로 나눠 보내는 모드용) = 22 bytes
+#   Magic(2) "SX" + Flags(1) + Codec(1) + FrameID(4) + PacketIdx(2) + TotalPackets(2)
+#   + SubIdx(1) + SubCount(1) + X(2) + Y(2) + W(2) + H(2)
+#   - PacketIdx/TotalPackets는 서브스트림 내부 기준
+#   - X/Y/W/H: 서브스트림이 덮는 원본 프레임 영역 (디코딩 후 W×H로 리사이즈하여 배치)
+EXT_MAGIC = b"SX"
+EXT_HEADER = struct.Struct('!2sBBIHHBBHHHH')
+CODEC_JPEG = 0
+FLAG_KEYFRAME = 0x01
+# FLAG_TRACE: 확장 헤더 뒤에 TRACE_BLOCK(캡처/큐 입력/인코딩 완료 시각, time.time() 기준)이 붙음 = 24 bytes
+FLAG_TRACE = 0x02
+TRACE_BLOCK = struct.Struct('!ddd')
+# FLAG_DELTA: 프레임 일부 영역(변경된 타일)만 포함 — 나머지는 수신측이 이전 프레임 내용을 유지
+FLAG_DELTA = 0x04
+
+class AdaptiveStreamController:
+    """
+    목표 fps / 비트레이트를 유지하도록 JPEG 품질과 해상도 배율을 조절하는 폐루프 제어기
+
+    - 매 프레임 인코딩 시간, 프레임 바이트 수, 큐 드랍 수를 누적하고
+    - window 초마다 한 번씩 평가하여 품질(quality_step 단위) → 배율(scale_steps 순) 순서로 낮추고,
+      여유가 생기면 역순(배율 → 품질)으로 되돌립니다.
+    - 수신측 손실률(report_loss)이 있으면 과부하 판단에 함께 사용합니다.
+    """
+    def __init__(self, quality=50, target_fps=30.0, target_bitrate=None,
+                 min_quality=20, max_quality=90, quality_step=5,
+                 scale_steps=(1.0, 0.75, 0.5), window=1.0,
+                 max_drop_ratio=0.1, max_loss_ratio=0.02):
+        self.quality = int(quality)
+        self.target_fps = float(target_fps)
+        self.target_bitrate = target_bitrate  # bit/s, None이면 비트레이트 제한 없음
+        self.min_quality = int(min_quality)
+        self.max_quality = int(max_quality)
+        self.quality_step = int(quality_step)
+        self.scale_steps = tuple(scale_steps)
+        self.scale_index = 0
+        self.window = float(window)
+        self.max_drop_ratio = max_drop_ratio
+        self.max_loss_ratio = max_loss_ratio
+
+        self._lock = threading.Lock()
+        self._reset_window(time.monotonic())
+        self._loss_ratio = 0.0
+        self._last = {"fps": 0.0, "bitrate": 0.0, "encode_ms": 0.0,
+                      "bytes_per_frame": 0.0, "drop_ratio": 0.0}
+
+    @property
+    def scale(self):
+        return self.scale_steps[self.scale_index]
+
+    def _reset_window(self, now):
+        self._t0 = now
+        self._frames = 0
+        self._bytes = 0
+        self._encode_s = 0.0
+        self._drops = 0
+
+    def record_frame(self, encode_s, nbytes):
+        """워커 스레드: 인코딩/전송된 프레임 1개 기록"""
+        with self._lock:
+            self._frames += 1
+            self._bytes += nbytes
+            self._encode_s += encode_s
+
+    def record_drop(self):
+        """메인 스레드: 큐가 가득 차서 버려진 프레임 기록"""
+        with self._lock:
+            self._drops += 1
+
+    def report_loss(self, loss_ratio):
+        """피드백 스레드: 수신측에서 보고한 패킷 손실률(0~1) 기록"""
+        with self._lock:
+            self._loss_ratio = min(max(float(loss_ratio), 0.0), 1.0)
+
+    def update(self, now=None):
+        """window가 지났으면 측정값을 평가해 quality/scale을 한 단계 조정. 조정 여부 반환"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            elapsed = now - self._t0
+            if elapsed < self.window:
+                return False
+            frames, nbytes, enc_s, drops = self._frames, self._bytes, self._encode_s, self._drops
+            loss = self._loss_ratio
+            self._reset_window(now)
+
+        fps = frames / elapsed
+        bitrate = nbytes * 8 / elapsed
+        encode_ms = (enc_s / frames * 1000.0) if frames else 0.0
+        drop_ratio = drops / (frames + drops) if (frames + drops) else 0.0
+        self._last = {"fps": fps, "bitrate": bitrate, "encode_ms": encode_ms,
+                      "bytes_per_frame": (nbytes / frames) if frames else 0.0,
+                      "drop_ratio": drop_ratio}
+        if frames == 0:
+            return False
+
+        budget_ms = 1000.0 / self.target_fps
+        overloaded = (
+            (self.target_bitrate is not None and bitrate > self.target_bitrate * 1.05)
+            or drop_ratio > self.max_drop_ratio
+            or loss > self.max_loss_ratio
+            or encode_ms > budget_ms * 0.8
+        )
+        underloaded = (
+            (self.target_bitrate is None or bitrate < self.target_bitrate * 0.8)
+            and drop_ratio == 0.0
+            and loss <= self.max_loss_ratio / 2
+            and encode_ms < budget_ms * 0.5
+        )
+
+        if overloaded:
+            # 1) 품질 먼저 낮추고 2) 최저 품질이면 해상도 배율을 낮춤
+            if self.quality > self.min_quality:
+                self.quality = max(self.min_quality, self.quality - self.quality_step)
+                return True
+            if self.scale_index < len(self.scale_steps) - 1:
+                self.scale_index += 1
+                return True
+        elif underloaded:
+            # 역순으로 복구: 해상도 배율 먼저, 그 다음 품질
+            if self.scale_index > 0:
+                self.scale_index -= 1
+                return True
+            if self.quality < self.max_quality:
+                self.quality = min(self.max_quality, self.quality + self.quality_step)
+                return True
+        return False
+
+    def stats(self):
+        with self._lock:
+            loss = self._loss_ratio
+        out = dict(self._last)
+        out.update({"quality": self.quality, "scale": self.scale,
+                    "loss_ratio": loss, "target_fps": self.target_fps,
+                    "target_bitrate": self.target_bitrate})
+        return out
+
+
+class StreamDestination:
+    """
+    UdpImageSender 추가 구독자 1개 (인코딩은 한 번, 전송만 목적지별로 수행)
+
+    - 목적지마다 전용 스레드/소켓과 프레임 큐(queue_size)를 가지므로 느린 목적지가 다른 목적지를 막지 않음
+    - rate_bps를 주면 토큰 버킷으로 패킷 간격을 조절(pacing)
+    - 큐가 가득 차면 가장 오래된 프레임을 버리고(frames_dropped) 최신 프레임을 유지
+    - 멀티캐스트 주소(224.0.0.0/4)면 IP_MULTICAST_TTL을 설정하여 그룹 전체에 한 번만 전송
+    - ip에 호스트 이름("quest.local" 등)을 주면 생성 시 한 번 IPv4로 해석 (패킷마다 이름을 해석하지 않음).
+      해석에 실패하면 이름 그대로 유니캐스트로 보냄 (실패는 send_errors로 집계)
+    """
+    def __init__(self, ip, port, rate_bps=None, queue_size=2, multicast_ttl=1):
+        self.ip = ip
+        self.port = port
+        self.rate_bps = rate_bps
+        self.address = self._resolve(ip, port)
+        try:
+            self.multicast = ipaddress.ip_address(self.address).is_multicast
+        except ValueError:
+            # 해석하지 못한 호스트 이름 → 유니캐스트로 취급
+            self.multicast = False
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.packets_sent = 0
+        self.bytes_sent = 0
+        self.send_errors = 0
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+        if self.multicast:
+            self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, multicast_ttl)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _resolve(host, port):
+        """IP 문자열은 그대로, 호스트 이름은 IPv4 주소로 해석 (실패 시 입력 그대로)"""
+        try:
+            return socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_DGRAM)[0][4][0]
+        except (socket.gaierror, UnicodeError):
+            return host
+
+    def submit(self, packets):
+        """인코딩/분할이 끝난 프레임 1개의 패킷 목록을 큐에 넣음 (가득 차면 가장 오래된 프레임 드랍)"""
+        while True:
+            try:
+                self._queue.put_nowait(packets)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.frames_dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _loop(self):
+        addr = (self.address, self.port)
+        tokens = 0.0
+        t_last = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                packets = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            for packet in packets:
+                if self.rate_bps:
+                    # 토큰 버킷 pacing (버스트 상한 = 10ms 분량 또는 64KB)
+                    rate = self.rate_bps / 8.0
+                    now = time.monotonic()
+                    tokens = min(tokens + (now - t_last) * rate, max(rate * 0.01, 65536.0))
+                    t_last = now
+                    if tokens < len(packet):
+                        time.sleep((len(packet) - tokens) / rate)
+                        tokens = len(packet)
+                        t_last = time.monotonic()
+                    tokens -= len(packet)
+                try:
+                    self.sock.sendto(packet, addr)
+                    self.packets_sent += 1
+                    self.bytes_sent += len(packet)
+                except OSError:
+                    self.send_errors += 1
+            self.frames_sent += 1
+
+    def close(self):
+        self._stop_event.set()
+        self._thread.join(timeout=1.0)
+        self.sock.close()
+
+    def stats(self):
+        return {"frames_sent": self.frames_sent, "frames_dropped": self.frames_dropped,
+                "packets_sent": self.packets_sent, "bytes_sent": self.bytes_sent,
+                "send_errors": self.send_errors, "rate_bps": self.rate_bps,
+                "multicast": self.multicast}
+
+
+class StereoParamsUpdater:
+    """
+    스테레오 파라미터(focus/quad/zoom/addFocus) 비동기 전송기 (기기 1대당 1개)
+
+    - submit()은 즉시 Future를 반환하고, 실제 TCP 전송은 백그라운드 스레드가 수행 → 프레임 루프가 멈추지 않음
+    - 전송 중에 들어온 요청은 키별로 최신 값만 남기고 합쳐(coalesce) 다음 전송 1회로 보냄
+      (슬라이더처럼 연속으로 바뀌는 값은 중간 값이 버려짐, coalesced 카운터)
+    - 합쳐진 요청들의 Future/callback은 모두 그 전송의 응답 딕셔너리로 완료
+    """
+    def __init__(self, send_fn):
+        """send_fn(payload: dict) -> dict : 실제 전송 함수 (예: UdpImageSender._send_stereo_payload)"""
+        self._send_fn = send_fn
+        self._cond = threading.Condition()
+        self._payload = {}
+        self._waiters = []  # [(future, callback)]
+        self._closed = False
+        self.sent = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.last_response = None
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, payload: dict, callback=None) -> Future:
+        fut = Future()
+        with self._cond:
+            if self._closed:
+                fut.set_result({"error": "Updater closed"})
+                return fut
+            if self._waiters:
+                self.coalesced += 1
+            self._payload.update(payload)
+            self._waiters.append((fut, callback))
+            self._cond.notify()
+        return fut
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._waiters and not self._closed:
+                    self._cond.wait()
+                if not self._waiters:
+                    return
+                payload, self._payload = self._payload, {}
+                waiters, self._waiters = self._waiters, []
+            try:
+                resp = self._send_fn(payload)
+            except Exception as e:
+                resp = {"error": str(e)}
+            self.sent += 1
+            if "error" in resp:
+                self.errors += 1
+            self.last_response = resp
+            for fut, callback in waiters:
+                fut.set_result(resp)
+                if callback is not None:
+                    try:
+                        callback(resp)
+                    except Exception as e:
+                        print(f"[WARN] stereo params callback 오류: {e}")
+
+    def close(self, timeout=1.0):
+        """대기 중인 요청을 보낸 뒤 스레드 종료"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=timeout)
+
+    def stats(self):
+        return {"sent": self.sent, "coalesced": self.coalesced, "errors": self.errors,
+                "last_response": self.last_response}
+
+
 class UdpImageSender:
     # max_payload: 1400 bytes (일반적인 MTU 1500 - 헤더 크기) 권장. 
     # 60KB로 설정하면 WiFi나 일반 라우터에서 패킷이 자주 유실됩니다.
-    def __init__(self, ip, port, width, height, max_payload=1400, jpeg_quality=50):
+    def __init__(self, ip, port, width, height, max_payload=1400, jpeg_quality=50,
+                 adaptive=False, target_fps=30.0, target_bitrate=None, feedback_port=None,
+                 foveated=False, eyes=2, fovea_size=(0.5, 0.5), fovea_quality=80,
+                 periphery_scale=0.5, periphery_quality=30,
+                 trace=False, trace_capacity=1024,
+                 codec="jpeg", video_bitrate=4_000_000, keyframe_interval=60,
+                 tiled=False, tile_size=(160, 120), tile_threshold=6.0, tile_downsample=8,
+                 refresh_interval=30, depth_method="auto", depth_predictor="left"):
+        """
+        - adaptive: True면 AdaptiveStreamController로 jpeg_quality와 해상도 배율을 자동 조절
+          foveated 모드는 ROI/주변부 품질을 제어기 품질 변화량만큼 함께 옮기고 배율은 주변부에만 적용,
+          tiled 모드는 타일 품질만 조절, h264/hevc는 제어기 품질 비율(quality / jpeg_quality)만큼 video_bitrate를
+          바꿔 VideoEncoder.set_bitrate로 적용하고 배율은 그대로 해상도에 적용 (codec="depth"는 무손실이라 사용 불가)
+        - target_fps / target_bitrate(bit/s): adaptive 모드의 목표값
+        - feedback_port: 수신측 손실 보고(JSON {"loss": 0~1})를 받을 UDP 포트 (None이면 사용 안 함)
+        - foveated: True면 눈(eye)마다 중심 ROI는 고품질, 주변부는 축소/저품질로 나누어
+          확장 헤더(EXT_HEADER)의 서브스트림으로 같은 FrameID에 담아 전송
+        - eyes: 좌우로 붙어 있는 눈 영상 개수 (side-by-side stereo = 2)
+        - fovea_size: 눈 영상 대비 ROI 크기 비율 (w, h)
+        - periphery_scale: 주변부(눈 전체) 축소 배율
+        - trace: True면 프레임별 단계 지연(캡처→큐→리사이즈→인코딩→전송)을 self.tracer에 기록하고,
+          확장 헤더 + TRACE_BLOCK으로 전송하여 수신측(UdpImageReceiver(trace=True))이 전체 지연을 계산
+        - codec: "jpeg"(기본, 프레임 내 압축) / "h264" / "hevc" (PyAV libx264/libx265 zerolatency 인터프레임 압축)
+          인터프레임 코덱은 access unit을 확장 헤더로 분할 전송하고 keyframe에 FLAG_KEYFRAME을 표시
+        - video_bitrate: 인터프레임 코덱 목표 비트레이트 (bit/s)
+        - keyframe_interval: 손실 복구용 주기적 IDR 프레임 간격 (프레임 수)
+          codec="depth": z16(HxW uint16) 깊이 영상을 DepthEncoder로 무손실 압축하여 확장 헤더(CODEC_DEPTH)로 전송
+          (depth_method: "auto"/"zstd"/"lz4"/"zlib"/"png", depth_predictor: "left"/"plane"/"none")
+        - tiled: True면 눈마다 고정 타일(tile_size)로 나누고, 마지막으로 보낸 프레임과 달라진 타일만
+          JPEG 인코딩하여 서브스트림(FLAG_DELTA)으로 전송. refresh_interval 프레임마다 전체 타일 전송(FLAG_KEYFRAME)
+        - tile_threshold: tile_downsample 배 축소 영상의 타일 내 최대 밝기 차이가 이 값을 넘으면 변경으로 판단
+        """
         self.ip = ip
         self.port = port
         self.width = width
@@ -31,6 +381,77 @@ class UdpImageSender:
         self.frame_id = 0
         self.connected = False
 
+        self.frames_in = 0
+        self.dropped_frames = 0
+        # tiled 모드는 타일 기준 영상이 해상도에 묶여 있으므로 품질만 조절 (배율 단계 없음)
+        self.controller = AdaptiveStreamController(
+            quality=jpeg_quality, target_fps=target_fps, target_bitrate=target_bitrate,
+            **({"scale_steps": (1.0,)} if tiled else {})
+        ) if adaptive else None
+        self.feedback_port = feedback_port
+        self._feedback_sock: socket.socket | None = None
+        self._feedback_thread = None
+
+        self.foveated = foveated
+        self.eyes = eyes
+        self.fovea_size = fovea_size
+        self.fovea_quality = fovea_quality
+        self.periphery_scale = periphery_scale
+        self.periphery_quality = periphery_quality
+        self._fovea_center = (0.5, 0.5)  # 눈 영상 기준 정규화 좌표 (u, v)
+
+        self._resize_buffers = {}  # (w, h, channels, dtype) -> 리사이즈 출력 버퍼
+
+        self.tracer = LatencyTracer(SENDER_STAGES, trace_capacity) if trace else None
+
+        # Prometheus 메트릭 (stream_metrics.start_http_server로 노출, 목적지 ip:port 라벨)
+        dest = f"{ip}:{port}"
+        self._m_frames_in = stream_metrics.counter("stereo_frames_in_total", "send_image()로 들어온 프레임 수", dest=dest)
+        self._m_dropped = stream_metrics.counter("stereo_frames_dropped_total", "워커가 이전 프레임 처리 중이라 버린 프레임 수", dest=dest)
+        self._m_sent = stream_metrics.counter("stereo_frames_sent_total", "인코딩 후 전송한 프레임 수", dest=dest)
+        self._m_encode = stream_metrics.histogram("stereo_encode_seconds", "프레임 인코딩 시간 (foveated/tiled는 전송 포함)", dest=dest)
+        self._m_encode_errors = stream_metrics.counter("stereo_encode_errors_total", "인코딩 결과가 비어 버린 프레임 수", dest=dest)
+        self._m_bytes = stream_metrics.counter("stereo_bytes_sent_total", "전송한 UDP 데이터그램 바이트 (헤더 포함)", dest=dest)
+        self._m_send_errors = stream_metrics.counter("stereo_send_errors_total", "UDP 전송 오류 수 (송신 버퍼 가득 참 등)", dest=dest)
+
+        # 추가 구독자 (add_destination) — 워커 스레드가 프레임 단위로 패킷 목록을 넘겨줌
+        self._destinations = {}
+        self._dest_lock = threading.Lock()
+        self._fanout_packets = None
+
+        self._control_clients = {}  # (host, port) -> JsonLineClient (set_stereo_params persistent 모드)
+        self._param_updaters = {}   # (host, port) -> StereoParamsUpdater (set_stereo_params_async)
+
+        self.tiled = tiled
+        self.tile_size = tile_size
+        self.tile_threshold = tile_threshold
+        self.tile_downsample = tile_downsample
+        self.refresh_interval = refresh_interval
+        self._tile_ref = None        # 마지막으로 보낸 타일 내용의 축소 영상
+        self._tile_grid = None
+        self._frames_since_refresh = 0
+        self._force_refresh = True
+        self.tiles_sent = 0
+        self.tiles_skipped = 0
+        self.frames_skipped = 0
+        if tiled and foveated:
+            raise ValueError("tiled 모드와 foveated 모드는 함께 사용할 수 없습니다.")
+
+        self.codec = codec
+        self.video_bitrate = video_bitrate
+        self.video_encoder = None
+        self.depth_encoder = None
+        if codec != "jpeg":
+            if foveated or tiled:
+                raise ValueError("foveated/tiled 모드는 codec='jpeg'만 지원합니다.")
+            if codec == "depth":
+                if adaptive:
+                    raise ValueError("codec='depth'는 무손실 압축이라 adaptive 모드를 지원하지 않습니다.")
+                self.depth_encoder = DepthEncoder(depth_method, depth_predictor)
+            else:
+                self.video_encoder = VideoEncoder(codec, fps=target_fps, bitrate=video_bitrate,
+                                                  keyframe_interval=keyframe_interval)
+
         # maxsize=1로 설정하여 가장 최신 프레임만 유지 (자동 Drop 기능 대체)
         self._queue = queue.Queue(maxsize=1)
         self._stop_event = threading.Event()
@@ -51,6 +472,13 @@ class UdpImageSender:
             self._worker = threading.Thread(target=self._worker_loop, daemon=True)
             self._worker.start()
 
+        if (self.controller is not None or self.video_encoder is not None or self.tiled) and self.feedback_port is not None:
+            self._feedback_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._feedback_sock.bind(("0.0.0.0", self.feedback_port))
+            self._feedback_sock.settimeout(0.2)
+            self._feedback_thread = threading.Thread(target=self._feedback_loop, daemon=True)
+            self._feedback_thread.start()
+
     def connect(self):
         if self.sock is None:
             raise RuntimeError("소켓이 생성되지 않았습니다. 먼저 open()을 호출하세요.")
@@ -62,6 +490,25 @@ class UdpImageSender:
         # 스레드가 대기 중일 수 있으므로 빈 데이터를 보내 깨울 수도 있음 (선택)
         if self._worker.is_alive():
             self._worker.join(timeout=1.0)
+        if self.video_encoder is not None:
+            self.video_encoder.close()
+        with self._dest_lock:
+            dests = list(self._destinations.values())
+            self._destinations.clear()
+        for dest in dests:
+            dest.close()
+        if self._feedback_thread is not None:
+            self._feedback_thread.join(timeout=1.0)
+            self._feedback_thread = None
+        if self._feedback_sock is not None:
+            self._feedback_sock.close()
+            self._feedback_sock = None
+        for updater in self._param_updaters.values():
+            updater.close()
+        self._param_updaters.clear()
+        for client in self._control_clients.values():
+            client.close()
+        self._control_clients.clear()
         if self.sock:
             self.sock.close()
             self.sock = None
@@ -90,80 +537,460 @@ class UdpImageSender:
                 return b''
             return buf.tobytes()
 
-    def send_image(self, img: np.ndarray):
+    def send_image(self, img: np.ndarray, capture_ts: float | None = None):
         """
         메인 스레드: 이미지를 큐에 넣음. 큐가 꽉 차 있다면(이전 프레임 처리 중) 즉시 버림(Drop).
+        - capture_ts: 카메라 캡처 시각 (time.time() 기준 초, 예: RealsenseCamera 프레임의 meta["capture_time"])
         """
         if self._stop_event.is_set():
             return
 
+        self.frames_in += 1
+        self._m_frames_in.inc()
         try:
             # put_nowait: 큐가 꽉 차면 Full 예외 발생 -> 최신성 유지를 위해 이전 것 무시
-            self._queue.put_nowait(img)
+            self._queue.put_nowait((img, capture_ts, time.time()))
         except queue.Full:
-            pass # 이전 프레임이 아직 전송 중이면 이번 프레임은 쿨하게 드랍
+            # 이전 프레임이 아직 전송 중이면 이번 프레임은 쿨하게 드랍
+            self.dropped_frames += 1
+            self._m_dropped.inc()
+            if self.controller is not None:
+                self.controller.record_drop()
+
+    def _feedback_loop(self):
+        """
+        수신측 보고 수신
+        - 손실률: JSON {"loss": 0~1} 또는 {"received": n, "lost": m} → adaptive 제어기
+        - keyframe 요청: {"keyframe": true} → 인터프레임 코덱의 다음 프레임을 IDR로 인코딩 / tiled 모드 전체 갱신
+        """
+        while not self._stop_event.is_set():
+            try:
+                data, _ = self._feedback_sock.recvfrom(2048)
+                report = json.loads(data.decode("utf-8", errors="ignore"))
+                if report.get("keyframe"):
+                    if self.video_encoder is not None:
+                        self.video_encoder.request_keyframe()
+                    self._force_refresh = True
+                if self.controller is None:
+                    continue
+                if "loss" in report:
+                    loss = float(report["loss"])
+                else:
+                    lost = float(report.get("lost", 0))
+                    total = lost + float(report.get("received", 0))
+                    loss = lost / total if total > 0 else 0.0
+                self.controller.report_loss(loss)
+            except (socket.timeout, ValueError, AttributeError):
+                continue
+            except OSError:
+                break
+
+    def stats(self):
+        """송신 통계 및 (adaptive 모드일 때) 제어기 상태 반환"""
+        out = {"frames_in": self.frames_in, "dropped_frames": self.dropped_frames,
+               "frames_sent": self.frame_id, "jpeg_quality": self.jpeg_quality,
+               "width": self.width, "height": self.height}
+        if self.tiled:
+            out.update({"tiles_sent": self.tiles_sent, "tiles_skipped": self.tiles_skipped,
+                        "frames_skipped": self.frames_skipped})
+        if self.controller is not None:
+            out["adaptive"] = self.controller.stats()
+        with self._dest_lock:
+            dests = list(self._destinations.items())
+        if dests:
+            out["destinations"] = {f"{ip}:{port}": d.stats() for (ip, port), d in dests}
+        if self._param_updaters:
+            out["stereo_params"] = {f"{host}:{port}": u.stats()
+                                    for (host, port), u in list(self._param_updaters.items())}
+        return out
 
     def _worker_loop(self):
         while not self._stop_event.is_set():
             try:
                 # 0.1초 동안 기다리며 이미지 꺼내기 (Polling 방식인 sleep보다 효율적)
-                img = self._queue.get(timeout=0.1)
+                img, capture_ts, enqueue_ts = self._queue.get(timeout=0.1)
             except queue.Empty:
                 continue
 
             # 1. 리사이즈 (필요한 경우에만 수행하여 CPU 절약)
-            h, w = img.shape[:2]
-            if (w, h) != (self.width, self.height):
-                img = cv2.resize(img, (self.width, self.height))
+            t_dequeue = time.time()
+            t0 = time.perf_counter()
+            img = self._resize(img)
+            t_resized = time.time()
 
-            # 2. JPEG 인코딩
-            data = self.encode_jpeg(img, self.jpeg_quality)
-            if not data:
-                continue
+            if self._destinations:
+                self._fanout_packets = []
 
-            # 3. 패킷 분할 및 전송
-            fid = self.frame_id & 0xFFFFFFFF
-            self.frame_id += 1
-            
-            # 리스트 컴프리헨션 대신 제너레이터 스타일로 순회 (메모리 절약)
-            total_len = len(data)
-            total_packets = (total_len + self.max_payload - 1) // self.max_payload
+            trace = None
+            if self.tracer is not None:
+                trace = (capture_ts if capture_ts is not None else enqueue_ts, enqueue_ts, 0.0)
 
-            for idx in range(total_packets):
-                start = idx * self.max_payload
-                end = min(start + self.max_payload, total_len)
-                chunk = data[start:end]
+            if self.foveated or self.tiled:
+                nbytes = self._send_foveated(img, trace) if self.foveated else self._send_tiled(img, trace)
+                t_encoded = t_sent = time.time()
+            else:
+                # 2. JPEG / 인터프레임 코덱 / 무손실 깊이 인코딩
+                keyframe = True
+                if self.video_encoder is not None:
+                    data, keyframe = self.video_encoder.encode(img)
+                elif self.depth_encoder is not None:
+                    data = self.depth_encoder.encode(img)
+                else:
+                    quality = self.controller.quality if self.controller is not None else self.jpeg_quality
+                    data = self.encode_jpeg(img, quality)
+                t_encoded = time.time()
+                if not data:
+                    self._m_encode_errors.inc()
+                    self._fanout_packets = None
+                    continue
+                nbytes = len(data)
 
-                # Header: FrameID(4) + PacketIdx(2) + TotalPackets(2) = 8 bytes
-                header = struct.pack('!IHH', fid, idx, total_packets)
-                
-                try:
-                    if self.connected:
-                        self.sock.send(header + chunk)
-                    else:
-                        self.sock.sendto(header + chunk, (self.ip, self.port))
-                except OSError as e:
-                    # 버퍼 가득 참 등의 일시적 오류 무시
-                    # print(f"[UDP Error] {e}") 
-                    pass
+                # 3. 패킷 분할 및 전송
+                if self.video_encoder is not None or self.depth_encoder is not None:
+                    h, w = img.shape[:2]
+                    codec = self.video_encoder.codec_id if self.video_encoder is not None else CODEC_DEPTH
+                    self._send_substream(data, self._next_frame_id(), 0, 1, (0, 0, w, h),
+                                         codec=codec,
+                                         flags=FLAG_KEYFRAME if keyframe else 0,
+                                         trace=None if trace is None else trace[:2] + (t_encoded,))
+                elif trace is None:
+                    self._send_packets(data)
+                else:
+                    h, w = img.shape[:2]
+                    self._send_substream(data, self._next_frame_id(), 0, 1, (0, 0, w, h),
+                                         trace=trace[:2] + (t_encoded,))
+                t_sent = time.time()
+
+            self._flush_fanout()
+            self._m_sent.inc()
+            self._m_encode.observe(t_encoded - t_resized)
+
+            if self.controller is not None:
+                self.controller.record_frame(time.perf_counter() - t0, nbytes)
+                if self.controller.update() and self.video_encoder is not None:
+                    # 인터프레임 코덱: 제어기 품질을 비트레이트로 환산 (인코더 재생성 → 다음 프레임이 IDR)
+                    bitrate = self._adaptive_bitrate()
+                    if bitrate != self.video_encoder.bitrate:
+                        self.video_encoder.set_bitrate(bitrate)
+
+            if self.tracer is not None:
+                self.tracer.record((
+                    None if capture_ts is None else enqueue_ts - capture_ts,
+                    t_dequeue - enqueue_ts,
+                    t_resized - t_dequeue,
+                    None if (self.foveated or self.tiled) else t_encoded - t_resized,
+                    None if (self.foveated or self.tiled) else t_sent - t_encoded,
+                    None if capture_ts is None else t_sent - capture_ts,
+                ))
+
+    def _resize(self, img):
+        """목표 해상도(adaptive 모드면 배율 적용)로 리사이즈"""
+        width, height = self.width, self.height
+        if self.controller is not None and self.controller.scale != 1.0 and not (self.foveated or self.tiled):
+            width = int(width * self.controller.scale)
+            height = int(height * self.controller.scale)
+        h, w = img.shape[:2]
+        if (w, h) != (width, height):
+            # 출력 버퍼를 재사용하여 프레임마다 새 배열을 할당하지 않음
+            key = (width, height, img.shape[2:], img.dtype.str)
+            buf = self._resize_buffers.get(key)
+            if buf is None:
+                buf = np.empty((height, width) + img.shape[2:], dtype=img.dtype)
+                self._resize_buffers[key] = buf
+            # 깊이 값은 보간하면 물체 경계에 없는 거리가 생기므로 최근접 보간
+            interpolation = cv2.INTER_NEAREST if self.depth_encoder is not None else cv2.INTER_LINEAR
+            img = cv2.resize(img, (width, height), dst=buf, interpolation=interpolation)
+        return img
+
+    def _next_frame_id(self):
+        fid = self.frame_id & 0xFFFFFFFF
+        self.frame_id += 1
+        return fid
+
+    def add_destination(self, ip, port, rate_bps=None, queue_size=2, multicast_ttl=1):
+        """
+        실행 중에 구독자 추가. 같은 인코딩 결과를 (ip, port)로도 전송 (멀티캐스트 주소 가능)
+        - rate_bps: 목적지별 전송 속도 상한 (bit/s, None이면 제한 없음)
+        """
+        dest = StreamDestination(ip, port, rate_bps, queue_size, multicast_ttl)
+        with self._dest_lock:
+            old = self._destinations.pop((ip, port), None)
+            self._destinations[(ip, port)] = dest
+        if old is not None:
+            old.close()
+        return dest
+
+    def remove_destination(self, ip, port):
+        with self._dest_lock:
+            dest = self._destinations.pop((ip, port), None)
+        if dest is not None:
+            dest.close()
+        return dest is not None
+
+    def _flush_fanout(self):
+        """워커 스레드: 이번 프레임에서 만든 패킷들을 모든 추가 구독자 큐에 전달"""
+        packets = self._fanout_packets
+        self._fanout_packets = None
+        if not packets:
+            return
+        with self._dest_lock:
+            dests = list(self._destinations.values())
+        for dest in dests:
+            dest.submit(packets)
+
+    def _send_datagram(self, packet):
+        if self._fanout_packets is not None:
+            self._fanout_packets.append(packet)
+        try:
+            if self.connected:
+                self.sock.send(packet)
+            else:
+                self.sock.sendto(packet, (self.ip, self.port))
+            self._m_bytes.inc(len(packet))
+        except OSError:
+            # 버퍼 가득 참 등의 일시적 오류는 건너뛰고 카운트만 (stereo_send_errors_total)
+            self._m_send_errors.inc()
+
+    def _send_packets(self, data):
+        fid = self._next_frame_id()
+
+        # 리스트 컴프리헨션 대신 제너레이터 스타일로 순회 (메모리 절약)
+        total_len = len(data)
+        total_packets = (total_len + self.max_payload - 1) // self.max_payload
+
+        for idx in range(total_packets):
+            start = idx * self.max_payload
+            end = min(start + self.max_payload, total_len)
+            chunk = data[start:end]
+
+            # Header: FrameID(4) + PacketIdx(2) + TotalPackets(2) = 8 bytes
+            header = LEGACY_HEADER.pack(fid, idx, total_packets)
+            self._send_datagram(header + chunk)
+
+    def _send_substream(self, data, fid, sub_idx, sub_count, region,
+                        codec=CODEC_JPEG, flags=0, trace=None):
+        """
+        확장 헤더로 서브스트림 1개 전송. region = (x, y, w, h) 원본 프레임 좌표
+        - trace: (capture_ts, enqueue_ts, encoded_ts)를 주면 FLAG_TRACE와 함께 모든 패킷에 TRACE_BLOCK 추가
+        """
+        payload = self.max_payload - (EXT_HEADER.size - LEGACY_HEADER.size)
+        trace_block = b""
+        if trace is not None:
+            flags |= FLAG_TRACE
+            trace_block = TRACE_BLOCK.pack(*trace)
+            payload -= TRACE_BLOCK.size
+        total_len = len(data)
+        total_packets = (total_len + payload - 1) // payload
+        x, y, w, h = region
+        for idx in range(total_packets):
+            start = idx * payload
+            chunk = data[start:start + payload]
+            header = EXT_HEADER.pack(EXT_MAGIC, flags, codec, fid, idx, total_packets,
+                                     sub_idx, sub_count, x, y, w, h)
+            self._send_datagram(header + trace_block + chunk)
+
+    def set_fovea_center(self, u: float, v: float):
+        """foveated 모드의 ROI 중심 설정 (눈 영상 기준 정규화 좌표, 0~1)"""
+        self._fovea_center = (min(max(float(u), 0.0), 1.0), min(max(float(v), 0.0), 1.0))
+
+    def set_fovea_from_head(self, head_TM, ref_TM=None, hfov_deg=87.0, vfov_deg=58.0):
+        """
+        XRHandReceiver.get_head_robotTM_by_parsed()의 헤드 변환행렬로 ROI 중심을 이동
+        - ref_TM: 정면(카메라 광축)으로 간주할 기준 헤드 자세 (None이면 로봇 x축이 정면)
+        - hfov_deg / vfov_deg: 카메라 수평/수직 화각 (기본값: RealSense D4xx IR)
+        로봇 좌표계(x 전방, y 왼쪽, z 위) 기준 헤드 전방 벡터의 yaw/pitch를 화각으로 정규화합니다.
+        """
+        rot = np.asarray(head_TM)[:3, :3]
+        if ref_TM is not None:
+            rot = np.asarray(ref_TM)[:3, :3].T @ rot
+        fwd = rot[:, 0]
+        yaw = np.degrees(np.arctan2(fwd[1], fwd[0]))
+        pitch = np.degrees(np.arctan2(fwd[2], np.hypot(fwd[0], fwd[1])))
+        self.set_fovea_center(0.5 - yaw / hfov_deg, 0.5 - pitch / vfov_deg)
+
+    def _adaptive_bitrate(self):
+        """adaptive 모드 + h264/hevc: video_bitrate에 제어기 품질 비율(controller.quality / jpeg_quality)을 곱한 값"""
+        return int(self.video_bitrate * self.controller.quality / max(self.jpeg_quality, 1))
+
+    def _adaptive_quality(self, base):
+        """adaptive 모드: 제어기 품질의 변화량(controller.quality - jpeg_quality)을 base 품질에 적용"""
+        if self.controller is None:
+            return base
+        q = base + self.controller.quality - self.jpeg_quality
+        return int(min(max(q, min(base, self.controller.min_quality)), 100))
+
+    def _send_foveated(self, img, trace=None):
+        """
+        눈마다 [주변부(축소, 저품질), 중심 ROI(원본, 고품질)] 서브스트림 전송. 전송 바이트 수 반환
+        - trace: (capture_ts, enqueue_ts, _) — 서브스트림마다 인코딩 완료 시각을 채워 전송
+        """
+        fid = self._next_frame_id()
+        h, w = img.shape[:2]
+        eye_w = w // self.eyes
+        roi_w = max(16, int(eye_w * self.fovea_size[0])) & ~1
+        roi_h = max(16, int(h * self.fovea_size[1])) & ~1
+        u, v = self._fovea_center
+        roi_x = int(min(max(u * eye_w - roi_w / 2, 0), eye_w - roi_w))
+        roi_y = int(min(max(v * h - roi_h / 2, 0), h - roi_h))
+        periphery_scale = self.periphery_scale * (self.controller.scale if self.controller is not None else 1.0)
+        per_w = max(8, int(eye_w * periphery_scale))
+        per_h = max(8, int(h * periphery_scale))
+        periphery_quality = self._adaptive_quality(self.periphery_quality)
+        fovea_quality = self._adaptive_quality(self.fovea_quality)
+
+        sub_count = 2 * self.eyes
+        nbytes = 0
+        for e in range(self.eyes):
+            x0 = e * eye_w
+            eye = img[:, x0:x0 + eye_w]
+
+            periphery = cv2.resize(eye, (per_w, per_h), interpolation=cv2.INTER_AREA)
+            data = self.encode_jpeg(periphery, periphery_quality)
+            if data:
+                self._send_substream(data, fid, 2 * e, sub_count, (x0, 0, eye_w, h),
+                                     trace=None if trace is None else trace[:2] + (time.time(),))
+                nbytes += len(data)
+
+            # 슬라이스는 비연속 메모리이므로 연속 배열로 만들어 인코딩
+            roi = np.ascontiguousarray(eye[roi_y:roi_y + roi_h, roi_x:roi_x + roi_w])
+            data = self.encode_jpeg(roi, fovea_quality)
+            if data:
+                self._send_substream(data, fid, 2 * e + 1, sub_count,
+                                     (x0 + roi_x, roi_y, roi_w, roi_h),
+                                     trace=None if trace is None else trace[:2] + (time.time(),))
+                nbytes += len(data)
+        return nbytes
+
+    def _build_tile_grid(self, h, w):
+        """눈 경계를 넘지 않는 타일 목록 [(x, y, w, h)]과 축소 영상 기준 타일 경계 인덱스"""
+        d = self.tile_downsample
+        eye_w = w // self.eyes
+        tw, th = self.tile_size
+        xs = sorted({x for e in range(self.eyes) for x in range(e * eye_w, (e + 1) * eye_w, tw)})
+        ys = list(range(0, h, th))
+        x_ends = xs[1:] + [w]
+        y_ends = ys[1:] + [h]
+        tiles = [(x, y, min(xe, w) - x, min(ye, h) - y)
+                 for y, ye in zip(ys, y_ends) for x, xe in zip(xs, x_ends)]
+        if len(tiles) > 255:
+            raise ValueError(f"타일 개수({len(tiles)})가 255를 넘습니다. tile_size를 키우세요.")
+        sx = np.array([x // d for x in xs], dtype=np.intp)
+        sy = np.array([y // d for y in ys], dtype=np.intp)
+        self._tile_grid = ((h, w), tiles, sy, sx)
+        self._tile_ref = None
+
+    def _send_tiled(self, img, trace=None):
+        """변경된 타일만 전송 (refresh_interval 마다 / keyframe 요청 시 전체 전송). 전송 바이트 수 반환"""
+        h, w = img.shape[:2]
+        if self._tile_grid is None or self._tile_grid[0] != (h, w):
+            self._build_tile_grid(h, w)
+        _, tiles, sy, sx = self._tile_grid
+
+        # 축소 영상 차이 → 타일별 최대값 (np.maximum.reduceat로 타일 크기가 달라도 한 번에 계산)
+        d = self.tile_downsample
+        small = cv2.resize(img, (max(1, w // d), max(1, h // d)), interpolation=cv2.INTER_AREA)
+        full = (self._force_refresh or self._tile_ref is None
+                or self._frames_since_refresh >= self.refresh_interval)
+        if full:
+            dirty = np.ones(len(tiles), dtype=bool)
+            self._tile_ref = small.copy()
+            self._frames_since_refresh = 0
+            self._force_refresh = False
+        else:
+            diff = cv2.absdiff(small, self._tile_ref)
+            if diff.ndim == 3:
+                diff = diff.max(axis=2)
+            tile_max = np.maximum.reduceat(np.maximum.reduceat(diff, sy, axis=0), sx, axis=1)
+            dirty = tile_max.ravel() > self.tile_threshold
+            self._frames_since_refresh += 1
+
+        dirty_idx = np.flatnonzero(dirty)
+        self.tiles_skipped += len(tiles) - len(dirty_idx)
+        if len(dirty_idx) == 0:
+            self.frames_skipped += 1
+            return 0
+
+        fid = self._next_frame_id()
+        flags = FLAG_KEYFRAME if full else FLAG_DELTA
+        quality = self.controller.quality if self.controller is not None else self.jpeg_quality
+        nbytes = 0
+        for sub_idx, t in enumerate(dirty_idx):
+            x, y, tw, th = tiles[t]
+            data = self.encode_jpeg(np.ascontiguousarray(img[y:y + th, x:x + tw]), quality)
+            if not data:
+                continue
+            self._send_substream(data, fid, sub_idx, len(dirty_idx), (x, y, tw, th), flags=flags,
+                                 trace=None if trace is None else trace[:2] + (time.time(),))
+            nbytes += len(data)
+            if not full:
+                # 보낸 타일만 기준 영상 갱신 (보내지 않은 타일의 느린 변화도 누적되어 감지됨)
+                ys, xs = y // d, x // d
+                self._tile_ref[ys:ys + th // d, xs:xs + tw // d] = small[ys:ys + th // d, xs:xs + tw // d]
+        self.tiles_sent += len(dirty_idx)
+        return nbytes
 
     def set_stereo_params(self, host: str, port: int = 9004,
                           focus: float | None = None,
                           quad: float | None = None,
                           zoom: float | None = None,    # [추가됨] 줌 제어용
                           add_focus: bool | None = None,
-                          timeout: float = 3.0):
+                          timeout: float = 3.0,
+                          persistent: bool = False):
         """
         Unity 또는 Vision Pro 등 외부 기기에 파라미터 전송
         - focus: 양안 시차 조절
         - quad: 스크린 거리(Z축)
         - zoom: 테두리 제거를 위한 화면 확대 (1.0 ~ 2.0)
+        - persistent: True면 (host, port)별 지속 연결(JsonLineClient, NDJSON + "id")을 재사용하여
+          매 호출마다 연결/종료하지 않음. 기기가 요청마다 연결을 닫으면 자동 재연결
+        """
+        payload = self._stereo_payload(focus, quad, zoom, add_focus)
+        return self._send_stereo_payload(host, port, payload, timeout, persistent)
+
+    def set_stereo_params_async(self, host: str, port: int = 9004,
+                                focus: float | None = None,
+                                quad: float | None = None,
+                                zoom: float | None = None,
+                                add_focus: bool | None = None,
+                                callback=None,
+                                timeout: float = 3.0,
+                                persistent: bool = False) -> Future:
         """
+        set_stereo_params의 비동기 버전 (프레임 루프에서 호출해도 전송을 기다리지 않음)
+        - (host, port)별 StereoParamsUpdater가 백그라운드에서 최신 값만 전송
+        - 기본은 set_stereo_params와 같은 1회성 연결 (한 줄 전송 → SHUT_WR → EOF까지 응답 수신)
+        - persistent: True면 지속 연결(NDJSON + "id") 사용, 기기가 이를 지원할 때만 지정
+          (처음 호출할 때의 값으로 (host, port)별 전송 방식이 정해짐)
+        - 반환된 Future 또는 callback(resp)으로 응답 딕셔너리 전달
+        """
+        updater = self._param_updaters.get((host, port))
+        if updater is None:
+            updater = StereoParamsUpdater(
+                lambda payload: self._send_stereo_payload(host, port, payload, timeout, persistent))
+            self._param_updaters[(host, port)] = updater
+        return updater.submit(self._stereo_payload(focus, quad, zoom, add_focus), callback)
+
+    @staticmethod
+    def _stereo_payload(focus, quad, zoom, add_focus):
         payload = {}
         if focus is not None:     payload["focus"] = float(focus)
         if quad  is not None:     payload["quad"]  = float(quad)
         if zoom  is not None:     payload["zoom"]  = float(zoom)  # [추가됨]
         if add_focus is not None: payload["addFocus"] = bool(add_focus)
+        return payload
+
+    def _send_stereo_payload(self, host, port, payload, timeout=3.0, persistent=False):
+        if persistent:
+            client = self._control_clients.get((host, port))
+            if client is None:
+                client = JsonLineClient(host, port, timeout=timeout)
+                self._control_clients[(host, port)] = client
+            # 같은 값을 다시 설정하는 것은 안전 → 연결이 끊기면 재전송 허용
+            resp = client.request(payload, timeout=timeout, idempotent=True)
+            if resp.get("status") == "error" and "message" in resp:
+                return {"error": resp["message"]}
+            resp.pop("id", None)
+            return resp
 
         line = json.dumps(payload)
         resp = {}
@@ -27,6 +27,8 @@
 #include <unistd.h>
 #include <fcntl.h>
 #include <poll.h>
+#include <errno.h>
+#include <netinet/tcp.h>
 
 // ZED include
 #include <sl/Camera.hpp>
@@ -37,6 +39,7 @@
 // JSON parsing (simple implementation)
 #include <map>
 #include <vector>
+#include <deque>
 #include <algorithm>
 
 using namespace std;
@@ -195,7 +198,8 @@ string stateToString(AppState state) {
 // ============== UDP Image Sender ==============
 class UdpImageSender {
 public:
-    UdpImageSender() : sock_fd_(-1), frame_id_(0), connected_(false), stop_flag_(true) {}
+    UdpImageSender() : sock_fd_(-1), frame_id_(0), connected_(false), stop_flag_(true),
+                       frames_sent_(0), frames_dropped_(0), bytes_sent_(0) {}
     
     ~UdpImageSender() { close(); }
 
@@ -253,12 +257,16 @@ public:
         lock_guard<mutex> lock(queue_mutex_);
         while (!frame_queue_.empty()) {
             frame_queue_.pop();
+            frames_dropped_++;  // not yet sent, replaced by newer frame
         }
         frame_queue_.push(img.clone());
         queue_cv_.notify_one();
     }
     
     bool isRunning() const { return !stop_flag_ && connected_; }
+    uint64_t framesSent() const { return frames_sent_; }
+    uint64_t framesDropped() const { return frames_dropped_; }
+    uint64_t bytesSent() const { return bytes_sent_; }
 
 private:
     void workerLoop() {
@@ -295,6 +303,7 @@ private:
             }
 
             sendPackets(jpeg_buf);
+            frames_sent_++;
         }
     }
 
@@ -319,7 +328,9 @@ private:
             memcpy(packet_buf.data() + 6, &total_net, 2);
             memcpy(packet_buf.data() + 8, data.data() + start, chunk_size);
 
-            send(sock_fd_, packet_buf.data(), 8 + chunk_size, 0);
+            if (send(sock_fd_, packet_buf.data(), 8 + chunk_size, 0) > 0) {
+                bytes_sent_ += 8 + chunk_size;
+            }
         }
     }
 
@@ -329,6 +340,9 @@ private:
     atomic<uint32_t> frame_id_;
     atomic<bool> connected_;
     atomic<bool> stop_flag_;
+    atomic<uint64_t> frames_sent_;
+    atomic<uint64_t> frames_dropped_;
+    atomic<uint64_t> bytes_sent_;
     
     queue<cv::Mat> frame_queue_;
     mutex queue_mutex_;
@@ -470,6 +484,9 @@ public:
     
     void stop() {
         running_ = false;
+        for (const auto& kv : clients_) ::close(kv.first);
+        clients_.clear();
+        pending_.clear();
         if (server_fd_ >= 0) {
             ::close(server_fd_);
             server_fd_ = -1;
@@ -477,57 +494,186 @@ public:
     }
     
     // Non-blocking check for new command
+    // - Clients may keep the connection open and send newline-delimited JSON commands
+    //   (responses are written back on the same connection, one line each, in order)
+    // - Legacy clients that send one command and shutdown(SHUT_WR) are still supported
     bool pollCommand(string& command) {
         if (!running_ || server_fd_ < 0) return false;
         
-        struct pollfd pfd;
-        pfd.fd = server_fd_;
-        pfd.events = POLLIN;
-        
-        if (poll(&pfd, 1, 0) <= 0) return false;
-        
-        struct sockaddr_in client_addr;
-        socklen_t client_len = sizeof(client_addr);
-        int client_fd = accept(server_fd_, (struct sockaddr*)&client_addr, &client_len);
-        
-        if (client_fd < 0) return false;
-        
-        // Set timeout for recv
-        struct timeval tv;
-        tv.tv_sec = 1;
-        tv.tv_usec = 0;
-        setsockopt(client_fd, SOL_SOCKET, SO_RCVTIMEO, &tv, sizeof(tv));
-        
-        // Receive command
-        char buffer[4096];
-        int n = recv(client_fd, buffer, sizeof(buffer) - 1, 0);
-        if (n > 0) {
-            buffer[n] = '\0';
-            command = string(buffer);
-            // Store client fd to send response
-            pending_client_fd_ = client_fd;
-            return true;
-        }
+        if (pending_.empty()) pollSockets();
+        if (pending_.empty()) return false;
         
-        ::close(client_fd);
-        return false;
+        pending_client_fd_ = pending_.front().first;
+        command = pending_.front().second;
+        pending_.pop_front();
+        return true;
     }
     
     void sendResponse(const string& response) {
         if (pending_client_fd_ >= 0) {
             string resp = response + "\n";
-            send(pending_client_fd_, resp.c_str(), resp.length(), 0);
-            ::close(pending_client_fd_);
+            sendAll(pending_client_fd_, resp);
+            auto it = clients_.find(pending_client_fd_);
+            if (it != clients_.end() && it->second.closing && !hasPending(pending_client_fd_)) {
+                closeClient(pending_client_fd_);
+            }
             pending_client_fd_ = -1;
         }
     }
     
+    // Status push subscription (subscribe_status / unsubscribe_status)
+    // Applies to the client whose command is currently being handled
+    void subscribeCurrent(double interval_sec) {
+        auto it = clients_.find(pending_client_fd_);
+        if (it == clients_.end()) return;
+        it->second.subscribed = true;
+        it->second.interval = chrono::milliseconds(max(50, (int)(interval_sec * 1000)));
+        it->second.next_push = chrono::steady_clock::now() + it->second.interval;
+    }
+    
+    void unsubscribeCurrent() {
+        auto it = clients_.find(pending_client_fd_);
+        if (it != clients_.end()) it->second.subscribed = false;
+    }
+    
+    bool hasSubscribers() const {
+        for (const auto& kv : clients_) {
+            if (kv.second.subscribed && !kv.second.closing) return true;
+        }
+        return false;
+    }
+    
+    // True if any subscriber's periodic metrics push is due
+    bool metricsDue() const {
+        auto now = chrono::steady_clock::now();
+        for (const auto& kv : clients_) {
+            if (kv.second.subscribed && !kv.second.closing && now >= kv.second.next_push) return true;
+        }
+        return false;
+    }
+    
+    // Push one JSON line to subscribers (due_only: only those whose interval elapsed)
+    void publish(const string& msg, bool due_only = false) {
+        auto now = chrono::steady_clock::now();
+        string line = msg + "\n";
+        vector<int> dead;
+        for (auto& kv : clients_) {
+            Client& client = kv.second;
+            if (!client.subscribed || client.closing) continue;
+            if (due_only && now < client.next_push) continue;
+            if (due_only) client.next_push = now + client.interval;
+            if (!sendAll(kv.first, line)) dead.push_back(kv.first);
+        }
+        for (int fd : dead) closeClient(fd);
+    }
+    
     int getPort() const { return port_; }
 
 private:
+    struct Client {
+        string buffer;
+        bool closing = false;  // peer sent EOF: answer remaining commands, then close
+        bool subscribed = false;
+        chrono::milliseconds interval{1000};
+        chrono::steady_clock::time_point next_push;
+    };
+    
+    void pollSockets() {
+        vector<struct pollfd> pfds;
+        pfds.push_back({server_fd_, POLLIN, 0});
+        for (const auto& kv : clients_) {
+            if (!kv.second.closing) pfds.push_back({kv.first, POLLIN, 0});
+        }
+        if (poll(pfds.data(), pfds.size(), 0) <= 0) return;
+        
+        if (pfds[0].revents & POLLIN) acceptClients();
+        for (size_t i = 1; i < pfds.size(); i++) {
+            if (pfds[i].revents & (POLLIN | POLLHUP | POLLERR)) readClient(pfds[i].fd);
+        }
+    }
+    
+    void acceptClients() {
+        while (true) {
+            struct sockaddr_in client_addr;
+            socklen_t client_len = sizeof(client_addr);
+            int client_fd = accept(server_fd_, (struct sockaddr*)&client_addr, &client_len);
+            if (client_fd < 0) break;
+            fcntl(client_fd, F_SETFL, O_NONBLOCK);
+            int one = 1;
+            setsockopt(client_fd, IPPROTO_TCP, TCP_NODELAY, &one, sizeof(one));
+            clients_[client_fd] = Client();
+        }
+    }
+    
+    void readClient(int fd) {
+        auto it = clients_.find(fd);
+        if (it == clients_.end()) return;
+        Client& client = it->second;
+        
+        char buffer[4096];
+        while (true) {
+            int n = recv(fd, buffer, sizeof(buffer), 0);
+            if (n > 0) {
+                client.buffer.append(buffer, n);
+                continue;
+            }
+            if (n < 0 && (errno == EAGAIN || errno == EWOULDBLOCK)) break;
+            client.closing = true;  // EOF or error
+            break;
+        }
+        
+        size_t pos;
+        while ((pos = client.buffer.find('\n')) != string::npos) {
+            string line = client.buffer.substr(0, pos);
+            client.buffer.erase(0, pos + 1);
+            if (line.find_first_not_of(" \r\t") != string::npos) pending_.push_back({fd, line});
+        }
+        if (client.closing) {
+            // Legacy client: single command without trailing newline
+            if (client.buffer.find_first_not_of(" \r\t") != string::npos) {
+                pending_.push_back({fd, client.buffer});
+            }
+            client.buffer.clear();
+            if (!hasPending(fd)) closeClient(fd);
+        }
+    }
+    
+    bool hasPending(int fd) const {
+        for (const auto& p : pending_) {
+            if (p.first == fd) return true;
+        }
+        return false;
+    }
+    
+    bool sendAll(int fd, const string& data) {
+        size_t sent = 0;
+        int retries = 0;
+        while (sent < data.length()) {
+            ssize_t n = send(fd, data.c_str() + sent, data.length() - sent, MSG_NOSIGNAL);
+            if (n > 0) {
+                sent += n;
+            } else if (n < 0 && (errno == EAGAIN || errno == EWOULDBLOCK) && retries++ < 100) {
+                this_thread::sleep_for(chrono::milliseconds(1));
+            } else {
+                return false;
+            }
+        }
+        return true;
+    }
+    
+    void closeClient(int fd) {
+        ::close(fd);
+        clients_.erase(fd);
+        pending_.erase(remove_if(pending_.begin(), pending_.end(),
+                                 [fd](const pair<int, string>& p) { return p.first == fd; }),
+                       pending_.end());
+    }
+    
     int server_fd_;
     int port_;
     int pending_client_fd_ = -1;
+    map<int, Client> clients_;
+    deque<pair<int, string>> pending_;
     atomic<bool> running_;
 };
 
@@ -582,7 +728,7 @@ public:
     
     void run() {
         cout << "\n[Ready] Waiting for commands..." << endl;
-        cout << "Commands: start_stream, stop_stream, start_record, stop_record, get_status, quit\n" << endl;
+        cout << "Commands: start_stream, stop_stream, start_record, stop_record, get_status, subscribe_status, quit\n" << endl;
         
         Mat zed_left, zed_right;
         cv::Mat stereo_image(stream_config_.height, stream_config_.width * 2, CV_8UC3);
@@ -596,6 +742,8 @@ public:
             string cmd;
             if (control_server_->pollCommand(cmd)) {
                 handleCommand(cmd);
+                updateState();
+                publishStatus();
             }
             
             // Grab frame
@@ -654,6 +802,7 @@ public:
             
             // Update state
             updateState();
+            publishStatus();
             
             // Preview
             if (show_preview_) {
@@ -761,14 +910,25 @@ private:
         else if (action == "get_status") {
             updateState();
             response["status"] = "ok";
-            response["state"] = stateToString(state_);
-            response["streaming"] = (sender_ && sender_->isRunning()) ? "true" : "false";
-            response["recording"] = (recorder_ && recorder_->isRecording()) ? "true" : "false";
-            if (recorder_ && recorder_->isRecording()) {
-                response["recording_file"] = recorder_->getFilepath();
-            }
+            addStatusFields(response);
             response["control_port"] = to_string(control_server_->getPort());
         }
+        else if (action == "subscribe_status") {
+            // Push {"event":"state"} on state change and {"event":"metrics"} every interval seconds
+            float interval = cmd.getFloat("interval", 1.0f);
+            control_server_->subscribeCurrent(interval);
+            updateState();
+            published_state_ = state_;
+            response["status"] = "ok";
+            response["message"] = "Subscribed";
+            response["interval"] = to_string(interval);
+            addStatusFields(response);
+        }
+        else if (action == "unsubscribe_status") {
+            control_server_->unsubscribeCurrent();
+            response["status"] = "ok";
+            response["message"] = "Unsubscribed";
+        }
         else if (action == "set_stereo_params") {
             // Send stereo parameters to external device (VisionPro/Quest)
             string target_ip = cmd.get("target_ip","192.1680.");
@@ -806,6 +966,9 @@ private:
             response["message"] = "Unknown action: " + action;
         }
         
+        // Echo request id so pipelined clients can match responses
+        if (cmd.hasKey("id")) response["id"] = cmd.get("id");
+        
         string resp_str = SimpleJson::stringify(response);
         cout << "[Response] " << resp_str << endl;
         control_server_->sendResponse(resp_str);
@@ -852,6 +1015,64 @@ private:
         return response.empty() ? "ok" : response;
     }
     
+    void addStatusFields(map<string, string>& out) {
+        out["state"] = stateToString(state_);
+        out["streaming"] = (sender_ && sender_->isRunning()) ? "true" : "false";
+        out["recording"] = (recorder_ && recorder_->isRecording()) ? "true" : "false";
+        if (recorder_ && recorder_->isRecording()) {
+            out["recording_file"] = recorder_->getFilepath();
+        }
+    }
+    
+    // Push state changes and periodic stream metrics to subscribe_status clients
+    void publishStatus() {
+        if (!control_server_->hasSubscribers()) {
+            published_state_ = state_;
+            return;
+        }
+        
+        if (state_ != published_state_) {
+            published_state_ = state_;
+            map<string, string> event;
+            event["event"] = "state";
+            addStatusFields(event);
+            control_server_->publish(SimpleJson::stringify(event));
+        }
+        
+        if (!control_server_->metricsDue()) return;
+        
+        auto now = chrono::steady_clock::now();
+        double elapsed = chrono::duration<double>(now - metrics_time_).count();
+        uint64_t frames = sender_ ? sender_->framesSent() : 0;
+        uint64_t bytes = sender_ ? sender_->bytesSent() : 0;
+        // A new sender (start_stream) restarts its counters
+        if (frames < metrics_frames_ || bytes < metrics_bytes_) {
+            metrics_frames_ = 0;
+            metrics_bytes_ = 0;
+        }
+        
+        map<string, string> event;
+        event["event"] = "metrics";
+        addStatusFields(event);
+        if (elapsed > 0) {
+            event["fps"] = to_string((frames - metrics_frames_) / elapsed);
+            event["bitrate_bps"] = to_string((bytes - metrics_bytes_) * 8.0 / elapsed);
+        }
+        event["frames_sent"] = to_string(frames);
+        event["dropped_frames"] = to_string(sender_ ? sender_->framesDropped() : 0);
+        event["bytes_sent"] = to_string(bytes);
+        if (recorder_ && recorder_->isRecording()) {
+            error_code ec;
+            auto size = fs::file_size(recorder_->getFilepath(), ec);
+            event["recording_bytes"] = to_string(ec ? 0 : (uint64_t)size);
+        }
+        control_server_->publish(SimpleJson::stringify(event), true);
+        
+        metrics_time_ = now;
+        metrics_frames_ = frames;
+        metrics_bytes_ = bytes;
+    }
+    
     void updateState() {
         bool streaming = sender_ && sender_->isRunning();
         bool recording = recorder_ && recorder_->isRecording();
@@ -891,6 +1112,10 @@ private:
     RecordConfig record_config_;
     
     AppState state_;
+    AppState published_state_ = AppState::IDLE;
+    chrono::steady_clock::time_point metrics_time_ = chrono::steady_clock::now();
+    uint64_t metrics_frames_ = 0;
+    uint64_t metrics_bytes_ = 0;
     atomic<bool> running_;
     bool show_preview_;
 };
@@ -908,6 +1133,7 @@ void printHelp() {
     cout << "  {\"action\": \"start_record\", \"path\": \"./videos\", \"filename\": \"test\"}\n";
     cout << "  {\"action\": \"stop_record\"}\n";
     cout << "  {\"action\": \"get_status\"}\n";
+    cout << "  {\"action\": \"subscribe_status\", \"interval\": 1.0}   (keep connection open for push events)\n";
     cout << "  {\"action\": \"set_stereo_params\", \"target_ip\": \"192.168.0.140\", \"focus\": 0.0, \"quad\": 1.8, \"zoom\": 1.0}\n";
     cout << "  {\"action\": \"quit\"}\n";
     cout << endl;
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+ZED_VisionPro_Stream 제어 서버 대역 (테스트용)
+ZED 카메라/C++ 빌드 없이 VisionProController를 시험할 수 있도록 같은 JSON 프로토콜을 구현합니다.
+
+사용법:
+    python3 mock_visionpro_server.py --port 12345
+"""
+
+import os
+import time
+import threading
+
+from visionpro_controller import _stream_module
+
+JsonLineServer = _stream_module("control_channel").JsonLineServer
+
+
+class MockVisionProServer(JsonLineServer):
+    """
+    start_stream / stop_stream / start_record / stop_record / get_status / set_stereo_params / quit
+    + subscribe_status / unsubscribe_status (상태 변화 시 {"event": "state"}, interval마다 {"event": "metrics"} push)
+
+    스트리밍 지표는 가상 값: fps = 30, 비트레이트는 quality에 비례, 녹화 파일 크기는 시간에 비례하여 증가
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, fps=30.0):
+        super().__init__(self.handle, host, port)
+        self.streaming = False
+        self.recording = False
+        self.recording_file = ""
+        self.stream_config = {}
+        self.stereo_params = {}
+        self.quit_requested = False
+
+        self.fps = fps
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.recording_bytes = 0
+        self._subscribers = {}  # sock -> [interval, next_push]
+        self._sub_lock = threading.Lock()
+        self._last_state = self.state
+        self._last_tick = time.monotonic()
+        self._push_thread = None
+
+    @property
+    def state(self):
+        if self.streaming and self.recording:
+            return "streaming_recording"
+        if self.streaming:
+            return "streaming"
+        if self.recording:
+            return "recording"
+        return "stopped" if self.quit_requested else "idle"
+
+    def _status_fields(self):
+        status = {"state": self.state, "streaming": self.streaming, "recording": self.recording}
+        if self.recording:
+            status["recording_file"] = self.recording_file
+        return status
+
+    def metrics(self, elapsed):
+        """가상 스트리밍/녹화 지표를 elapsed초만큼 진행시키고 현재 값 반환"""
+        fps = self.fps if self.streaming else 0.0
+        bitrate = fps * 400.0 * int(self.stream_config.get("quality") or 50) * 8 if self.streaming else 0.0
+        self.frames_sent += int(round(fps * elapsed))
+        self.bytes_sent += int(bitrate / 8 * elapsed)
+        if self.recording:
+            self.recording_bytes += int(2_000_000 * elapsed)
+        out = {"fps": fps, "bitrate_bps": bitrate, "frames_sent": self.frames_sent,
+               "dropped_frames": 0, "bytes_sent": self.bytes_sent}
+        if self.recording:
+            out["recording_bytes"] = self.recording_bytes
+        return out
+
+    def handle(self, cmd):
+        action = cmd.get("action", "")
+        if action == "subscribe_status":
+            interval = max(float(cmd.get("interval", 1.0)), 0.05)
+            with self._sub_lock:
+                self._subscribers[self.current_socket()] = [interval, time.monotonic() + interval]
+            return {"status": "ok", "message": "Subscribed", "interval": interval, **self._status_fields()}
+        if action == "unsubscribe_status":
+            with self._sub_lock:
+                self._subscribers.pop(self.current_socket(), None)
+            return {"status": "ok", "message": "Unsubscribed"}
+        if action == "start_stream":
+            self.stream_config = {k: cmd.get(k) for k in ("ip", "port", "quality", "width", "height")}
+            self.streaming = True
+            return {"status": "ok", "message": "Streaming started"}
+        if action == "stop_stream":
+            self.streaming = False
+            return {"status": "ok", "message": "Streaming stopped"}
+        if action == "start_record":
+            path = cmd.get("path", ".")
+            filename = cmd.get("filename", "recording")
+            self.recording_file = os.path.join(path, filename + ".mp4")
+            self.recording = True
+            return {"status": "ok", "message": "Recording started", "filepath": self.recording_file}
+        if action == "stop_record":
+            if not self.recording:
+                return {"status": "ok", "message": "No active recording"}
+            self.recording = False
+            return {"status": "ok", "message": "Recording stopped", "filepath": self.recording_file}
+        if action == "get_status":
+            return {"status": "ok", **self._status_fields(), "control_port": self.port}
+        if action == "set_stereo_params":
+            if not cmd.get("target_ip"):
+                return {"status": "error", "message": "target_ip required"}
+            self.stereo_params = {k: cmd[k] for k in ("focus", "quad", "zoom", "add_focus") if k in cmd}
+            return {"status": "ok", "message": "Stereo params sent", "device_response": "ok"}
+        if action == "quit":
+            self.quit_requested = True
+            return {"status": "ok", "message": "Shutting down"}
+        return {"status": "error", "message": "Unknown action: " + action}
+
+    # ------------------------------------------------------------------
+    def _serve_line(self, sock, line):
+        super()._serve_line(sock, line)
+        # 응답을 먼저 보낸 뒤 상태 변화 push (C++ 서버와 같은 순서)
+        state = self.state
+        if state != self._last_state:
+            self._last_state = state
+            self.publish({"event": "state", **self._status_fields()})
+
+    def _on_disconnect(self, sock):
+        with self._sub_lock:
+            self._subscribers.pop(sock, None)
+
+    def publish(self, msg, due_only=False):
+        """구독자에게 push (due_only=True면 interval이 지난 구독자에게만)"""
+        now = time.monotonic()
+        with self._sub_lock:
+            targets = []
+            for sock, sub in self._subscribers.items():
+                if due_only and now < sub[1]:
+                    continue
+                sub[1] = now + sub[0]
+                targets.append(sock)
+        for sock in targets:
+            try:
+                self.send(sock, msg)
+            except OSError:
+                self._on_disconnect(sock)
+
+    def _push_loop(self):
+        while not self._stopped.wait(0.05):
+            now = time.monotonic()
+            metrics = self.metrics(now - self._last_tick)
+            self._last_tick = now
+            if self._subscribers:
+                self.publish({"event": "metrics", **self._status_fields(), **metrics}, due_only=True)
+
+    def start(self):
+        super().start()
+        self._stopped = threading.Event()
+        self._push_thread = threading.Thread(target=self._push_loop, daemon=True)
+        self._push_thread.start()
+        return self
+
+    def stop(self):
+        if self._push_thread is not None:
+            self._stopped.set()
+            self._push_thread.join(timeout=1.0)
+        super().stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mock ZED_VisionPro_Stream control server")
+    parser.add_argument("--port", type=int, default=0, help="Control server port (0 for auto)")
+    args = parser.parse_args()
+
+    server = MockVisionProServer("0.0.0.0", args.port).start()
+    print(f"[Control Server] Listening on port: {server.port}")
+    try:
+        while not server.quit_requested:
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        pass
+    server.stop()
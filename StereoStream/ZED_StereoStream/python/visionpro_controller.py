@@ -4,11 +4,49 @@ VisionPro Stream Controller
 Python client for controlling ZED_VisionPro_Stream C++ application
 """
 
+import os
+import sys
 import socket
 import json
 import time
+import importlib.util
+from concurrent.futures import Future
 from typing import Optional, Dict, Any
 
+_STREAM_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+
+def _stream_module(module):
+    """
+    StereoStream/<module>.py를 sys.path를 바꾸지 않고 파일 경로로 로드 (XRHandReceiver.py와 동일)
+    - 같은 파일이 이미 import되어 있으면 그 모듈을 사용
+    - 그 이름이 비어 있을 때만 sys.modules에 등록 (앱에 같은 이름의 다른 모듈이 있으면 건드리지 않음)
+    """
+    path = os.path.join(_STREAM_DIR, module + ".py")
+    mod = sys.modules.get(module)
+    if mod is not None and os.path.abspath(getattr(mod, "__file__", None) or "") == path:
+        return mod
+    register = mod is None
+    spec = importlib.util.spec_from_file_location(module if register else f"_visionpro_{module}", path)
+    mod = importlib.util.module_from_spec(spec)
+    if register:
+        sys.modules[module] = mod
+    try:
+        spec.loader.exec_module(mod)
+    except BaseException:
+        if register:
+            del sys.modules[module]
+        raise
+    return mod
+
+
+# StereoStream/control_channel.py (지속 연결 NDJSON 클라이언트) 공유
+JsonLineClient = _stream_module("control_channel").JsonLineClient
+
+# 두 번 실행되어도 결과가 같은 명령 → 연결이 끊기면 재연결 후 다시 보냄
+# (녹화/스트리밍 시작·중지, quit 등은 서버가 이미 실행했을 수 있으므로 재전송하지 않음)
+IDEMPOTENT_ACTIONS = frozenset({"get_status", "set_stereo_params", "subscribe_status", "unsubscribe_status"})
+
 
 class VisionProController:
     """
@@ -37,18 +75,126 @@ class VisionProController:
         controller.quit()
     """
     
-    def __init__(self, host: str = "localhost", port: int = 0):
+    def __init__(self, host: str = "localhost", port: int = 0,
+                 persistent: bool = True, status_ttl: float = 0.2):
         """
         Args:
             host: C++ 서버 호스트 주소
             port: C++ 제어 서버 포트 번호
+            persistent: True면 연결 하나를 유지하며 줄 단위 JSON으로 명령 전송 (요청마다 연결하지 않음)
+            status_ttl: get_status 결과 캐시 유지 시간(초). is_streaming / is_recording / state 속성이 공유
         """
         self.host = host
         self.port = port
         self.timeout = 5.0
-    
+        self.status_ttl = status_ttl
+        self._client = JsonLineClient(host, port, timeout=self.timeout) if persistent else None
+        self._status_cache: Optional[Dict[str, Any]] = None
+        self._status_time = 0.0
+        self._sub_client: Optional[JsonLineClient] = None
+        self._sub_callback = None
+        self.latest_metrics: Optional[Dict[str, Any]] = None
+
+    def close(self):
+        """지속 연결 종료"""
+        self.unsubscribe_status()
+        if self._client is not None:
+            self._client.close()
+
+    def subscribe_status(self, callback=None, interval: float = 1.0) -> Dict[str, Any]:
+        """
+        상태 push 구독 (get_status 폴링 대체)
+        
+        전용 연결 하나로 subscribe_status를 보내면 서버가 다음 메시지를 push:
+            {"event": "state", "state": ..., "streaming": ..., "recording": ..., "recording_file": ...}  상태 변화 시
+            {"event": "metrics", "state": ..., "fps": ..., "bitrate_bps": ..., "dropped_frames": ...,
+             "recording_bytes": ...}                                                             interval초마다
+            {"event": "disconnected"}                                                            연결이 끊겼을 때
+        구독 중에는 get_status / is_streaming / is_recording / state가 push된 값을 반환 (서버에 묻지 않음)
+        
+        Args:
+            callback: push 메시지(dict)마다 호출되는 함수 (수신 스레드에서 호출되므로 오래 막지 말 것)
+            interval: metrics push 주기(초)
+        """
+        self.unsubscribe_status()
+        self._sub_callback = callback
+        client = JsonLineClient(self.host, self.port, timeout=self.timeout, on_message=self._on_push)
+        self._sub_client = client
+        resp = client.request({"action": "subscribe_status", "interval": interval}, idempotent=True)
+        resp.pop("id", None)
+        if resp.get("status") != "ok":
+            # 요청 중 끊김 이벤트로 _sub_client가 이미 비워졌을 수 있으므로 지역 변수로 닫음
+            client.close()
+            if self._sub_client is client:
+                self._sub_client = None
+            return resp
+        self._update_status_cache(resp)
+        return resp
+
+    def unsubscribe_status(self):
+        """상태 push 구독 해제"""
+        client, self._sub_client = self._sub_client, None
+        if client is not None:
+            client.request({"action": "unsubscribe_status"}, timeout=1.0, idempotent=True)
+            client.close()
+        self._sub_callback = None
+
+    @property
+    def subscribed(self) -> bool:
+        return self._sub_client is not None
+
+    def _update_status_cache(self, msg: Dict[str, Any]):
+        status = {"status": "ok"}
+        for key in ("state", "streaming", "recording", "recording_file"):
+            if key in msg:
+                status[key] = msg[key]
+        self._status_cache = status
+        self._status_time = time.monotonic()
+
+    def _on_push(self, msg: Dict[str, Any]):
+        event = msg.get("event")
+        if event == "disconnected":
+            # 구독 연결이 끊기면 폴링으로 복귀 (클라이언트를 닫아 재연결/재전송으로 소켓·수신 스레드가 남지 않게 함)
+            client, self._sub_client = self._sub_client, None
+            if client is not None:
+                client.close()
+            self._status_cache = None
+        elif "state" in msg:
+            self._update_status_cache(msg)
+            if event == "metrics":
+                self.latest_metrics = msg
+        callback = self._sub_callback
+        if callback is not None:
+            callback(msg)
+
+    def send_async(self, command: Dict[str, Any]) -> Future:
+        """
+        응답을 기다리지 않고 명령 전송 (persistent 모드에서는 여러 명령을 파이프라이닝)
+        Returns:
+            concurrent.futures.Future (결과는 서버 응답 딕셔너리)
+        """
+        if command.get("action") != "get_status" and not self.subscribed:
+            self._status_cache = None
+        if self._client is not None:
+            return self._client.request_async(command, idempotent=command.get("action") in IDEMPOTENT_ACTIONS)
+        fut = Future()
+        fut.set_result(self._send_command_once(command))
+        return fut
+
     def _send_command(self, command: Dict[str, Any]) -> Dict[str, Any]:
-        """TCP로 명령 전송 후 응답 수신"""
+        """명령 전송 후 응답 수신"""
+        if command.get("action") != "get_status" and not self.subscribed:
+            # 상태를 바꾸는 명령 → 캐시 무효화 (구독 중이면 서버가 state 이벤트로 갱신)
+            self._status_cache = None
+        if self._client is not None:
+            resp = self._client.request(command, timeout=self.timeout,
+                                        idempotent=command.get("action") in IDEMPOTENT_ACTIONS)
+            resp.pop("id", None)
+            return resp
+        return self._send_command_once(command)
+
+    def _send_command_once(self, command: Dict[str, Any]) -> Dict[str, Any]:
+        """TCP로 명령 전송 후 응답 수신 (명령마다 새 연결)"""
         try:
             with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
                 # 명령 전송
@@ -126,10 +272,14 @@ class VisionProController:
         """영상 녹화 중지"""
         return self._send_command({"action": "stop_record"})
     
-    def get_status(self) -> Dict[str, Any]:
+    def get_status(self, max_age: Optional[float] = None) -> Dict[str, Any]:
         """
         현재 상태 조회
         
+        Args:
+            max_age: 이 시간(초) 이내에 받은 결과가 있으면 서버에 묻지 않고 캐시 반환
+                     (기본: status_ttl, 0이면 항상 새로 조회. subscribe_status 중에는 push된 상태를 반환)
+        
         Returns:
             {
                 "status": "ok",
@@ -140,7 +290,16 @@ class VisionProController:
                 "control_port": 12345
             }
         """
-        return self._send_command({"action": "get_status"})
+        max_age = self.status_ttl if max_age is None else max_age
+        now = time.monotonic()
+        cache = self._status_cache
+        if cache is not None and (self.subscribed or now - self._status_time <= max_age):
+            return cache
+        status = self._send_command({"action": "get_status"})
+        if status.get("status") == "ok":
+            self._status_cache = status
+            self._status_time = now
+        return status
     
     def set_stereo_params(self, target_ip: str, target_port: int = 9004,
                           focus: Optional[float] = None,
@@ -209,7 +368,7 @@ def main():
     parser.add_argument("--port", type=int, required=True, help="Control server port")
     parser.add_argument("--action", required=True, 
                        choices=["start_stream", "stop_stream", "start_record", 
-                               "stop_record", "status", "set_stereo_params", "quit"],
+                               "stop_record", "status", "subscribe", "set_stereo_params", "quit"],
                        help="Action to perform")
     
     # Stream options
@@ -231,6 +390,9 @@ def main():
     parser.add_argument("--zoom", type=float, help="Zoom parameter (1.0 ~ 2.0)")
     parser.add_argument("--add-focus", action="store_true", help="Add focus flag")
     
+    # Subscribe options
+    parser.add_argument("--interval", type=float, default=1.0, help="Metrics push interval (subscribe)")
+    
     args = parser.parse_args()
     
     controller = VisionProController(args.host, args.port)
@@ -254,6 +416,16 @@ def main():
         result = controller.stop_record()
     elif args.action == "status":
         result = controller.get_status()
+    elif args.action == "subscribe":
+        # Ctrl+C까지 push 메시지 출력
+        result = controller.subscribe_status(callback=lambda msg: print(json.dumps(msg)),
+                                             interval=args.interval)
+        print(json.dumps(result))
+        try:
+            while controller.subscribed:
+                time.sleep(0.2)
+        except KeyboardInterrupt:
+            pass
     elif args.action == "set_stereo_params":
         if not args.target_ip:
             print("Error: --target-ip required for set_stereo_params")
@@ -271,6 +443,7 @@ def main():
     else:
         result = {"status": "error", "message": "Unknown action"}
     
+    controller.close()
     print(json.dumps(result, indent=2))
     return 0 if result.get("status") == "ok" else 1
 
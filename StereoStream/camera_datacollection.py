@@ -1,13 +1,111 @@
 import os
 import time
-import pyrealsense2 as rs
 import numpy as np
 import cv2
 import threading
 from collections import deque
 
+import stream_metrics
+
+try:
+    import pyrealsense2 as rs
+except ImportError:
+    # 카메라 없이 FrameSet / FrameRing / camera_sources(합성·재생 소스)만 쓰는 환경
+    rs = None
+
+
+class FrameSet(tuple):
+    """
+    (color, depth, streo1, streo2) 튜플 + 프레임 메타데이터(meta)
+    기존처럼 4개 값으로 언패킹할 수 있고, frames.meta로 캡처 시각 등을 얻을 수 있습니다.
+      - frame_number: RealSense 프레임 번호
+      - timestamp_ms: 프레임 타임스탬프 (ms, timestamp_domain 기준)
+      - timestamp_domain: "global_time" / "system_time" / "hardware_clock"
+      - capture_time: time.time() 기준 캡처 시각 (hardware_clock이면 호스트 수신 시각으로 대체)
+      - host_time: 호스트가 프레임을 받은 time.time()
+    """
+    def __new__(cls, frames, meta=None):
+        obj = super().__new__(cls, frames)
+        obj.meta = meta if meta is not None else {}
+        return obj
+
+
+class FrameRing:
+    """
+    미리 할당한 NumPy 버퍼 슬롯에 최신 프레임을 복사해 두는 링 버퍼 (생산자 1개 / 소비자 여러 개)
+
+    - write()는 스트림별 원본 버퍼(librealsense frame 데이터 등)를 다음 슬롯에 복사하고 순번(seq)을 붙임
+      → 라이브러리가 재사용하는 메모리를 그대로 들고 있지 않으며, 최초 1회 이후 할당 없음
+    - latest()는 가장 최근 슬롯의 (seq, FrameSet)을 반환. 배열은 슬롯 버퍼의 view이며
+      생산자가 slots - 1개 프레임을 더 쓰기 전까지 유효 (is_valid(seq)로 확인, 오래 보관하려면 copy)
+    - 새 프레임이 올 때까지 Condition으로 대기하므로 소비자가 폴링할 필요 없음
+    """
+    def __init__(self, slots=4):
+        if slots < 2:
+            raise ValueError("slots는 2 이상이어야 합니다.")
+        self.slots = slots
+        self._buffers = [None] * slots   # 슬롯별 [color, depth, streo1, streo2] 버퍼 목록
+        self._meta = [None] * slots
+        self._seq = -1
+        self._cond = threading.Condition()
+        self.frames_written = 0
+
+    def _slot_buffers(self, slot, arrays):
+        bufs = self._buffers[slot]
+        if bufs is None or any(
+                (a is None) != (b is None) or (a is not None and (a.shape != b.shape or a.dtype != b.dtype))
+                for a, b in zip(arrays, bufs)):
+            # 최초 프레임 또는 해상도/포맷 변경 시에만 할당
+            bufs = [None if a is None else np.empty_like(a) for a in arrays]
+            self._buffers[slot] = bufs
+        return bufs
+
+    def write(self, arrays, meta):
+        """arrays: 스트림별 배열(또는 None) 목록을 다음 슬롯에 복사하고 게시"""
+        seq = self._seq + 1
+        slot = seq % self.slots
+        bufs = self._slot_buffers(slot, arrays)
+        for src, dst in zip(arrays, bufs):
+            if src is not None:
+                np.copyto(dst, src)
+        meta = dict(meta)
+        meta["seq"] = seq
+        self._meta[slot] = meta
+        with self._cond:
+            self._seq = seq
+            self.frames_written += 1
+            self._cond.notify_all()
+        return seq
+
+    def is_valid(self, seq):
+        """seq 프레임의 슬롯이 아직 덮어써지지 않았는지"""
+        return seq is not None and 0 <= self._seq - seq < self.slots - 1
+
+    def latest(self, after_seq=-1, timeout=None):
+        """
+        after_seq보다 새로운 프레임이 생길 때까지 대기 후 (seq, FrameSet) 반환
+        timeout 초과 시 (None, None)
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > after_seq, timeout):
+                return None, None
+            seq = self._seq
+        slot = seq % self.slots
+        return seq, FrameSet(tuple(self._buffers[slot]), self._meta[slot])
+
+
 class RealsenseCamera:
-    def __init__(self, name_keyword=None, height=480, width=640, fps=15, use_color=True, use_depth=False, use_streo=False,reset_on_start=True):
+    def __init__(self, name_keyword=None, height=480, width=640, fps=15, use_color=True, use_depth=False, use_streo=False,reset_on_start=True,
+                 capture_mode="poll", ring_slots=4):
+        """
+        - capture_mode: "poll"(기본, reader 스레드가 wait_for_frames) /
+          "callback"(pipeline 프레임 콜백이 FrameRing의 미리 할당된 버퍼에 복사, 폴링 스레드 없음)
+        - ring_slots: callback 모드의 FrameRing 슬롯 수
+        - on_frames (속성): 모든 FrameSet마다 호출되는 콜백. callback 모드에서는 FrameRing 슬롯 view를
+          복사 없이 넘기므로 배열은 ring_slots - 1개 프레임이 더 들어오기 전까지만 유효
+          (콜백 안에서 처리하거나 복사해서 보관, self.ring.is_valid(frames.meta["seq"])로 확인 가능)
+        - frame_queue에는 callback 모드에서도 복사본이 들어가므로 기간 제한 없이 보관 가능
+        """
         self.name_keyword = name_keyword
         self.height = height
         self.width = width
@@ -16,6 +114,18 @@ class RealsenseCamera:
         self.use_depth = use_depth
         self.use_streo = use_streo
         self.reset_on_start = reset_on_start
+        if capture_mode not in ("poll", "callback"):
+            raise ValueError(f"지원하지 않는 capture_mode: {capture_mode}")
+        self.capture_mode = capture_mode
+        self.ring = FrameRing(ring_slots) if capture_mode == "callback" else None
+        self._last_seq = -1
+        self.callback_errors = 0
+
+        # Prometheus 메트릭 (stream_metrics.start_http_server로 노출)
+        camera = name_keyword or "default"
+        self._m_frames = stream_metrics.counter("camera_frames_total", "수신한 프레임셋 수", camera=camera)
+        self._m_timeouts = stream_metrics.counter("camera_timeouts_total", "프레임 대기 시간 초과/읽기 실패 수", camera=camera)
+        self._m_callback_errors = stream_metrics.counter("camera_callback_errors_total", "callback 모드 프레임 처리 오류 수", camera=camera)
 
         self.pipeline = None
         self.config = None
@@ -23,6 +133,7 @@ class RealsenseCamera:
         self.is_opened = False
 
         self.frame_queue = deque(maxlen=1)  # 또는 maxlen=N으로 지정
+        self.on_frames = None  # 선택: 모든 FrameSet마다 호출되는 콜백 (예: EpisodeRecorder.attach_camera, callback 모드는 슬롯 view)
         self.reader_thread = None
         self.running = False
 
@@ -30,10 +141,14 @@ class RealsenseCamera:
         self.depth_intrinsics = None;
         self.ir1_intrinsics = None;
         self.ir2_intrinsics = None;
+        self.ir1_to_ir2_extrinsics = None;
 
         self._setup()
 
     def _setup(self):
+        if rs is None:
+            print("[WARNING] pyrealsense2 모듈이 없습니다. pip install pyrealsense2 후 사용하세요.")
+            return
         ctx = rs.context()
         devices = ctx.query_devices()
         found = False
@@ -74,7 +189,10 @@ class RealsenseCamera:
         time.sleep(1)
         try:
             
-            self.pipeline_profile = self.pipeline.start(self.config)
+            if self.capture_mode == "callback":
+                self.pipeline_profile = self.pipeline.start(self.config, self._on_frames)
+            else:
+                self.pipeline_profile = self.pipeline.start(self.config)
             self.is_opened = True
             print(f"Camera {self.name_keyword} opened successfully.")
 
@@ -95,6 +213,8 @@ class RealsenseCamera:
 
                 self.ir1_intrinsics = ir1_profile.as_video_stream_profile().get_intrinsics()
                 self.ir2_intrinsics = ir2_profile.as_video_stream_profile().get_intrinsics()
+                # 스테레오 정렬(StereoRectifier)용 IR1 → IR2 외부 파라미터
+                self.ir1_to_ir2_extrinsics = ir1_profile.get_extrinsics_to(ir2_profile)
 
             if self.use_depth:
                 depth_profile = self.pipeline_profile.get_stream(rs.stream.depth).as_video_stream_profile()
@@ -118,6 +238,14 @@ class RealsenseCamera:
     def read(self):
         if not self.is_opened:
             return False, (None, None)
+        if self.ring is not None:
+            # callback 모드: 아직 읽지 않은 최신 프레임 (슬롯 버퍼 view)
+            seq, frames = self.ring.latest(self._last_seq, timeout=2.0)
+            if seq is None:
+                self._m_timeouts.inc()
+                return False, (None, None, None, None)
+            self._last_seq = seq
+            return True, frames
         try:
             frames = self.pipeline.wait_for_frames(timeout_ms=2000)
             color_frame = frames.get_color_frame() if self.use_color else None
@@ -130,12 +258,62 @@ class RealsenseCamera:
             depth = np.asanyarray(depth_frame.get_data()) if depth_frame else None            
             streo1 = np.asanyarray(streo1_frame.get_data()) if streo1_frame else None
             streo2 = np.asanyarray(streo2_frame.get_data()) if streo2_frame else None            
-            return True, (color, depth, streo1, streo2)
+            self._m_frames.inc()
+            return True, FrameSet((color, depth, streo1, streo2), self._frame_meta(frames))
         except Exception:
+            # wait_for_frames 시간 초과 (RuntimeError) 또는 프레임 변환 실패
+            self._m_timeouts.inc()
             return False, (None, None, None, None)
     
+    @staticmethod
+    def _frame_meta(frames):
+        """프레임셋 메타데이터 (캡처 시각은 global/system time 도메인일 때 time.time()과 같은 기준)"""
+        host_time = time.time()
+        ts_ms = frames.get_timestamp()
+        domain = frames.get_frame_timestamp_domain()
+        if domain in (rs.timestamp_domain.global_time, rs.timestamp_domain.system_time):
+            capture_time = ts_ms / 1000.0
+        else:
+            capture_time = host_time
+        meta = {
+            "frame_number": frames.get_frame_number(),
+            "timestamp_ms": ts_ms,
+            "timestamp_domain": str(domain).split(".")[-1],
+            "capture_time": capture_time,
+            "host_time": host_time,
+        }
+        # 센서 하드웨어 타임스탬프 (us, 펌웨어 메타데이터가 켜져 있을 때만)
+        if frames.supports_frame_metadata(rs.frame_metadata_value.sensor_timestamp):
+            meta["hw_timestamp_us"] = frames.get_frame_metadata(rs.frame_metadata_value.sensor_timestamp)
+        return meta
+
+    def _on_frames(self, frame):
+        """pipeline 프레임 콜백 (librealsense 스레드): 스트림별 데이터를 FrameRing 슬롯에 복사"""
+        try:
+            if not frame.is_frameset():
+                return
+            frames = frame.as_frameset()
+            color_frame = frames.get_color_frame() if self.use_color else None
+            depth_frame = frames.get_depth_frame() if self.use_depth else None
+            streo1_frame = frames.get_infrared_frame(1) if self.use_streo else None
+            streo2_frame = frames.get_infrared_frame(2) if self.use_streo else None
+            arrays = [np.asanyarray(f.get_data()) if f else None
+                      for f in (color_frame, depth_frame, streo1_frame, streo2_frame)]
+            self.ring.write(arrays, self._frame_meta(frames))
+            self._m_frames.inc()
+            latest = self.ring.latest()[1]
+            # 기존 소비자 호환: frame_queue 항목은 언제까지 보관될지 모르므로 슬롯 view가 아닌 복사본을 전달
+            self.frame_queue.append(FrameSet(tuple(None if a is None else a.copy() for a in latest),
+                                             dict(latest.meta)))
+            if self.on_frames is not None:
+                self.on_frames(latest)
+        except Exception:
+            self.callback_errors += 1
+            self._m_callback_errors.inc()
+
     def start_reader(self):
-        if not self.is_opened:
+        if not self.is_opened or self.ring is not None:
+            # callback 모드는 pipeline 콜백이 frame_queue를 채우므로 reader 스레드가 필요 없음
             return
         self.running = True
         self.reader_thread = threading.Thread(target=self._camera_reader)
@@ -143,9 +321,11 @@ class RealsenseCamera:
 
     def _camera_reader(self):
         while self.is_opened and self.running:
-            ret, (color, depth, streo1,streo2) = self.read()
+            ret, frames = self.read()
             if ret:
-                self.frame_queue.append((color, depth, streo1, streo2))
+                self.frame_queue.append(frames)
+                if self.on_frames is not None:
+                    self.on_frames(frames)
 
     def stop_reader(self):
         self.running = False
@@ -185,7 +365,7 @@ if __name__ == "__main__":
 
     while True:
         if cam1.is_opened:
-            if not cam1.frame_queue:
+            if cam1.frame_queue:
                 color1, _,s1,s2 = cam1.frame_queue.popleft()
                 if color1 is not None:
                     color1_crop = color1[:,848-640:];
@@ -198,7 +378,7 @@ if __name__ == "__main__":
             pass
 
         if cam2.is_opened:
-            if not cam2.frame_queue:
+            if cam2.frame_queue:
                 color2, _ , _, _= cam2.frame_queue.popleft()
                 if color2 is not None:
                     color2_crop = color2;
@@ -0,0 +1,401 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+import numpy as np
+import cv2
+
+from camera_datacollection import FrameSet, RealsenseCamera
+
+# 모든 소스가 공유하는 시간 기준 (같은 fps의 소스는 같은 프레임 격자에 맞춰 캡처 → genlock된 카메라처럼 동작)
+_EPOCH = time.time()
+
+
+class CameraSource:
+    """
+    RealsenseCamera와 같은 인터페이스의 카메라 소스 기반 클래스
+
+    - read() -> (ret, FrameSet(color, depth, streo1, streo2))
+    - start_reader()로 reader 스레드가 frame_queue(deque(maxlen=1))를 채움
+    - release()로 정리
+    하위 클래스는 _grab(n) -> (frames 튜플, meta 딕셔너리) 또는 None(끝)을 구현합니다.
+
+    realtime=True면 fps에 맞춰 프레임 간격을 유지하고, False면 가능한 한 빨리 생성(처리량 벤치마크용).
+    meta의 timestamp_ms / capture_time은 프레임 번호로 정해지는 가상 시각이므로 실행마다 같은 간격이며,
+    첫 프레임은 공통 기준(_EPOCH)의 1/fps 격자에 맞춰 시작하므로 여러 소스의 capture_time을 서로 비교할 수 있습니다.
+    """
+    timestamp_domain = "synthetic"
+
+    def __init__(self, height=480, width=640, fps=30, use_color=True, use_depth=False, use_streo=False,
+                 realtime=True):
+        self.height = height
+        self.width = width
+        self.fps = fps
+        self.use_color = use_color
+        self.use_depth = use_depth
+        self.use_streo = use_streo
+        self.realtime = realtime
+
+        self.is_opened = True
+        self.frame_queue = deque(maxlen=1)
+        self.on_frames = None  # 선택: 모든 FrameSet마다 호출되는 콜백
+        self.reader_thread = None
+        self.running = False
+
+        self.frame_number = 0
+        self._t0_wall = None
+        self._t0 = None
+
+    def _grab(self, n):
+        raise NotImplementedError
+
+    def _start_clock(self):
+        """첫 프레임 시각을 공통 기준의 다음 프레임 격자로 맞춤"""
+        now_wall, now = time.time(), time.monotonic()
+        k = np.ceil((now_wall - _EPOCH) * self.fps)
+        self._t0_wall = _EPOCH + k / self.fps
+        self._t0 = now + (self._t0_wall - now_wall)
+
+    def _pace(self, n):
+        if not self.realtime or not self.fps:
+            return
+        delay = self._t0 + n / self.fps - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _meta(self, n, timestamp_s=None):
+        ts = n / self.fps if timestamp_s is None else timestamp_s
+        return {
+            "frame_number": n,
+            "timestamp_ms": ts * 1000.0,
+            "timestamp_domain": self.timestamp_domain,
+            "capture_time": self._t0_wall + ts,
+            "host_time": time.time(),
+        }
+
+    def read(self):
+        if not self.is_opened:
+            return False, (None, None)
+        if self._t0 is None:
+            self._start_clock()
+        n = self.frame_number
+        self._pace(n)
+        out = self._grab(n)
+        if out is None:
+            return False, (None, None, None, None)
+        self.frame_number += 1
+        frames, meta = out
+        return True, FrameSet(frames, meta)
+
+    def start_reader(self):
+        if not self.is_opened:
+            return
+        self.running = True
+        self.reader_thread = threading.Thread(target=self._camera_reader, daemon=True)
+        self.reader_thread.start()
+
+    def _camera_reader(self):
+        while self.is_opened and self.running:
+            ret, frames = self.read()
+            if ret:
+                self.frame_queue.append(frames)
+                if self.on_frames is not None:
+                    self.on_frames(frames)
+            elif self.is_opened:
+                # 재생이 끝난 소스 (loop=False)
+                self.running = False
+
+    def stop_reader(self):
+        self.running = False
+        if self.reader_thread is not None:
+            self.reader_thread.join()
+            self.reader_thread = None
+
+    def release(self):
+        self.stop_reader()
+        self.is_opened = False
+
+
+class SyntheticCamera(CameraSource):
+    """
+    움직이는 스테레오 패턴 합성 소스 (카메라 없이 캡처→합성→인코딩→전송 경로 시험/벤치마크)
+
+    - 고정 시드 random-dot 텍스처가 speed 픽셀/프레임으로 가로 이동
+    - streo2(오른쪽)는 streo1보다 disparity 픽셀 밀린 영상 → 실제 IR 스테레오 쌍처럼 시차가 있음
+    - depth는 텍스처와 함께 이동하는 800~1300 mm 기울기 평면 (z16)
+    - speed=0이면 정지 장면 (tiled 모드 시험용)
+    - 다중 카메라 동기화 시험용 타이밍 교란 (seed로 재현 가능):
+      offset_ms(시계 차이), jitter_ms(타임스탬프 표준편차), drop_rate(프레임 누락 확률)
+    """
+    def __init__(self, height=480, width=640, fps=30, use_color=True, use_depth=False, use_streo=True,
+                 realtime=True, speed=4, disparity=16, seed=0, max_frames=None,
+                 offset_ms=0.0, jitter_ms=0.0, drop_rate=0.0):
+        super().__init__(height, width, fps, use_color, use_depth, use_streo, realtime)
+        self.speed = int(speed)
+        self.disparity = int(disparity)
+        self.max_frames = max_frames
+        self.offset_ms = offset_ms
+        self.jitter_ms = jitter_ms
+        self.drop_rate = drop_rate
+        self._timing_rng = np.random.default_rng(seed + 1)
+
+        rng = np.random.default_rng(seed)
+        self._period = 256
+        tex = rng.integers(0, 256, size=(height // 4 + 1, self._period // 4), dtype=np.uint8)
+        tex = cv2.resize(tex, (self._period, height), interpolation=cv2.INTER_NEAREST)[:height]
+        reps = (width + self._period + self.disparity) // self._period + 1
+        self._gray = np.tile(tex, (1, reps))
+        self._color = cv2.applyColorMap(self._gray, cv2.COLORMAP_JET) if use_color else None
+        ramp = np.linspace(0, 500, self._gray.shape[1], dtype=np.float32)
+        self._depth = (800 + ramp[None, :] + np.zeros((height, 1), np.float32)).astype(np.uint16) \
+            if use_depth else None
+
+    def _grab(self, n):
+        if self.max_frames is not None and n >= self.max_frames:
+            return None
+        if self.drop_rate and self._timing_rng.random() < self.drop_rate:
+            # 누락된 프레임은 건너뛰고 다음 프레임 번호로 (실제 카메라의 frame_number 건너뜀과 같음)
+            self.frame_number += 1
+            n += 1
+            self._pace(n)
+        off = (n * self.speed) % self._period
+        w, d = self.width, self.disparity
+        color = self._color[:, off:off + w].copy() if self.use_color else None
+        depth = self._depth[:, off:off + w].copy() if self.use_depth else None
+        streo1 = self._gray[:, off + d:off + d + w].copy() if self.use_streo else None
+        streo2 = self._gray[:, off:off + w].copy() if self.use_streo else None
+        ts = n / self.fps + self.offset_ms / 1000.0
+        if self.jitter_ms:
+            ts += self._timing_rng.normal(0.0, self.jitter_ms / 1000.0)
+        return (color, depth, streo1, streo2), self._meta(n, ts)
+
+
+# 재생 디렉터리의 스트림별 파일 이름 (FrameSet 순서)
+REPLAY_STREAMS = ("color", "depth", "ir1", "ir2")
+
+
+class ReplayCamera(CameraSource):
+    """
+    디스크에 기록된 프레임 재생 소스
+
+    - 디렉터리: color.npy / depth.npy / ir1.npy / ir2.npy (N x H x W[x C], 있는 스트림만) +
+      선택적 timestamps.npy (초) + meta.json ({"fps": ...}). np.load(mmap_mode="r")로 열어
+      전체를 메모리에 올리지 않으며, 반환 배열은 읽기 전용 memmap view (수정하려면 copy)
+    - 동영상 파일(.mp4/.avi 등): layout="sbs"면 [left | right]를 흑백 IR 쌍으로, "color"면 color로 반환
+    - loop=True면 끝에서 처음으로 돌아감 (frame_number는 계속 증가)
+    """
+    timestamp_domain = "replay"
+
+    def __init__(self, path, fps=None, loop=True, realtime=True, layout="sbs"):
+        self.path = path
+        self.loop = loop
+        self.layout = layout
+        self._arrays = None
+        self._timestamps = None
+        self._cap = None
+
+        if os.path.isdir(path):
+            self._arrays = []
+            for name in REPLAY_STREAMS:
+                f = os.path.join(path, name + ".npy")
+                self._arrays.append(np.load(f, mmap_mode="r") if os.path.exists(f) else None)
+            present = [a for a in self._arrays if a is not None]
+            if not present:
+                raise FileNotFoundError(f"재생할 스트림(.npy)이 없습니다: {path}")
+            self.length = min(len(a) for a in present)
+            meta_path = os.path.join(path, "meta.json")
+            meta = {}
+            if os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    meta = json.load(f)
+            ts_path = os.path.join(path, "timestamps.npy")
+            if os.path.exists(ts_path):
+                self._timestamps = np.load(ts_path)
+            fps = fps or meta.get("fps", 30)
+            height, width = present[0].shape[1:3]
+            use = [a is not None for a in self._arrays]
+            super().__init__(height, width, fps, use[0], use[1], use[2] and use[3], realtime)
+        else:
+            self._cap = cv2.VideoCapture(path)
+            if not self._cap.isOpened():
+                raise FileNotFoundError(f"동영상을 열 수 없습니다: {path}")
+            self.length = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            fps = fps or self._cap.get(cv2.CAP_PROP_FPS) or 30
+            width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            if layout == "sbs":
+                super().__init__(height, width // 2, fps, False, False, True, realtime)
+            else:
+                super().__init__(height, width, fps, True, False, False, realtime)
+
+    def _grab(self, n):
+        if self._arrays is not None:
+            if n >= self.length and not self.loop:
+                return None
+            i = n % self.length
+            frames = tuple(a[i] if a is not None else None for a in self._arrays)
+            ts = None
+            if self._timestamps is not None:
+                # 반복 재생 시 회차마다 기록 길이만큼 시각을 이어 붙임
+                span = float(self._timestamps[-1] - self._timestamps[0]) + 1.0 / self.fps
+                ts = float(self._timestamps[i] - self._timestamps[0]) + (n // self.length) * span
+            return frames, self._meta(n, ts)
+
+        ok, img = self._cap.read()
+        if not ok:
+            if not self.loop:
+                return None
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, img = self._cap.read()
+            if not ok:
+                return None
+        if self.layout == "sbs":
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            w = self.width
+            return (None, None, gray[:, :w], gray[:, w:2 * w]), self._meta(n)
+        return (img, None, None, None), self._meta(n)
+
+    def _pace(self, n):
+        if self._timestamps is None or not self.realtime:
+            return super()._pace(n)
+        # 기록된 타임스탬프 간격대로 재생
+        i = n % self.length
+        span = float(self._timestamps[-1] - self._timestamps[0]) + 1.0 / self.fps
+        target = float(self._timestamps[i] - self._timestamps[0]) + (n // self.length) * span
+        delay = self._t0 + target - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def release(self):
+        super().release()
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+
+def write_replay(path, source, count, fps=None):
+    """
+    source(read()를 가진 카메라 소스)에서 count 프레임을 읽어 ReplayCamera 디렉터리 형식으로 저장
+    (첫 프레임 크기로 open_memmap을 미리 만들어 프레임마다 바로 기록)
+    """
+    os.makedirs(path, exist_ok=True)
+    files = [None] * len(REPLAY_STREAMS)
+    timestamps = np.zeros(count, dtype=np.float64)
+    n = 0
+    while n < count:
+        ret, frames = source.read()
+        if not ret:
+            break
+        for k, img in enumerate(frames):
+            if img is None:
+                continue
+            if files[k] is None:
+                files[k] = np.lib.format.open_memmap(
+                    os.path.join(path, REPLAY_STREAMS[k] + ".npy"), mode="w+",
+                    dtype=img.dtype, shape=(count,) + img.shape)
+            files[k][n] = img
+        timestamps[n] = frames.meta.get("timestamp_ms", n * 1000.0 / (fps or 30)) / 1000.0
+        n += 1
+    for f in files:
+        if f is not None:
+            f.flush()
+    if n < count:
+        # 소스가 먼저 끝난 경우 실제 길이로 잘라 다시 저장
+        for k, f in enumerate(files):
+            if f is not None:
+                np.save(os.path.join(path, REPLAY_STREAMS[k] + ".npy"), np.array(f[:n]))
+        timestamps = timestamps[:n]
+    np.save(os.path.join(path, "timestamps.npy"), timestamps)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({"fps": fps or getattr(source, "fps", 30), "frames": n}, f)
+    return n
+
+
+def open_camera(source, height=480, width=640, fps=30, **kwargs):
+    """
+    소스 문자열로 카메라 생성
+      - "synthetic"          → SyntheticCamera
+      - "replay:<경로>"       → ReplayCamera (디렉터리 또는 동영상 파일)
+      - 그 외                 → RealsenseCamera(name_keyword=source)
+    """
+    if source == "synthetic":
+        return SyntheticCamera(height=height, width=width, fps=fps, **kwargs)
+    if source.startswith("replay:"):
+        return ReplayCamera(source[len("replay:"):], fps=kwargs.pop("replay_fps", None), **kwargs)
+    return RealsenseCamera(name_keyword=source, height=height, width=width, fps=fps, **kwargs)
+
+
+if __name__ == "__main__":
+    # 카메라 없이 캡처 → 합성 → 인코딩 → 전송 → 재조립 처리량 측정 (loopback)
+    import argparse
+    from StereoStreamer import UdpImageSender
+    from StereoReceiver import UdpImageReceiver
+    from pipeline import SideBySideComposer
+
+    parser = argparse.ArgumentParser(description="StereoStream headless throughput benchmark")
+    parser.add_argument("--source", default="synthetic", help="synthetic / replay:<path> / RealSense 이름 키워드")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--fps", type=int, default=30, help="소스 fps (--unpaced면 타임스탬프에만 사용)")
+    parser.add_argument("--unpaced", action="store_true", help="fps 간격을 두지 않고 최대 속도로 생성")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--codec", default="jpeg")
+    parser.add_argument("--record", default=None, help="합성 프레임을 이 디렉터리에 저장만 하고 종료 (replay용)")
+    args = parser.parse_args()
+
+    if args.record:
+        src = SyntheticCamera(args.height, args.width, args.fps, use_color=False, realtime=False)
+        n = write_replay(args.record, src, int(args.fps * args.seconds), fps=args.fps)
+        print(f"[INFO] {n} 프레임 저장: {args.record}")
+        raise SystemExit(0)
+
+    if args.source == "synthetic" or args.source.startswith("replay:"):
+        cam = open_camera(args.source, args.height, args.width, args.fps, realtime=not args.unpaced)
+    else:
+        cam = open_camera(args.source, args.height, args.width, args.fps, use_color=False, use_streo=True,
+                          reset_on_start=False)
+
+    receiver = UdpImageReceiver(0, decode=False)
+    receiver.open()
+    w, h = cam.width, cam.height
+    sender = UdpImageSender("127.0.0.1", receiver.port, 2 * w, h, codec=args.codec, target_fps=args.fps)
+    sender.open()
+    sender.connect()
+
+    # send_image는 비동기(워커가 나중에 인코딩)이므로 버퍼를 돌려 쓰는 composer로 합성 → 인코딩 중인 프레임을 덮어쓰지 않음
+    compose_ir = SideBySideComposer(h, w)
+    compose_color = SideBySideComposer(h, w, streams=(0, 0))
+    n = 0
+    t_read = t_compose = t_send = 0.0
+    t_start = time.perf_counter()
+    try:
+        while time.perf_counter() - t_start < args.seconds:
+            t0 = time.perf_counter()
+            ret, frames = cam.read()
+            if not ret:
+                break
+            t1 = time.perf_counter()
+            sbs, capture_ts = compose_ir(frames) or compose_color(frames)
+            t2 = time.perf_counter()
+            sender.send_image(sbs, capture_ts=capture_ts)
+            t3 = time.perf_counter()
+            t_read += t1 - t0
+            t_compose += t2 - t1
+            t_send += t3 - t2
+            n += 1
+    finally:
+        elapsed = time.perf_counter() - t_start
+        time.sleep(0.2)
+        st, rst = sender.stats(), receiver.stats()
+        sender.close()
+        receiver.close()
+        cam.release()
+
+    print(f"[소스] {args.source} {w}x{h} | {n} 프레임 / {elapsed:.2f} s = {n / elapsed:.1f} fps")
+    if n:
+        print(f"[단계 평균] read {t_read / n * 1e3:.2f} ms | compose {t_compose / n * 1e3:.2f} ms"
+              f" | send_image {t_send / n * 1e3:.3f} ms")
+    print(f"[송신] 인코딩/전송 {st['frames_sent']} | 큐 드랍 {st['dropped_frames']}")
+    print(f"[수신] 완성 {rst['frames_complete']} | {rst['bytes'] * 8 / elapsed / 1e6:.1f} Mbit/s"
+          f" | 손실률 {rst['fragment_loss'] * 100:.2f}% | 재조립 p95 {rst['reassembly_ms_p95']:.2f} ms")
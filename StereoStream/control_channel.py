@@ -0,0 +1,336 @@
+import threading
+import socket
+import json
+import time
+import itertools
+import socketserver
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def _error(message):
+    return {"status": "error", "message": message}
+
+
+class JsonLineClient:
+    """
+    지속 연결 + 줄 단위 JSON(NDJSON) 요청/응답 클라이언트
+
+    - TCP 연결 하나를 유지하며 요청마다 {"id": n}을 붙여 전송 (응답을 기다리지 않고 여러 요청을 연속 전송 가능)
+    - 응답에 id가 있으면 id로, id가 아예 없으면 보낸 순서대로(FIFO) 요청과 매칭
+      (대기 목록에 없는 id의 응답 = 늦은/중복 응답은 버림)
+    - 서버가 연결을 끊으면 자동 재연결하고, 응답을 받지 못한 요청 중 idempotent=True로 보낸 것만
+      max_retries 회까지 다시 전송. 나머지(녹화 시작/중지 등 두 번 실행되면 안 되는 명령)는 "Connection closed"로 실패
+      (요청마다 연결을 닫는 기존 서버와도 동작: 매 요청마다 재연결하는 것과 같아짐)
+    - 실패 시 예외 대신 {"status": "error", "message": ...} 딕셔너리 반환 (기존 _send_command와 동일)
+    - on_message: 서버가 요청 없이 보내는 push 메시지({"event": ..., id 없음})를 받는 콜백.
+      연결이 끊기면 {"event": "disconnected"}로 한 번 호출
+
+    사용법:
+        client = JsonLineClient("localhost", 12345)
+        resp = client.request({"action": "get_status"}, idempotent=True)
+        fut = client.request_async({"action": "get_status"}, idempotent=True)   # concurrent.futures.Future
+        resp = fut.result()
+    """
+    def __init__(self, host, port, timeout=3.0, connect_timeout=None, max_retries=1, on_message=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout if connect_timeout is not None else timeout
+        self.max_retries = max_retries
+        self.on_message = on_message
+
+        self._sock: socket.socket | None = None
+        self._lock = threading.Lock()
+        self._pending = OrderedDict()  # id(str) -> [line, future, retries, idempotent]
+        self._ids = itertools.count(1)
+        self._generation = 0
+        self._closed = False
+        self.reconnects = 0
+
+    # ------------------------------------------------------------------
+    def _connect_locked(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(None)
+        self._sock = sock
+        self._generation += 1
+        if self._generation > 1:
+            self.reconnects += 1
+        threading.Thread(target=self._reader_loop, args=(sock, self._generation), daemon=True).start()
+
+    def _drop_locked(self, sock=None):
+        if self._sock is not None and (sock is None or sock is self._sock):
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+    def _write_locked(self, line):
+        if self._sock is None:
+            self._connect_locked()
+        self._sock.sendall(line)
+
+    def request_async(self, payload: dict, idempotent: bool = False) -> Future:
+        """
+        요청 전송 후 Future 반환 (응답 딕셔너리 또는 에러 딕셔너리로 완료)
+        - idempotent: 두 번 실행되어도 안전한 요청(조회, 값 설정)이면 True → 연결이 끊기면 재연결 후 다시 전송
+        """
+        fut = Future()
+        req_id = next(self._ids)
+        msg = dict(payload)
+        msg["id"] = req_id
+        line = (json.dumps(msg) + "\n").encode("utf-8")
+        with self._lock:
+            if self._closed:
+                fut.set_result(_error("Client closed"))
+                return fut
+            self._pending[str(req_id)] = [line, fut, 0, idempotent]
+            for attempt in range(2):
+                try:
+                    self._write_locked(line)
+                    break
+                except socket.timeout:
+                    self._pending.pop(str(req_id), None)
+                    self._drop_locked()
+                    fut.set_result(_error("Connection timeout"))
+                    break
+                except ConnectionRefusedError:
+                    self._pending.pop(str(req_id), None)
+                    fut.set_result(_error("Connection refused"))
+                    break
+                except OSError as e:
+                    # 끊긴 연결에 쓰기 실패 → 한 번 재연결 후 재전송
+                    self._drop_locked()
+                    if attempt == 1:
+                        self._pending.pop(str(req_id), None)
+                        fut.set_result(_error(str(e)))
+        return fut
+
+    def request(self, payload: dict, timeout: float | None = None, idempotent: bool = False) -> dict:
+        """요청 후 응답까지 대기 (timeout 초과 시 연결을 재설정하여 늦은 응답이 다음 요청과 섞이지 않게 함)"""
+        fut = self.request_async(payload, idempotent=idempotent)
+        try:
+            return fut.result(timeout=self.timeout if timeout is None else timeout)
+        except Exception:
+            with self._lock:
+                for key, e in list(self._pending.items()):
+                    if e[1] is fut:
+                        del self._pending[key]
+                self._drop_locked()
+            return _error("Connection timeout")
+
+    # ------------------------------------------------------------------
+    def _reader_loop(self, sock, generation):
+        buf = b""
+        while True:
+            try:
+                chunk = sock.recv(65536)
+            except OSError:
+                chunk = b""
+            if not chunk:
+                break
+            buf += chunk
+            while b"\n" in buf:
+                line, buf = buf.split(b"\n", 1)
+                line = line.strip()
+                if line:
+                    self._dispatch(line)
+        if buf.strip():
+            self._dispatch(buf.strip())
+        self._on_disconnect(sock, generation)
+
+    def _dispatch(self, line):
+        try:
+            resp = json.loads(line.decode("utf-8", errors="ignore"))
+        except ValueError:
+            return
+        if not isinstance(resp, dict):
+            resp = {"status": "ok", "result": resp}
+        if self._handle_message(resp):
+            return
+        with self._lock:
+            if "id" in resp:
+                # 대기 목록에 없는 id (timeout 후 늦게 온 응답, 재전송에 대한 중복 응답) → 버림
+                entry = self._pending.pop(str(resp["id"]), None)
+            elif self._pending:
+                # id를 돌려주지 않는 서버: 보낸 순서대로 매칭
+                _, entry = self._pending.popitem(last=False)
+            else:
+                entry = None
+        if entry is not None and not entry[1].done():
+            entry[1].set_result(resp)
+
+    def _handle_message(self, msg):
+        """요청에 대한 응답이 아닌 서버 push 메시지 처리 훅 (처리했으면 True)"""
+        if self.on_message is None or "event" not in msg or "id" in msg:
+            return False
+        try:
+            self.on_message(msg)
+        except Exception as e:
+            print(f"[WARN] push 메시지 처리 오류: {e}")
+        return True
+
+    def _on_disconnect(self, sock, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._drop_locked(sock)
+            closed = self._closed
+        if self.on_message is not None and not closed:
+            self._handle_message({"event": "disconnected"})
+        with self._lock:
+            if generation != self._generation:
+                return
+            if self._closed or not self._pending:
+                return
+            # 응답받지 못한 idempotent 요청만 재전송 (요청마다 연결을 닫는 서버 대응)
+            # 나머지는 서버가 이미 실행했을 수 있으므로 다시 보내지 않고 실패 처리
+            retry = [(k, e) for k, e in self._pending.items() if e[3] and e[2] < self.max_retries]
+            for k, e in list(self._pending.items()):
+                if not e[3] or e[2] >= self.max_retries:
+                    del self._pending[k]
+                    if not e[1].done():
+                        e[1].set_result(_error("Connection closed"))
+            if not retry:
+                return
+            try:
+                self._connect_locked()
+                for _, e in retry:
+                    e[2] += 1
+                    self._sock.sendall(e[0])
+            except OSError as ex:
+                self._drop_locked()
+                for k, e in retry:
+                    self._pending.pop(k, None)
+                    if not e[1].done():
+                        e[1].set_result(_error(str(ex)))
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._drop_locked()
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for e in pending:
+            fut = e[1]
+            if not fut.done():
+                fut.set_result(_error("Client closed"))
+
+
+class JsonLineServer:
+    """
+    테스트용 로컬 NDJSON 서버 (헤드셋 파라미터 수신부 / 제어 서버 대역)
+
+    - handler(request: dict) -> dict 를 줄마다 호출하고, 요청의 id를 응답에 그대로 붙여 반환
+    - 줄바꿈 없이 보내고 SHUT_WR로 닫는 기존 클라이언트 요청도 처리
+    """
+    def __init__(self, handler, host="127.0.0.1", port=0):
+        self.handler = handler
+        self.requests = 0
+        self.connections = 0
+        owner = self
+
+        class _Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                owner.connections += 1
+                sock = self.request
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                owner._socks.add(sock)
+                owner._on_connect(sock)
+                buf = b""
+                try:
+                    while True:
+                        chunk = sock.recv(65536)
+                        if not chunk:
+                            break
+                        buf += chunk
+                        while b"\n" in buf:
+                            line, buf = buf.split(b"\n", 1)
+                            if line.strip():
+                                owner._serve_line(sock, line)
+                    if buf.strip():
+                        owner._serve_line(sock, buf)
+                except OSError:
+                    pass
+                finally:
+                    owner._socks.discard(sock)
+                    owner._on_disconnect(sock)
+
+        self._server = socketserver.ThreadingTCPServer((host, port), _Handler, bind_and_activate=False)
+        self._server.daemon_threads = True
+        self._server.allow_reuse_address = True
+        self._server.server_bind()
+        self._server.server_activate()
+        self.host, self.port = self._server.server_address[:2]
+        self._thread = None
+        self._send_lock = threading.Lock()
+        self._local = threading.local()
+        self._socks = set()
+
+    def _on_connect(self, sock):
+        pass
+
+    def _on_disconnect(self, sock):
+        pass
+
+    def send(self, sock, msg: dict):
+        data = (json.dumps(msg) + "\n").encode("utf-8")
+        with self._send_lock:
+            sock.sendall(data)
+
+    def current_socket(self):
+        """handler 안에서 호출 시 현재 요청을 보낸 클라이언트 소켓 (push 구독 등록용)"""
+        return getattr(self._local, "sock", None)
+
+    def _serve_line(self, sock, line):
+        self.requests += 1
+        self._local.sock = sock
+        try:
+            req = json.loads(line.decode("utf-8", errors="ignore"))
+            resp = self.handler(req) or {}
+        except Exception as e:
+            req, resp = {}, _error(str(e))
+        if isinstance(req, dict) and "id" in req:
+            resp = dict(resp)
+            resp["id"] = req["id"]
+        self.send(sock, resp)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        for sock in list(self._socks):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    # 헤드셋 스테레오 파라미터 수신부(포트 9004) 대역: 받은 값을 출력하고 그대로 응답
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stereo params stand-in server")
+    parser.add_argument("--port", type=int, default=9004)
+    args = parser.parse_args()
+
+    params = {}
+
+    def handle(req):
+        params.update({k: v for k, v in req.items() if k != "id"})
+        print(f"[Params] {params}")
+        return {"status": "ok", **params}
+
+    server = JsonLineServer(handle, host="0.0.0.0", port=args.port).start()
+    print(f"[INFO] Stereo params stand-in listening on {args.port}")
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        server.stop()
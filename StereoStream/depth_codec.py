@@ -0,0 +1,253 @@
+import struct
+import zlib
+import numpy as np
+import cv2
+
+try:
+    # pip install zstandard
+    import zstandard
+    _USE_ZSTD = True
+except ImportError:
+    zstandard = None
+    _USE_ZSTD = False
+
+try:
+    # pip install lz4
+    import lz4.frame as lz4frame
+    _USE_LZ4 = True
+except ImportError:
+    lz4frame = None
+    _USE_LZ4 = False
+
+# 확장 헤더 Codec 필드 값 (CODEC_JPEG = 0은 StereoStreamer, H264/HEVC = 1/2는 video_codec에 정의)
+CODEC_DEPTH = 3
+
+# 깊이 프레임 헤더: Magic(2) "DZ" + Method(1) + Predictor(1) + Width(2) + Height(2) = 8 bytes
+DEPTH_MAGIC = b"DZ"
+DEPTH_HEADER = struct.Struct('!2sBBHH')
+
+METHOD_PNG = 0
+METHOD_ZSTD = 1
+METHOD_LZ4 = 2
+METHOD_ZLIB = 3
+_METHODS = {"png": METHOD_PNG, "zstd": METHOD_ZSTD, "lz4": METHOD_LZ4, "zlib": METHOD_ZLIB}
+
+PREDICTOR_NONE = 0
+PREDICTOR_LEFT = 1   # 왼쪽 픽셀과의 차이
+PREDICTOR_PLANE = 2  # 왼쪽 + 위 - 왼쪽위 (평면 예측, 잡음이 적은 기울어진 바닥/벽에 유리)
+_PREDICTORS = {"none": PREDICTOR_NONE, "left": PREDICTOR_LEFT, "plane": PREDICTOR_PLANE}
+
+
+def available_methods():
+    """현재 환경에서 사용 가능한 압축 방식 (빠른 순)"""
+    out = []
+    if _USE_ZSTD:
+        out.append("zstd")
+    if _USE_LZ4:
+        out.append("lz4")
+    return out + ["zlib", "png"]
+
+
+class DepthEncoder:
+    """
+    z16 깊이 영상 무손실 인코더
+
+    - 예측(predictor) 잔차를 NumPy로 한 번에 계산 (uint16 순환 연산이라 오버플로 없이 그대로 역변환 가능)
+    - 잔차를 zigzag로 부호 없는 값으로 바꾼 뒤 하위/상위 바이트 평면으로 분리
+      (상위 바이트는 거의 0이라 엔트로피 부호화기가 잘 압축)
+    - 압축: method="auto"면 zstd → lz4 → zlib 순으로 설치된 것을 사용, "png"는 cv2 16bit PNG (예측은 PNG 필터 사용)
+    - 출력 = DEPTH_HEADER + 압축 데이터. 모든 프레임이 독립(intra)이라 손실 후 다음 프레임에서 바로 복구
+    - 프레임마다 잔차/바이트 평면 버퍼를 재사용 (UdpImageSender 워커 스레드에서 호출)
+    """
+    def __init__(self, method="auto", predictor="left", level=None):
+        """level: 압축 레벨 (None이면 방식별 빠른 기본값: zstd 1, lz4 0, zlib 1, png 1)"""
+        if method == "auto":
+            method = available_methods()[0]
+        if method not in _METHODS:
+            raise ValueError(f"지원하지 않는 method: {method} (가능: {list(_METHODS)})")
+        if method == "zstd" and not _USE_ZSTD:
+            raise RuntimeError("zstandard 모듈이 없습니다. pip install zstandard 후 사용하세요.")
+        if method == "lz4" and not _USE_LZ4:
+            raise RuntimeError("lz4 모듈이 없습니다. pip install lz4 후 사용하세요.")
+        if predictor not in _PREDICTORS:
+            raise ValueError(f"지원하지 않는 predictor: {predictor} (가능: {list(_PREDICTORS)})")
+        self.method = method
+        self.method_id = _METHODS[method]
+        self.predictor = predictor
+        self.predictor_id = _PREDICTORS[predictor] if method != "png" else PREDICTOR_NONE
+        self.level = level
+        self._zstd = zstandard.ZstdCompressor(level=1 if level is None else level) if method == "zstd" else None
+        self._buffers = {}  # (h, w) -> (잔차, 임시, 바이트 평면)
+
+    def _get_buffers(self, h, w):
+        bufs = self._buffers.get((h, w))
+        if bufs is None:
+            bufs = (np.empty((h, w), np.uint16), np.empty((h, w), np.uint16), np.empty((2, h * w), np.uint8))
+            self._buffers[(h, w)] = bufs
+        return bufs
+
+    def residual_planes(self, depth):
+        """예측 잔차 → zigzag → (하위, 상위) 바이트 평면 (2, H*W). 반환 배열은 다음 호출 시 덮어씀"""
+        h, w = depth.shape
+        res, tmp, planes = self._get_buffers(h, w)
+        if self.predictor_id == PREDICTOR_NONE:
+            res[:] = depth
+        else:
+            left = res if self.predictor_id == PREDICTOR_LEFT else tmp
+            left[:, 0] = depth[:, 0]
+            np.subtract(depth[:, 1:], depth[:, :-1], out=left[:, 1:])
+            if self.predictor_id == PREDICTOR_PLANE:
+                res[0] = tmp[0]
+                np.subtract(tmp[1:], tmp[:-1], out=res[1:])
+        # zigzag: 0, -1, 1, -2, ... → 0, 1, 2, 3, ...
+        s = res.view(np.int16)
+        np.right_shift(s, 15, out=tmp.view(np.int16))
+        np.left_shift(s, 1, out=s)
+        np.bitwise_xor(res, tmp, out=res)
+        np.copyto(planes, res.view(np.uint8).reshape(-1, 2).T)
+        return planes
+
+    def encode(self, depth: np.ndarray) -> bytes:
+        """HxW uint16 깊이 영상 1장 → bytes"""
+        if depth.ndim != 2:
+            raise ValueError(f"깊이 영상은 HxW여야 합니다: {depth.shape}")
+        if depth.dtype != np.uint16:
+            depth = depth.astype(np.uint16)
+        h, w = depth.shape
+        header = DEPTH_HEADER.pack(DEPTH_MAGIC, self.method_id, self.predictor_id, w, h)
+        if self.method == "png":
+            ok, buf = cv2.imencode(".png", depth, [int(cv2.IMWRITE_PNG_COMPRESSION),
+                                                   1 if self.level is None else self.level])
+            if not ok:
+                print("[WARN] PNG 인코딩 실패")
+                return b""
+            return header + buf.tobytes()
+        planes = self.residual_planes(np.ascontiguousarray(depth))
+        if self.method == "zstd":
+            body = self._zstd.compress(planes)
+        elif self.method == "lz4":
+            body = lz4frame.compress(planes, compression_level=0 if self.level is None else self.level)
+        else:
+            body = zlib.compress(planes, 1 if self.level is None else self.level)
+        return header + body
+
+
+def decode_depth(data) -> np.ndarray | None:
+    """DepthEncoder 출력 → HxW uint16 깊이 영상 (형식 오류 시 None)"""
+    mv = memoryview(data)
+    if len(mv) < DEPTH_HEADER.size:
+        return None
+    magic, method, predictor, w, h = DEPTH_HEADER.unpack_from(mv)
+    if magic != DEPTH_MAGIC:
+        return None
+    body = mv[DEPTH_HEADER.size:]
+    if method == METHOD_PNG:
+        depth = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        return depth if depth is not None and depth.shape == (h, w) else None
+    if method == METHOD_ZSTD:
+        if not _USE_ZSTD:
+            raise RuntimeError("zstandard 모듈이 없어 깊이 프레임을 디코딩할 수 없습니다.")
+        raw = zstandard.ZstdDecompressor().decompress(body, max_output_size=2 * w * h)
+    elif method == METHOD_LZ4:
+        if not _USE_LZ4:
+            raise RuntimeError("lz4 모듈이 없어 깊이 프레임을 디코딩할 수 없습니다.")
+        raw = lz4frame.decompress(body)
+    elif method == METHOD_ZLIB:
+        raw = zlib.decompress(body)
+    else:
+        return None
+    if len(raw) != 2 * w * h:
+        return None
+    planes = np.frombuffer(raw, dtype=np.uint8).reshape(2, h * w)
+    z = planes[1].astype(np.uint16)
+    np.left_shift(z, 8, out=z)
+    np.bitwise_or(z, planes[0], out=z)
+    # zigzag 역변환: (z >> 1) ^ -(z & 1)  (uint16 순환 연산)
+    sign = np.bitwise_and(z, 1)
+    np.negative(sign, out=sign)
+    np.right_shift(z, 1, out=z)
+    np.bitwise_xor(z, sign, out=z)
+    res = z.reshape(h, w)
+    if predictor == PREDICTOR_PLANE:
+        np.cumsum(res, axis=0, dtype=np.uint16, out=res)
+    if predictor in (PREDICTOR_LEFT, PREDICTOR_PLANE):
+        np.cumsum(res, axis=1, dtype=np.uint16, out=res)
+    return res
+
+
+def synthetic_depth(height=480, width=848, frames=30, seed=0):
+    """
+    벤치마크용 합성 깊이 영상 (N x H x W uint16)
+    - 바닥 평면 + 상자 몇 개 + 거리 비례 양자화 잡음 + 0(측정 실패) 구멍 — 실제 D4xx 깊이와 비슷한 압축 난이도
+    """
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = 700.0 + 1.2 * yy + 0.15 * xx
+    out = np.empty((frames, height, width), np.uint16)
+    boxes = [(rng.integers(0, width - 200), rng.integers(0, height - 150), rng.integers(80, 200),
+              rng.integers(60, 150), rng.uniform(400, 900)) for _ in range(4)]
+    for n in range(frames):
+        d = base.copy()
+        for k, (x, y, w, h, z) in enumerate(boxes):
+            x = int(x + 3 * n * (1 if k % 2 else -1)) % (width - w)
+            d[y:y + h, x:x + w] = z + 0.3 * (xx[y:y + h, x:x + w] - x)
+        d += rng.normal(0.0, 1.0, d.shape).astype(np.float32) * d * 0.002
+        holes = rng.random(d.shape) < 0.02
+        d[holes] = 0
+        out[n] = np.clip(d, 0, 65535).astype(np.uint16)
+    return out
+
+
+if __name__ == "__main__":
+    # 무손실 깊이 코덱 벤치마크: 압축률과 인코딩/디코딩 MB/s (원본 z16 기준)
+    import time
+    import os
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Lossless z16 depth codec benchmark")
+    parser.add_argument("--input", default=None,
+                        help="기록된 깊이: EpisodeRecorder 에피소드 디렉터리 또는 depth.npy가 있는 replay 디렉터리")
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--width", type=int, default=848)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--fps", type=float, default=30.0, help="실시간 여유 판단 기준 fps")
+    args = parser.parse_args()
+
+    if args.input is None:
+        frames = synthetic_depth(args.height, args.width, args.frames)
+        source = f"synthetic {args.width}x{args.height}"
+    elif os.path.exists(os.path.join(args.input, "index.npy")):
+        from episode_reader import EpisodeReader
+        import json
+        with open(os.path.join(args.input, "meta.json")) as f:
+            names = [s["name"] for s in json.load(f)["streams"] if s["name"].endswith("/depth")]
+        if not names:
+            raise SystemExit(f"깊이 스트림이 없습니다: {args.input}")
+        ds = EpisodeReader(args.input, reference=names[0], streams=[names[0]], rh56f1=False, cache_size=0)
+        frames = np.stack([ds[i][names[0]] for i in range(min(len(ds), args.frames))])
+        source = f"{args.input}:{names[0]}"
+    else:
+        frames = np.load(os.path.join(args.input, "depth.npy"), mmap_mode="r")[:args.frames]
+        frames = np.ascontiguousarray(frames)
+        source = args.input
+    n, h, w = frames.shape
+    raw_mb = frames.nbytes / 1e6
+    print(f"[입력] {source}: {n} 프레임 {w}x{h} (원본 {raw_mb / n:.2f} MB/프레임)")
+
+    configs = [(m, p) for m in available_methods() if m != "png" for p in ("left", "plane")] + [("png", "none")]
+    for method, predictor in configs:
+        enc = DepthEncoder(method, predictor)
+        enc.encode(frames[0])
+        t0 = time.perf_counter()
+        encoded = [enc.encode(f) for f in frames]
+        t_enc = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        decoded = [decode_depth(d) for d in encoded]
+        t_dec = time.perf_counter() - t0
+        ok = all(np.array_equal(a, b) for a, b in zip(frames, decoded))
+        size = sum(len(d) for d in encoded)
+        enc_ms = t_enc / n * 1000.0
+        print(f"[{method:>4}/{predictor:<5}] 압축률 {frames.nbytes / size:5.2f}x | "
+              f"인코딩 {raw_mb / t_enc:6.1f} MB/s ({enc_ms:5.2f} ms/프레임) | "
+              f"디코딩 {raw_mb / t_dec:6.1f} MB/s | {size * 8 / n * args.fps / 1e6:6.1f} Mbit/s @{args.fps:g}fps | "
+              f"{'무손실' if ok else '불일치!'} | {'OK' if enc_ms < 1000.0 / args.fps else '실시간 불가'}")
@@ -0,0 +1,347 @@
+import os
+import sys
+import json
+import importlib.util
+from collections import OrderedDict
+import numpy as np
+
+from episode_recorder import HAND_FLOATS, chunk_path
+
+# 손 패킷 float 배열 = 7개(pos 3 + quat 4) 단위 블록: left 26 + right 26 + head 1
+_HAND_BLOCKS = HAND_FLOATS // 7
+
+
+def _xrhand_module():
+    """
+    ../XRHandReceiver.py를 sys.path를 바꾸지 않고 파일 경로로 로드 (이미 import되어 있으면 그 모듈 사용)
+    """
+    path = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "XRHandReceiver.py"))
+    mod = sys.modules.get("XRHandReceiver")
+    if mod is not None and os.path.abspath(getattr(mod, "__file__", None) or "") == path:
+        return mod
+    register = mod is None
+    spec = importlib.util.spec_from_file_location("XRHandReceiver" if register else "_episode_XRHandReceiver", path)
+    mod = importlib.util.module_from_spec(spec)
+    if register:
+        sys.modules["XRHandReceiver"] = mod
+    try:
+        spec.loader.exec_module(mod)
+    except BaseException:
+        if register:
+            del sys.modules["XRHandReceiver"]
+        raise
+    return mod
+
+
+def interpolate_hand(a, b, w):
+    """
+    손 원본 배열 두 개를 w(0~1)로 보간 (위치는 선형, 쿼터니언은 부호 정렬 후 nlerp)
+    a, b: (..., 371) float32 / w: 스칼라 또는 (...,) 배열
+    """
+    w = np.asarray(w, dtype=np.float32)[..., None, None]
+    a = a.reshape(a.shape[:-1] + (_HAND_BLOCKS, 7))
+    b = b.reshape(b.shape[:-1] + (_HAND_BLOCKS, 7))
+    out = np.empty(np.broadcast_shapes(a.shape, b.shape), dtype=np.float32)
+    out[..., :3] = a[..., :3] + (b[..., :3] - a[..., :3]) * w
+    qa, qb = a[..., 3:], b[..., 3:]
+    sign = np.where(np.sum(qa * qb, axis=-1, keepdims=True) < 0, -1.0, 1.0).astype(np.float32)
+    q = qa + (qb * sign - qa) * w
+    norm = np.linalg.norm(q, axis=-1, keepdims=True)
+    out[..., 3:] = np.where(norm > 1e-8, q / np.maximum(norm, 1e-8), qa)
+    return out.reshape(out.shape[:-2] + (HAND_FLOATS,))
+
+
+class EpisodeReader:
+    """
+    EpisodeRecorder로 기록한 에피소드의 인덱스 기반 임의 접근 리더 (학습 DataLoader용)
+
+    - 기준 스트림(reference, 예: "cam0/ir1")의 프레임 i마다 다른 스트림을 시각으로 정렬
+      hand_align="nearest": 가장 가까운 손 패킷 / "interp": 앞뒤 패킷을 시각 비율로 보간
+    - 정렬 결과(스트림별 행 번호/보간 가중치)는 <root>/align_<reference>.npz에 캐시하고,
+      index.npy가 바뀌면 다시 생성
+    - 청크 파일은 np.load(mmap_mode="r")로 필요할 때만 열어 파일 전체를 읽거나 복사하지 않음
+      depth_codec으로 압축 기록한 깊이 스트림은 .dz 청크를 memmap으로 열고 읽는 행만 decode_depth로 복원
+      프로세스(DataLoader worker)마다 열린 memmap을 따로 가지며, pickle 시 memmap/캐시는 제외
+    - 영상은 프로세스별 LRU 캐시(cache_size 프레임)에 보관 (창 단위 접근 시 겹치는 프레임 재사용)
+    - rh56f1=True면 XRHandReceiver.convert_parsed_to_robot_hand_RH56F1로 좌/우 RH56F1 관절 각도도 반환
+
+    사용법:
+        ds = EpisodeReader("./episodes/ep_0001", reference="cam0/ir1", hand_align="interp")
+        sample = ds[10]                  # {"timestamp", "cam0/ir1", "cam0/ir2", "hand", "rh56f1_right", ...}
+        window = ds.window(10, length=8) # 같은 키, 각 값이 (8, ...) 배열
+    """
+    def __init__(self, root, reference=None, streams=None, hand_align="nearest", max_skew=None,
+                 cache_size=64, rh56f1=True):
+        """
+        - streams: 반환할 스트림 이름 목록 (None이면 전체)
+        - max_skew: 기준 프레임과 이 시간(초) 이상 떨어진 샘플은 valid_mask에서 제외 (None이면 제한 없음)
+        """
+        if hand_align not in ("nearest", "interp"):
+            raise ValueError(f"지원하지 않는 hand_align: {hand_align}")
+        self.root = root
+        with open(os.path.join(root, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.stream_info = {s["name"]: s for s in self.meta["streams"]}
+        if reference is None:
+            cams = [n for n in self.stream_info if n != "hand"]
+            reference = cams[0] if cams else "hand"
+        if reference not in self.stream_info:
+            raise KeyError(f"기준 스트림이 없습니다: {reference} (가능: {list(self.stream_info)})")
+        self.reference = reference
+        self.streams = list(streams) if streams is not None else list(self.stream_info)
+        if reference not in self.streams:
+            self.streams.insert(0, reference)
+        self.hand_align = hand_align
+        self.max_skew = max_skew
+        self.cache_size = cache_size
+        self.rh56f1 = rh56f1 and "hand" in self.streams
+
+        self._build_index()
+        self._reset_process_state()
+
+    # ------------------------------------------------------------------
+    # 인덱스
+    def _build_index(self):
+        index_path = os.path.join(self.root, "index.npy")
+        st = os.stat(index_path)
+        key = np.array([st.st_size, st.st_mtime_ns], dtype=np.int64)
+        safe = self.reference.replace("/", "_")
+        cache_path = os.path.join(self.root, f"align_{safe}.npz")
+        if os.path.exists(cache_path):
+            try:
+                cached = np.load(cache_path)
+                if np.array_equal(cached["key"], key):
+                    self._load_align(cached)
+                    return
+            except (OSError, ValueError, KeyError):
+                pass
+
+        index = np.load(index_path, mmap_mode="r")
+        per_stream = {}
+        for name, info in self.stream_info.items():
+            rows = np.asarray(index[index["stream"] == info["id"]])
+            rows = rows[np.argsort(rows["seq"], kind="stable")]
+            per_stream[name] = rows
+
+        ref = per_stream[self.reference]
+        t_ref = ref["timestamp"].astype(np.float64)
+        arrays = {"key": key, "t_ref": t_ref, "ref_seq": ref["seq"].astype(np.int64)}
+        for name, rows in per_stream.items():
+            if name == self.reference:
+                continue
+            t = rows["timestamp"].astype(np.float64)
+            safe_name = name.replace("/", "_")
+            if len(t) == 0:
+                continue
+            # 가장 가까운 행
+            j = np.clip(np.searchsorted(t, t_ref), 1, max(len(t) - 1, 1))
+            left = np.clip(j - 1, 0, len(t) - 1)
+            right = np.clip(j, 0, len(t) - 1)
+            nearest = np.where(np.abs(t[left] - t_ref) <= np.abs(t[right] - t_ref), left, right)
+            arrays[f"near_{safe_name}"] = rows["seq"][nearest].astype(np.int64)
+            arrays[f"dt_{safe_name}"] = t[nearest] - t_ref
+            # 보간용 앞/뒤 행과 가중치 (범위 밖이면 끝 값 유지)
+            span = t[right] - t[left]
+            w = np.where(span > 0, (t_ref - t[left]) / np.where(span > 0, span, 1.0), 0.0)
+            arrays[f"left_{safe_name}"] = rows["seq"][left].astype(np.int64)
+            arrays[f"right_{safe_name}"] = rows["seq"][right].astype(np.int64)
+            arrays[f"w_{safe_name}"] = np.clip(w, 0.0, 1.0).astype(np.float32)
+        self._save_align(cache_path, arrays)
+        self._load_align(arrays)
+
+    @staticmethod
+    def _save_align(cache_path, arrays):
+        """
+        정렬 인덱스를 캐시 파일로 저장 (임시 파일에 쓴 뒤 os.replace → 다른 프로세스가 반쯤 쓴 파일을 읽지 않음)
+        - 읽기 전용 저장소 등으로 쓰기에 실패하면 캐시 없이 메모리의 인덱스만 사용
+        """
+        tmp = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp, cache_path)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def _load_align(self, arrays):
+        self._align = {k: np.asarray(arrays[k]) for k in arrays.keys()}
+        self.timestamps = self._align["t_ref"]
+        valid = np.ones(len(self.timestamps), dtype=bool)
+        for name in self.streams:
+            if name == self.reference:
+                continue
+            dt = self._align.get("dt_" + name.replace("/", "_"))
+            if dt is None:
+                valid[:] = False   # 기록된 행이 없는 스트림
+            elif self.max_skew is not None:
+                valid &= np.abs(dt) <= self.max_skew
+        self.valid_mask = valid
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    # ------------------------------------------------------------------
+    # 프로세스별 상태 (memmap / LRU 캐시)
+    def _reset_process_state(self):
+        self._pid = os.getpid()
+        self._maps = {}
+        self._cache = OrderedDict()
+        self._hand_converter = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for k in ("_maps", "_cache", "_hand_converter"):
+            state[k] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset_process_state()
+
+    def _chunk(self, stream, chunk):
+        if self._pid != os.getpid():
+            # fork된 worker: 부모의 memmap/캐시를 쓰지 않고 새로 염
+            self._reset_process_state()
+        key = (stream, chunk)
+        mm = self._maps.get(key)
+        if mm is None:
+            if self.stream_info[stream].get("codec") == "depth":
+                mm = (np.load(chunk_path(self.root, stream, chunk, "offsets.npy"), mmap_mode="r"),
+                      np.memmap(chunk_path(self.root, stream, chunk, "dz"), dtype=np.uint8, mode="r"))
+            else:
+                mm = np.load(chunk_path(self.root, stream, chunk), mmap_mode="r")
+            self._maps[key] = mm
+        return mm
+
+    def read_row(self, stream, seq):
+        """스트림의 seq번째 행 (영상은 LRU 캐시 경유, 반환 배열은 읽기 전용으로 공유될 수 있음)"""
+        key = (stream, int(seq))
+        arr = self._cache.get(key) if self.cache_size else None
+        if arr is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return arr
+        self.cache_misses += 1
+        chunk, row = divmod(int(seq), self.stream_info[stream]["chunk_frames"])
+        if self.stream_info[stream].get("codec") == "depth":
+            from depth_codec import decode_depth
+            offsets, blob = self._chunk(stream, chunk)
+            arr = decode_depth(blob[offsets[row]:offsets[row + 1]])
+        else:
+            arr = np.array(self._chunk(stream, chunk)[row])
+        arr.setflags(write=False)
+        if self.cache_size and stream != "hand":
+            self._cache[key] = arr
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return arr
+
+    # ------------------------------------------------------------------
+    # 샘플 접근
+    def _hand(self, i):
+        safe = "hand"
+        if self.hand_align == "nearest":
+            return self.read_row("hand", self._align["near_" + safe][i])
+        a = self.read_row("hand", self._align["left_" + safe][i])
+        b = self.read_row("hand", self._align["right_" + safe][i])
+        return interpolate_hand(a, b, self._align["w_" + safe][i])
+
+    def _rh56f1(self, hand):
+        if self._hand_converter is None:
+            self._hand_converter = _xrhand_module().XRHandReceiver()
+        parsed = {"left_raw": hand[:182], "right_raw": hand[182:364], "head_raw": hand[364:]}
+        out = {}
+        for side in ("left", "right"):
+            angles, norm = self._hand_converter.convert_parsed_to_robot_hand_RH56F1(parsed, hand_type=side)
+            out[f"rh56f1_{side}"] = np.asarray(angles, dtype=np.float32)
+            out[f"rh56f1_{side}_norm"] = np.asarray(norm, dtype=np.float32)
+        return out
+
+    def __getitem__(self, i):
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(i)
+        sample = {"index": i, "timestamp": float(self.timestamps[i])}
+        for name in self.streams:
+            if name == self.reference:
+                sample[name] = self.read_row(name, self._align["ref_seq"][i])
+            elif name == "hand":
+                hand = self._hand(i)
+                sample["hand"] = hand
+                sample["hand_dt"] = float(self._align["dt_hand"][i])
+                if self.rh56f1:
+                    sample.update(self._rh56f1(hand))
+            else:
+                sample[name] = self.read_row(name, self._align["near_" + name.replace("/", "_")][i])
+        return sample
+
+    def window(self, i, length, stride=1):
+        """기준 프레임 i부터 length개(stride 간격) 샘플을 키별로 쌓은 딕셔너리"""
+        idx = range(i, i + length * stride, stride)
+        if idx[-1] >= len(self):
+            raise IndexError(f"window {i}+{length}x{stride} 가 길이 {len(self)}를 넘습니다.")
+        samples = [self[k] for k in idx]
+        return {k: np.stack([np.asarray(s[k]) for s in samples]) for k in samples[0]}
+
+    def window_starts(self, length, stride=1):
+        """window(i, length, stride)가 valid_mask 안에서만 이루어지는 시작 인덱스 배열"""
+        span = (length - 1) * stride
+        if len(self) <= span:
+            return np.zeros(0, dtype=np.int64)
+        bad = np.cumsum(~self.valid_mask)
+        starts = np.arange(len(self) - span)
+        ends = starts + span
+        ok = (bad[ends] - np.where(starts > 0, bad[starts - 1], 0)) == 0
+        return starts[ok]
+
+
+if __name__ == "__main__":
+    # 임의 접근 처리량 측정 (단일 프로세스 / 다중 worker 프로세스)
+    import time
+    import argparse
+    import multiprocessing as mp
+
+    parser = argparse.ArgumentParser(description="EpisodeReader random access benchmark")
+    parser.add_argument("episode")
+    parser.add_argument("--reference", default=None)
+    parser.add_argument("--align", default="interp", choices=["nearest", "interp"])
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--window", type=int, default=0, help="0이면 단일 샘플, N이면 길이 N 창")
+    parser.add_argument("--no-rh56f1", action="store_true")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    ds = EpisodeReader(args.episode, reference=args.reference, hand_align=args.align, rh56f1=not args.no_rh56f1)
+    print(f"[인덱스] {len(ds)} 프레임 기준 '{ds.reference}' ({(time.perf_counter() - t0) * 1e3:.1f} ms)")
+
+    def run(dataset, n, seed):
+        rng = np.random.default_rng(seed)
+        if args.window:
+            starts = dataset.window_starts(args.window)
+            for i in rng.choice(starts, n):
+                dataset.window(int(i), args.window)
+        else:
+            for i in rng.integers(0, len(dataset), n):
+                dataset[int(i)]
+        return n
+
+    t0 = time.perf_counter()
+    run(ds, args.samples, 0)
+    dt = time.perf_counter() - t0
+    print(f"[1 프로세스] {args.samples / dt:.0f} samples/s (캐시 hit {ds.cache_hits} / miss {ds.cache_misses})")
+
+    if args.workers > 1:
+        per = args.samples // args.workers
+        with mp.get_context("fork").Pool(args.workers) as pool:
+            t0 = time.perf_counter()
+            pool.starmap(run, [(ds, per, k + 1) for k in range(args.workers)])
+            dt = time.perf_counter() - t0
+        print(f"[{args.workers} 프로세스] {per * args.workers / dt:.0f} samples/s")
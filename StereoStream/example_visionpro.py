@@ -1,19 +1,14 @@
 from StereoStreamer import UdpImageSender
 from camera_datacollection import RealsenseCamera
-import time
-import numpy as np
+from pipeline import PipelineRunner, Stage, SideBySideComposer, sender_stage
+from stereo_rectify import StereoRectifier
 
-# 고정된 크기의 빈 이미지 (예: 480×1280)
-dummy_img = np.zeros((480, 1280, 3), dtype=np.uint8)
+RECTIFY = False  # True면 IR1/IR2를 카메라 보정값으로 정렬(rectify)한 뒤 합성
 
+# 카메라 read()가 새 프레임마다 반환하므로 sleep 없이 카메라 속도(30fps)로 동작
 cam1 = RealsenseCamera(name_keyword="D405", height=480, width=640,
                        fps=30, use_color=True, use_depth=False,
                        use_streo=True, reset_on_start=True)
-black_image = np.zeros((480, int(640*2), 3), dtype=np.uint8)
-
-time.sleep(1)
-if cam1.is_opened:
-    cam1.start_reader()
 
 sender = UdpImageSender(
     ip='192.168.0.133', port=9003,
@@ -24,24 +19,24 @@ sender = UdpImageSender(
 sender.open()
 sender.connect()
 
-i = 0
-try:
-    while True:
-        # 실제 이미지가 있다면 dummy_img 대신 넘겨주세요
-        if cam1.is_opened and cam1.frame_queue:
-            c, d, s1, s2 = cam1.frame_queue.popleft()
-            black_image[:,:640,0] = s1.copy();
-            black_image[:,:640,1] = s1.copy();
-            black_image[:,:640,2] = s1.copy();
+sent = 0
 
-            black_image[:,640:,0] = s2.copy();
-            black_image[:,640:,1] = s2.copy();
-            black_image[:,640:,2] = s2.copy();
-            sender.send_image(black_image)
-            i +=1
-            if(i%60==0):
-                #you can set focus, size
-                resp = set_stereo_params("192.168.0.146", focus=0.8, quad=0.8, add_focus=False);
-        time.sleep(1/30)
+def update_params(img):
+    global sent
+    sent += 1
+    if sent % 60 == 0:
+        #you can set focus, size
+        # 백그라운드 전송 (헤드셋이 느리거나 응답이 없어도 스트리밍이 멈추지 않음)
+        sender.set_stereo_params_async("192.168.0.146", focus=0.8, quad=0.8, add_focus=False,
+                                       callback=lambda resp: print(f"[Params] {resp}"))
+
+# source(카메라) → compose(IR 좌우 합성) → send(인코딩/전송은 sender 워커)
+runner = PipelineRunner(cam1, [
+    Stage("compose", SideBySideComposer(480, 640, rectifier=StereoRectifier.from_realsense(cam1) if RECTIFY else None)),
+    sender_stage(sender, on_sent=update_params),
+])
+try:
+    runner.run(report_interval=5.0)
 finally:
     sender.close()
+    cam1.release()
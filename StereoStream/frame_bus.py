@@ -0,0 +1,388 @@
+import json
+import os
+import sys
+import time
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+from camera_datacollection import FrameSet
+
+# 공유 메모리 배치
+#   [0, HEADER_SIZE)  : 버스 헤더 (BUS_HEADER_DTYPE) + 스트림 배치 JSON
+#   [HEADER_SIZE, ...) : slot_size 바이트 슬롯 × slots
+#                        슬롯 = SLOT_HEADER_DTYPE(64B) + 스트림별 배열 (64바이트 정렬)
+BUS_MAGIC = 0x53554246  # "FBUS" (little endian)
+BUS_VERSION = 1
+HEADER_SIZE = 4096
+BUS_HEADER_DTYPE = np.dtype([("magic", "<u4"), ("version", "<u4"), ("slots", "<u4"), ("layout_len", "<u4"),
+                             ("slot_size", "<u8"), ("latest", "<i8"), ("publisher_pid", "<i8")])
+# seq_begin/seq_end: 쓰기 시작/완료 시 기록하는 프레임 순번 (seqlock). 둘이 같을 때만 슬롯 내용이 온전함
+SLOT_HEADER_DTYPE = np.dtype([("seq_begin", "<i8"), ("seq_end", "<i8"), ("frame_number", "<i8"),
+                              ("timestamp_ms", "<f8"), ("capture_time", "<f8"), ("host_time", "<f8"),
+                              ("hw_timestamp_us", "<f8"), ("present", "<u8")])
+SLOT_HEADER_SIZE = 64
+STREAM_NAMES = ("color", "depth", "ir1", "ir2")  # FrameSet 순서
+
+
+def _align(n, a=64):
+    return (n + a - 1) // a * a
+
+
+def camera_streams(camera):
+    """RealsenseCamera / camera_sources 소스 설정으로 FrameSet 스트림 배치 [(shape, dtype) 또는 None] × 4"""
+    h, w = camera.height, camera.width
+    return [((h, w, 3), "uint8") if camera.use_color else None,
+            ((h, w), "uint16") if camera.use_depth else None,
+            ((h, w), "uint8") if camera.use_streo else None,
+            ((h, w), "uint8") if camera.use_streo else None]
+
+
+def _attach_untracked(name):
+    """
+    기존 공유 메모리에 연결하되 resource_tracker에 등록하지 않음
+    (Python < 3.13은 연결만 해도 등록되어, 구독자 프로세스가 끝날 때 게시자의 공유 메모리를 unlink해 버림)
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class _FrameBus:
+    """게시자/구독자 공통: 공유 메모리 위의 헤더/슬롯/스트림 NumPy view"""
+    def _map(self, shm, layout, slots, slot_size):
+        self.shm = shm
+        self.slots = slots
+        self.slot_size = slot_size
+        buf = shm.buf
+        self._header = np.ndarray((), BUS_HEADER_DTYPE, buffer=buf)
+        self._slot_headers = np.ndarray((slots,), SLOT_HEADER_DTYPE, buffer=buf, offset=HEADER_SIZE,
+                                        strides=(slot_size,))
+        self._streams = []
+        for entry in layout:
+            if entry is None:
+                self._streams.append(None)
+                continue
+            shape, dtype, offset = tuple(entry["shape"]), np.dtype(entry["dtype"]), entry["offset"]
+            inner = np.empty(shape, dtype).strides
+            self._streams.append(np.ndarray((slots,) + shape, dtype, buffer=buf, offset=HEADER_SIZE + offset,
+                                            strides=(slot_size,) + inner))
+        self.layout = layout
+
+    @property
+    def latest_seq(self):
+        return int(self._header["latest"])
+
+    def is_valid(self, seq):
+        """seq 프레임의 슬롯이 아직 덮어써지지 않았는지 (zero-copy view를 다 쓴 뒤 확인)"""
+        if seq is None or seq < 0:
+            return False
+        h = self._slot_headers[seq % self.slots]
+        return int(h["seq_begin"]) == seq and int(h["seq_end"]) == seq
+
+    def _release_views(self):
+        self._header = None
+        self._slot_headers = None
+        self._streams = []
+
+
+class FrameBusPublisher(_FrameBus):
+    """
+    카메라 프레임셋을 multiprocessing.shared_memory 링(고정 크기 슬롯 × slots)에 게시 (생산자 1개)
+
+    - 슬롯마다 seqlock(seq_begin → 데이터/메타 복사 → seq_end) 순번을 기록하고, 마지막에 헤더의 latest를 갱신
+    - 구독자를 기다리지 않음: 느린 구독자는 앞으로 건너뛰고(FrameBusSubscriber.skipped), 생산자는 막히지 않음
+    - 스트림 배치는 생성 시 고정 (RealsenseCamera와 같은 (color, depth, ir1, ir2) 순서, 없는 스트림은 None)
+
+    사용법:
+        bus = FrameBusPublisher.for_camera("d405", cam)   # cam.on_frames 훅으로 모든 프레임 게시
+        ...
+        bus.close()                                       # 공유 메모리 해제 (unlink)
+    """
+    def __init__(self, name, streams, slots=8):
+        """streams: FrameSet 순서의 [(shape, dtype) 또는 None] × 4 (camera_streams(camera) 참고)"""
+        if slots < 2:
+            raise ValueError("slots는 2 이상이어야 합니다.")
+        layout = []
+        offset = SLOT_HEADER_SIZE
+        for entry in streams:
+            if entry is None:
+                layout.append(None)
+                continue
+            shape, dtype = tuple(int(x) for x in entry[0]), np.dtype(entry[1])
+            layout.append({"shape": list(shape), "dtype": dtype.str, "offset": offset})
+            offset = _align(offset + int(np.prod(shape)) * dtype.itemsize)
+        slot_size = _align(offset)
+        layout_json = json.dumps(layout).encode("utf-8")
+        if BUS_HEADER_DTYPE.itemsize + len(layout_json) > HEADER_SIZE:
+            raise ValueError("스트림 배치 정보가 헤더 크기를 넘습니다.")
+
+        self.name = name
+        shm = shared_memory.SharedMemory(name=name, create=True, size=HEADER_SIZE + slot_size * slots)
+        self._map(shm, layout, slots, slot_size)
+        self._slot_headers["seq_begin"] = -1
+        self._slot_headers["seq_end"] = -1
+        shm.buf[BUS_HEADER_DTYPE.itemsize:BUS_HEADER_DTYPE.itemsize + len(layout_json)] = layout_json
+        h = self._header
+        h["slots"], h["layout_len"], h["slot_size"] = slots, len(layout_json), slot_size
+        h["latest"], h["publisher_pid"], h["version"] = -1, os.getpid(), BUS_VERSION
+        h["magic"] = BUS_MAGIC  # 마지막에 기록 → 구독자는 magic으로 초기화 완료를 확인
+        self.frames_published = 0
+        self.frames_rejected = 0
+        self._camera = None
+        self._prev_hook = None
+
+    @classmethod
+    def for_camera(cls, name, camera, slots=8, attach=True):
+        bus = cls(name, camera_streams(camera), slots)
+        if attach:
+            bus.attach(camera)
+        return bus
+
+    def attach(self, camera):
+        """camera.on_frames 훅으로 모든 프레임 게시 (기존 훅이 있으면 함께 호출)"""
+        prev = camera.on_frames
+        self._camera, self._prev_hook = camera, prev
+        if prev is None:
+            camera.on_frames = self.publish
+        else:
+            def hook(frames):
+                prev(frames)
+                self.publish(frames)
+            camera.on_frames = hook
+
+    def publish(self, frames):
+        """FrameSet(또는 4개 배열 튜플) 1개를 다음 슬롯에 복사하고 게시 → seq (배치가 맞지 않으면 None)"""
+        seq = self.latest_seq + 1
+        slot = seq % self.slots
+        sh = self._slot_headers[slot]
+        present = 0
+        for i, (src, dst) in enumerate(zip(frames, self._streams)):
+            if src is None or dst is None:
+                continue
+            if src.shape != dst.shape[1:]:
+                self.frames_rejected += 1
+                return None
+            present |= 1 << i
+        sh["seq_end"] = -1
+        sh["seq_begin"] = seq
+        for i, (src, dst) in enumerate(zip(frames, self._streams)):
+            if present & (1 << i):
+                np.copyto(dst[slot], src, casting="unsafe")
+        meta = getattr(frames, "meta", None) or {}
+        sh["frame_number"] = meta.get("frame_number", seq)
+        sh["timestamp_ms"] = meta.get("timestamp_ms", np.nan)
+        sh["capture_time"] = meta.get("capture_time", np.nan)
+        sh["host_time"] = meta.get("host_time", time.time())
+        sh["hw_timestamp_us"] = meta.get("hw_timestamp_us", np.nan)
+        sh["present"] = present
+        sh["seq_end"] = seq
+        self._header["latest"] = seq
+        self.frames_published += 1
+        return seq
+
+    def close(self, unlink=True):
+        if self._camera is not None:
+            self._camera.on_frames = self._prev_hook
+            self._camera = None
+        if self.shm is None:
+            return
+        self._release_views()
+        self.shm.close()
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+        self.shm = None
+
+
+class FrameBusSubscriber(_FrameBus):
+    """
+    FrameBusPublisher 링을 매핑하여 zero-copy FrameSet(공유 메모리 view)을 읽는 구독자 (다른 프로세스에서 사용)
+
+    - latest(): 마지막으로 읽은 것보다 새로운 프레임 중 가장 최신 것 (밀린 프레임은 건너뜀)
+    - next(): 마지막으로 읽은 프레임의 바로 다음 프레임 (이미 덮어써졌으면 남아 있는 가장 오래된 프레임으로 건너뜀)
+    - 반환된 배열은 게시자가 slots - 1개 프레임을 더 쓰기 전까지 유효 → 사용 후 is_valid(seq)로 확인,
+      오래 보관하려면 copy
+    - read()는 카메라와 같은 (ok, FrameSet) 형식 → PipelineRunner / EpisodeRecorder 입력으로 바로 사용 가능
+    - 게시자 프로세스와의 동기화는 헤더 latest 폴링 (poll_interval 초 간격)
+    """
+    def __init__(self, name, poll_interval=0.0005, attach_timeout=5.0):
+        deadline = time.monotonic() + attach_timeout
+        while True:
+            try:
+                shm = _attach_untracked(name)
+                break
+            except FileNotFoundError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+        header = np.ndarray((), BUS_HEADER_DTYPE, buffer=shm.buf)
+        while int(header["magic"]) != BUS_MAGIC:
+            if time.monotonic() > deadline:
+                shm.close()
+                raise RuntimeError(f"프레임 버스 '{name}'가 초기화되지 않았습니다.")
+            time.sleep(0.01)
+        if int(header["version"]) != BUS_VERSION:
+            shm.close()
+            raise RuntimeError(f"프레임 버스 버전이 다릅니다: {int(header['version'])}")
+        start = BUS_HEADER_DTYPE.itemsize
+        layout = json.loads(bytes(shm.buf[start:start + int(header["layout_len"])]).decode("utf-8"))
+        slots, slot_size = int(header["slots"]), int(header["slot_size"])
+        del header
+        self.name = name
+        self._map(shm, layout, slots, slot_size)
+        self.poll_interval = poll_interval
+        self.last_seq = -1
+        self.frames_read = 0
+        self.skipped = 0
+        self.torn = 0
+
+    def _frameset(self, seq):
+        slot = seq % self.slots
+        sh = self._slot_headers[slot]
+        if int(sh["seq_begin"]) != seq or int(sh["seq_end"]) != seq:
+            return None
+        present = int(sh["present"])
+        arrays = tuple(s[slot] if s is not None and present & (1 << i) else None
+                       for i, s in enumerate(self._streams))
+        meta = {"seq": seq, "frame_number": int(sh["frame_number"]), "timestamp_ms": float(sh["timestamp_ms"]),
+                "capture_time": float(sh["capture_time"]), "host_time": float(sh["host_time"])}
+        hw = float(sh["hw_timestamp_us"])
+        if hw == hw:
+            meta["hw_timestamp_us"] = hw
+        # 메타를 읽는 사이에 덮어써지지 않았는지 다시 확인
+        if int(sh["seq_begin"]) != seq:
+            return None
+        return FrameSet(arrays, meta)
+
+    def _wait(self, after_seq, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            latest = self.latest_seq
+            if latest > after_seq:
+                return latest
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def _take(self, pick, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            latest = self._wait(self.last_seq, remaining)
+            if latest is None:
+                return None, None
+            seq = pick(latest)
+            frames = self._frameset(seq)
+            if frames is None:
+                # 읽는 중 게시자가 슬롯을 덮어씀 → 더 새로운 프레임으로 다시 시도
+                self.torn += 1
+                continue
+            if self.last_seq >= 0 and seq > self.last_seq + 1:
+                self.skipped += seq - self.last_seq - 1
+            self.last_seq = seq
+            self.frames_read += 1
+            return seq, frames
+
+    def latest(self, timeout=None):
+        """(seq, FrameSet) — 아직 읽지 않은 가장 최신 프레임 (timeout 초과 시 (None, None))"""
+        return self._take(lambda latest: latest, timeout)
+
+    def next(self, timeout=None):
+        """(seq, FrameSet) — 마지막으로 읽은 프레임의 다음 프레임 (뒤처졌으면 링에 남은 가장 오래된 프레임)"""
+        # 쓰기 중일 수 있는 최신 다음 슬롯을 피하려고 slots - 2개까지만 거슬러 올라감
+        return self._take(lambda latest: max(self.last_seq + 1, latest - (self.slots - 2)), timeout)
+
+    def read(self, timeout=2.0):
+        """카메라 호환 (ok, FrameSet)"""
+        seq, frames = self.latest(timeout)
+        if seq is None:
+            return False, (None, None, None, None)
+        return True, frames
+
+    def stats(self):
+        return {"latest_seq": self.latest_seq, "last_seq": self.last_seq, "frames_read": self.frames_read,
+                "skipped": self.skipped, "torn": self.torn}
+
+    def close(self):
+        if self.shm is None:
+            return
+        self._release_views()
+        self.shm.close()
+        self.shm = None
+
+
+def _bench_consume(name, seconds, work_ms, mode, out):
+    """벤치마크 구독자 프로세스 (spawn으로 실행되므로 모듈 최상위에 정의)"""
+    sub = FrameBusSubscriber(name)
+    t_end = time.monotonic() + seconds
+    checksum_errors = 0
+    while time.monotonic() < t_end:
+        seq, frames = sub.next(timeout=0.5) if mode == "next" else sub.latest(timeout=0.5)
+        if seq is None:
+            continue
+        ir1 = frames[2]
+        # 합성 카메라의 frame_number가 첫 픽셀에 기록되어 있으므로 view 사용 후 일치 여부 확인
+        value = int(ir1[0, 0])
+        if work_ms:
+            time.sleep(work_ms / 1000.0)
+        if sub.is_valid(seq) and value != frames.meta["frame_number"] % 256:
+            checksum_errors += 1
+    st = sub.stats()
+    st["checksum_errors"] = checksum_errors
+    out.put((mode, st))
+    sub.close()
+
+
+if __name__ == "__main__":
+    # 게시자(합성 카메라) 1개 + 구독자 프로세스 여러 개: 처리량과 건너뛴/찢어진 프레임 수 확인
+    import argparse
+    import multiprocessing as mp
+
+    parser = argparse.ArgumentParser(description="Shared-memory frame bus benchmark")
+    parser.add_argument("--name", default="stereo_bus")
+    parser.add_argument("--fps", type=float, default=90.0)
+    parser.add_argument("--width", type=int, default=848)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--subscribers", type=int, default=3)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--work-ms", type=float, default=0.0, help="구독자 프레임당 처리 시간 (느린 소비자 모의)")
+    args = parser.parse_args()
+
+    from camera_sources import SyntheticCamera
+
+    cam = SyntheticCamera(args.height, args.width, fps=args.fps, use_color=True, use_depth=True)
+    bus = FrameBusPublisher(args.name, camera_streams(cam), slots=8)
+
+    def stamp(frames):
+        frames[2][0, 0] = frames.meta["frame_number"] % 256
+        bus.publish(frames)
+    cam.on_frames = stamp
+
+    ctx = mp.get_context("spawn")
+    out = ctx.Queue()
+    procs = [ctx.Process(target=_bench_consume, args=(args.name, args.seconds, args.work_ms,
+                                               "next" if k % 2 else "latest", out))
+             for k in range(args.subscribers)]
+    for p in procs:
+        p.start()
+    time.sleep(1.0)  # 구독자 준비
+    cam.start_reader()
+    t0 = time.monotonic()
+    results = [out.get() for _ in procs]
+    dt = time.monotonic() - t0
+    for p in procs:
+        p.join()
+    cam.release()
+    mb = sum(int(np.prod(e["shape"])) * np.dtype(e["dtype"]).itemsize for e in bus.layout if e) / 1e6
+    print(f"[게시자] {bus.frames_published} 프레임 ({bus.frames_published / dt:.1f} fps, {mb:.2f} MB/프레임)")
+    for mode, st in results:
+        print(f"[구독자 {mode:>6}] 읽음 {st['frames_read']} | 건너뜀 {st['skipped']} | 재시도 {st['torn']} | "
+              f"내용 불일치 {st['checksum_errors']}")
+    bus.close()
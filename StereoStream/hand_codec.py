@@ -0,0 +1,300 @@
+import struct
+import numpy as np
+
+# 손 추적 패킷 형식
+#   v1 (헤드셋 기본): "HND0" + timestamp(f8) + float32 x 371 + "HND1" = 1500 bytes
+#       float32 371개 = 왼손 26 x (pos 3 + quat 4) + 오른손 26 x 7 + 헤드 7 (Unity 좌표계, 쿼터니언 x, y, z, w)
+#   v2 (양자화): "HND2" + seq(u4) + timestamp(f8) + pos int16 x 53 x 3 (mm) + quat uint32 x 53 (smallest-three) = 546 bytes
+#       - pos: 1 mm 단위 반올림 (최대 오차 0.5 mm, 범위 ±32.767 m), NaN은 -32768로 표시
+#       - quat: 가장 큰 성분의 인덱스(2 bit) + 나머지 세 성분 10 bit씩 (±1/√2 구간 균등 양자화, 최대 각도 오차 약 0.25°)
+#               영 쿼터니언(추적 안 됨)은 0xFFFFFFFF로 표시해 그대로 복원
+#       - seq: 송신 측 순번 (uint32, 넘치면 0부터) → 수신 측에서 손실/순서 뒤바뀜 확인
+V1_MAGIC, V1_TRAILER = b"HND0", b"HND1"
+V1_SIZE = 1500
+V2_MAGIC = b"HND2"
+
+HAND_FLOATS = 371
+POSES = HAND_FLOATS // 7  # 53 = 왼손 26 + 오른손 26 + 헤드 1
+POS_SCALE = 1000.0        # m → mm
+POS_NAN = -32768
+QUAT_ZERO = 0xFFFFFFFF    # 정규화된 쿼터니언은 세 성분이 모두 +1/√2일 수 없으므로 비어 있는 값
+
+V2_DTYPE = np.dtype([("magic", "S4"), ("seq", "<u4"), ("timestamp", "<f8"),
+                     ("pos", "<i2", (POSES, 3)), ("quat", "<u4", (POSES,))])
+V2_SIZE = V2_DTYPE.itemsize
+
+_Q_RANGE = 1.0 / np.sqrt(2.0)  # 가장 큰 성분을 뺀 나머지 성분의 절댓값 상한
+_Q_STEPS = 1023
+_Q_OTHERS = np.array([[1, 2, 3], [0, 2, 3], [0, 1, 3], [0, 1, 2]])   # 가장 큰 성분이 idx일 때 나머지 성분 위치
+_Q_PLACE = np.array([[3, 0, 1, 2], [0, 3, 1, 2], [0, 1, 3, 2], [0, 1, 2, 3]])  # [나머지 3개, 가장 큰 성분] → (x, y, z, w)
+_Q_SHIFTS = np.array([20, 10, 0], dtype=np.uint32)
+
+
+def encode_quats(q):
+    """(..., 4) 쿼터니언 (x, y, z, w) → (...) uint32 smallest-three (정규화 포함, 부호는 q와 -q가 같은 회전이므로 버림)"""
+    q = np.asarray(q, dtype=np.float64)
+    shape = q.shape[:-1]
+    q = q.reshape(-1, 4)
+    norm = np.sqrt(np.einsum("ij,ij->i", q, q))
+    zero = ~(norm > 1e-6)  # NaN 포함
+    q = q / np.where(zero, 1.0, norm)[:, None]
+    rows = np.arange(len(q))
+    idx = np.argmax(np.abs(q), axis=1)
+    q = q * np.where(q[rows, idx] < 0, -1.0, 1.0)[:, None]
+    others = q[rows[:, None], _Q_OTHERS[idx]]
+    levels = np.rint((others + _Q_RANGE) * (_Q_STEPS / (2 * _Q_RANGE)))
+    levels = np.clip(levels, 0, _Q_STEPS).astype(np.uint32)
+    packed = (idx.astype(np.uint32) << 30) | (levels[:, 0] << 20) | (levels[:, 1] << 10) | levels[:, 2]
+    packed[zero] = QUAT_ZERO
+    return packed.reshape(shape)
+
+
+def decode_quats(packed, dtype=np.float32):
+    """(...) uint32 smallest-three → (..., 4) 단위 쿼터니언 (x, y, z, w) (QUAT_ZERO는 영 쿼터니언)"""
+    packed = np.asarray(packed, dtype=np.uint32)
+    shape = packed.shape
+    packed = packed.reshape(-1, 1)
+    n = len(packed)
+    # 열 0~2: 나머지 세 성분, 열 3: 가장 큰 성분 → _Q_PLACE[idx]로 (x, y, z, w) 순서로 재배치
+    vals = np.empty((n, 4), dtype=np.float64)
+    others = vals[:, :3]
+    np.bitwise_and(packed >> _Q_SHIFTS, 0x3FF, out=others, casting="unsafe")
+    others *= 2 * _Q_RANGE / _Q_STEPS
+    others -= _Q_RANGE
+    vals[:, 3] = np.sqrt(np.maximum(0.0, 1.0 - np.einsum("ij,ij->i", others, others)))
+    vals[packed[:, 0] == QUAT_ZERO] = 0.0
+    q = vals.take(_Q_PLACE[packed[:, 0] >> 30] + np.arange(0, 4 * n, 4)[:, None])
+    return q.astype(dtype, copy=False).reshape(shape + (4,))
+
+
+def encode_v2(floats, timestamps, seq):
+    """
+    v1 float32 배열 → v2 패킷 (벡터화: N개를 한 번에)
+
+    - floats: (371,) 또는 (N, 371) / timestamps: 스칼라 또는 (N,) / seq: 스칼라(첫 순번, 이후 +1) 또는 (N,)
+    - 반환: V2_DTYPE 구조체 배열 (N,) → 패킷 i는 out[i].tobytes(), 1개면 encode_v2_packet 사용
+    """
+    poses = np.asarray(floats, dtype=np.float64).reshape(-1, POSES, 7)
+    n = len(poses)
+    out = np.empty(n, dtype=V2_DTYPE)
+    out["magic"] = V2_MAGIC
+    seq = np.asarray(seq, dtype=np.int64)
+    out["seq"] = (seq + np.arange(n) if seq.ndim == 0 else seq) & 0xFFFFFFFF
+    out["timestamp"] = timestamps
+    pos = poses[..., :3] * POS_SCALE
+    nan = np.isnan(pos)
+    out["pos"] = np.where(nan, POS_NAN, np.clip(np.rint(np.where(nan, 0.0, pos)), -32767, 32767))
+    out["quat"] = encode_quats(poses[..., 3:])
+    return out
+
+
+def encode_v2_packet(floats, timestamp, seq):
+    """패킷 1개 (bytes)"""
+    return encode_v2(floats, timestamp, seq).tobytes()
+
+
+def decode_v2(records):
+    """V2_DTYPE 구조체 배열 (N,) → (timestamps (N,), seq (N,), floats (N, 371) float32)"""
+    n = len(records)
+    floats = np.empty((n, POSES, 7), dtype=np.float32)
+    pos = records["pos"]
+    floats[..., :3] = pos * np.float32(1.0 / POS_SCALE)
+    floats[..., :3][pos == POS_NAN] = np.nan
+    floats[..., 3:] = decode_quats(records["quat"])
+    return records["timestamp"].copy(), records["seq"].copy(), floats.reshape(n, HAND_FLOATS)
+
+
+def packet_version(data, v1_size=V1_SIZE):
+    """패킷 형식 판별: 1 / 2 / 0(알 수 없음) (v1_size: v1 패킷 전체 크기, XRHandReceiver buffer_size)"""
+    if data is None:
+        return 0
+    n = len(data)
+    if n == V2_SIZE and data[:4] == V2_MAGIC:
+        return 2
+    if n == v1_size and n >= V1_SIZE and data[:4] == V1_MAGIC and data[-4:] == V1_TRAILER:
+        return 1
+    return 0
+
+
+def decode_packet(data, v1_size=V1_SIZE):
+    """
+    v1/v2 자동 판별 → (timestamp, floats (371,) float32, seq) (v1은 seq=None) / 형식이 다르면 None
+    - v1은 복사 없이 data를 가리키는 읽기 전용 배열
+    - v1_size: v1 패킷 전체 크기 (기본 1500, 앞쪽 HND0 + timestamp + float 371개만 읽음)
+    """
+    version = packet_version(data, v1_size)
+    if version == 1:
+        ts = struct.unpack_from("<d", data, 4)[0]
+        return ts, np.frombuffer(data, dtype="<f4", count=HAND_FLOATS, offset=12), None
+    if version == 2:
+        rec = np.frombuffer(data, dtype=V2_DTYPE, count=1)
+        ts, seq, floats = decode_v2(rec)
+        return float(ts[0]), floats[0], int(seq[0])
+    return None
+
+
+def packet_timestamp(data):
+    """패킷의 장치 timestamp만 읽기 (디코딩 없음, 형식이 다르면 None)"""
+    version = packet_version(data)
+    if version == 1:
+        return struct.unpack_from("<d", data, 4)[0]
+    if version == 2:
+        return struct.unpack_from("<d", data, 8)[0]
+    return None
+
+
+def encode_v1_packet(floats, timestamp):
+    """v1 패킷 1개 (bytes, 헤드셋 앱과 같은 형식)"""
+    return V1_MAGIC + struct.pack("<d", timestamp) + np.asarray(floats, dtype="<f4").tobytes() + V1_TRAILER
+
+
+def v1_to_v2(data, seq):
+    """v1 패킷 → v2 패킷 (중계용, v1이 아니면 None)"""
+    if packet_version(data) != 1:
+        return None
+    ts = struct.unpack_from("<d", data, 4)[0]
+    return encode_v2_packet(np.frombuffer(data, dtype="<f4", count=HAND_FLOATS, offset=12), ts, seq)
+
+
+# validate_poses 관절 플래그 (0이면 정상, 여러 개가 함께 설정될 수 있음)
+FLAG_NAN = 1           # pos/quat에 NaN 또는 inf
+FLAG_ZERO_POS = 2      # 위치가 0 벡터 (월드 좌표인 손목/헤드만 검사, 손가락은 손목 기준 상대 위치라 제외)
+FLAG_ZERO_QUAT = 4     # 영 쿼터니언
+FLAG_NON_UNIT = 8      # |q|가 1에서 unit_tol 이상 벗어남
+FLAG_NOT_TRACKED = 16  # 손목 pose가 무효 → 그 손의 26개 관절 전체
+FLAG_NAMES = {FLAG_NAN: "nan", FLAG_ZERO_POS: "zero_pos", FLAG_ZERO_QUAT: "zero_quat",
+              FLAG_NON_UNIT: "non_unit_quat", FLAG_NOT_TRACKED: "not_tracked"}
+WRIST_LEFT, WRIST_RIGHT, HEAD = 0, 26, 52
+_WORLD_POSES = np.zeros(POSES, dtype=bool)
+_WORLD_POSES[[WRIST_LEFT, WRIST_RIGHT, HEAD]] = True
+
+
+def validate_poses(floats, unit_tol=1e-3):
+    """
+    손 배열 (..., 371) → 관절별 플래그 (..., 53) uint8 (FLAG_*, 0이면 정상), 한 번의 벡터화 연산
+    - 관절 순서: 왼손 0~25, 오른손 26~51, 헤드 52
+    """
+    p = np.asarray(floats, dtype=np.float32)
+    p = p.reshape(p.shape[:-1] + (POSES, 7))
+    pos, q = p[..., :3], p[..., 3:]
+    finite = np.isfinite(p).all(axis=-1)
+    n2 = np.einsum("...i,...i->...", q, q)
+    zero_q = n2 < 1e-12
+    flags = (~finite).astype(np.uint8)
+    flags |= ((pos == 0).all(axis=-1) & _WORLD_POSES).astype(np.uint8) << 1
+    flags |= zero_q.astype(np.uint8) << 2
+    flags |= (finite & ~zero_q & (np.abs(np.sqrt(n2) - 1.0) > unit_tol)).astype(np.uint8) << 3
+    for wrist in (WRIST_LEFT, WRIST_RIGHT):
+        lost = (flags[..., wrist] != 0)[..., None]
+        flags[..., wrist:wrist + 26] |= lost.astype(np.uint8) << 4
+    return flags
+
+
+def describe_flags(flags):
+    """플래그 배열 → {"nan": 개수, ...} (0이 아닌 항목만, 로그용)"""
+    return {name: int(np.count_nonzero(flags & bit)) for bit, name in FLAG_NAMES.items()
+            if np.any(flags & bit)}
+
+
+def synthetic_hand(n, seed=0):
+    """벤치마크용 손 데이터 (N, 371) float32: 손목/헤드는 월드 좌표 (m), 손가락은 손목 기준 상대 위치 + 임의 회전"""
+    rng = np.random.default_rng(seed)
+    poses = np.empty((n, POSES, 7), dtype=np.float64)
+    poses[..., :3] = rng.uniform(-0.12, 0.12, (n, POSES, 3))
+    for i in (0, 26, 52):  # 왼손/오른손 손목, 헤드
+        poses[:, i, :3] = rng.uniform(-2.0, 2.0, (n, 3))
+    q = rng.normal(size=(n, POSES, 4))
+    poses[..., 3:] = q / np.linalg.norm(q, axis=-1, keepdims=True)
+    return poses.reshape(n, HAND_FLOATS).astype(np.float32)
+
+
+def quat_mul(a, b):
+    """쿼터니언 곱 a * b (x, y, z, w), (..., 4) 벡터화"""
+    ax, ay, az, aw = np.moveaxis(a, -1, 0)
+    bx, by, bz, bw = np.moveaxis(b, -1, 0)
+    return np.stack([aw * bx + ax * bw + ay * bz - az * by,
+                     aw * by - ax * bz + ay * bw + az * bx,
+                     aw * bz + ax * by - ay * bx + az * bw,
+                     aw * bw - ax * bx - ay * by - az * bz], axis=-1)
+
+
+class SyntheticHandMotion:
+    """
+    시각 t(초)의 연속 손 동작 (53, 7) float64 (벤치마크/에뮬레이터용)
+    - 관절마다 위치는 1~5 cm 진폭 사인파, 회전은 고정 축 등각속도 회전 → 보간/외삽 오차를 실제 값과 비교 가능
+    """
+    def __init__(self, seed=0):
+        rng = np.random.default_rng(seed)
+        base = synthetic_hand(1, seed)[0].reshape(POSES, 7).astype(np.float64)
+        self.p0, self.q0 = base[:, :3], base[:, 3:]
+        self.amp = rng.uniform(0.01, 0.05, (POSES, 3))
+        self.freq = rng.uniform(0.5, 2.0, (POSES, 1))
+        axis = rng.normal(size=(POSES, 3))
+        self.axis = axis / np.linalg.norm(axis, axis=1, keepdims=True)
+        self.omega = rng.uniform(0.5, 3.0, POSES)  # rad/s
+
+    def __call__(self, t):
+        out = np.empty((POSES, 7))
+        out[:, :3] = self.p0 + self.amp * np.sin(2 * np.pi * self.freq * t)
+        half = 0.5 * self.omega * t
+        r = np.concatenate([self.axis * np.sin(half)[:, None], np.cos(half)[:, None]], axis=1)
+        out[:, 3:] = quat_mul(r, self.q0)
+        return out
+
+
+if __name__ == "__main__":
+    # 패킷 크기, 왕복 오차 상한, 디코딩 시간 (1개 / 배치)
+    import time
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Hand wire format v2 benchmark")
+    parser.add_argument("--packets", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=2000, help="패킷 1개 디코딩 반복 횟수")
+    args = parser.parse_args()
+
+    floats = synthetic_hand(args.packets)
+    ts = time.time() + np.arange(args.packets) / 90.0
+    v1 = [encode_v1_packet(f, t) for t, f in zip(ts[:args.repeat], floats)]
+
+    t0 = time.perf_counter()
+    records = encode_v2(floats, ts, 0)
+    t_enc = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    ts2, seq2, floats2 = decode_v2(records)
+    t_dec = time.perf_counter() - t0
+
+    a = floats.reshape(-1, POSES, 7).astype(np.float64)
+    b = floats2.reshape(-1, POSES, 7).astype(np.float64)
+    pos_err = np.abs(a[..., :3] - b[..., :3]).max() * 1000.0
+    dot = np.abs(np.einsum("...i,...i->...", a[..., 3:], b[..., 3:]) / np.linalg.norm(b[..., 3:], axis=-1))
+    ang_err = np.degrees(2 * np.arccos(np.clip(dot, -1.0, 1.0))).max()
+    assert (ts2 == ts).all() and (seq2 == np.arange(args.packets)).all()
+
+    # 영 쿼터니언 / NaN 위치 보존
+    edge = floats[:1].copy()
+    edge[0, 3:7] = 0.0
+    edge[0, 7] = np.nan
+    _, e, _ = decode_packet(encode_v2_packet(edge[0], 0.0, 0))
+    assert (e[3:7] == 0).all() and np.isnan(e[7])
+
+    pkt = [r.tobytes() for r in records[:args.repeat]]
+    assert not validate_poses(floats2).any()
+
+    def validate_us():
+        t0 = time.perf_counter()
+        for f in floats[:args.repeat]:
+            validate_poses(f)
+        return (time.perf_counter() - t0) / args.repeat * 1e6
+
+    def per_packet_us(packets):
+        t0 = time.perf_counter()
+        for p in packets:
+            decode_packet(p)
+        return (time.perf_counter() - t0) / len(packets) * 1e6
+
+    print(f"[크기] v1 {V1_SIZE} bytes → v2 {V2_SIZE} bytes ({V2_SIZE / V1_SIZE * 100:.0f}%), "
+          f"90 Hz 기준 {V1_SIZE * 90 * 8 / 1000:.0f} → {V2_SIZE * 90 * 8 / 1000:.0f} kbit/s")
+    print(f"[왕복 오차] 위치 최대 {pos_err:.3f} mm (상한 0.5 mm), 회전 최대 {ang_err:.3f}° ({args.packets} 패킷 x {POSES} pose)")
+    print(f"[배치] 인코딩 {t_enc / args.packets * 1e6:.2f} µs/패킷, 디코딩 {t_dec / args.packets * 1e6:.2f} µs/패킷")
+    print(f"[패킷 1개] decode_packet v1 {per_packet_us(v1):.1f} µs, v2 {per_packet_us(pkt):.1f} µs")
+    print(f"[검증] validate_poses 1 프레임 {validate_us():.1f} µs (53개 관절 NaN/영/비단위 쿼터니언/추적 상실 플래그)")
@@ -0,0 +1,329 @@
+import os
+import sys
+import time
+import heapq
+import select
+import socket
+import threading
+import numpy as np
+
+import hand_codec
+
+PING = b"ping"
+SUBSCRIBER_TTL = 3.0  # 이 시간 동안 ping이 없으면 전송 중단 (XRHandReceiver는 0.5초마다 ping)
+
+
+class _Device:
+    """에뮬레이터 장치 1개 = UDP 소켓 1개 (ping 수신 + 손 패킷 전송)"""
+    def __init__(self, index, host, port, rate_hz, fmt, t_start):
+        self.index = index
+        self.port = port
+        self.period = 1.0 / rate_hz
+        self.fmt = fmt
+        self.motion = hand_codec.SyntheticHandMotion(seed=index)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1024 * 1024)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.subscribers = {}  # addr -> 마지막 ping 시각
+        self.next_gen = t_start
+        self.seq = 0
+        self.generated = 0
+        self.sent = 0
+        self.lost = 0
+        self.reordered = 0
+        self.send_errors = 0
+
+    def packet(self, t_motion, timestamp):
+        floats = self.motion(t_motion).reshape(-1)
+        self.seq += 1
+        if self.fmt == "v2":
+            return hand_codec.encode_v2_packet(floats, timestamp, self.seq)
+        return hand_codec.encode_v1_packet(floats, timestamp)
+
+
+class HeadsetEmulator:
+    """
+    Unity 헤드셋 앱 에뮬레이터 (XRHandReceiver 부하 테스트용)
+
+    - 장치 i는 host:(port + i)에서 "ping"을 기다렸다가, ping을 보낸 주소로 rate_hz 주기의 손 패킷을 전송
+      (SUBSCRIBER_TTL초 동안 ping이 없으면 중단 → 수신기 재시작/종료를 따라감)
+    - 패킷: v1 HND0/HND1 1500 bytes (기본) 또는 v2 HND2, timestamp = 생성 시각 time.time() → 수신 측에서 종단 지연 계산
+    - 손 동작: hand_codec.SyntheticHandMotion (장치마다 다른 seed)
+    - 네트워크 장애 주입: loss(손실률), jitter_ms(지수 분포 평균 추가 지연), reorder(다음 패킷 뒤로 보낼 확률)
+    - 모든 장치를 스레드 1개가 처리: 생성 시각/전송 예정 시각 heap + select()로 ping 수신과 대기를 함께 처리
+
+    사용법:
+        emu = HeadsetEmulator(devices=4, port=9101, rate_hz=1000, loss=0.01, jitter_ms=2).start()
+        receiver = XRHandReceiver("127.0.0.1", server_port=9201, headset_port=9101).start()
+        ...
+        emu.stop()
+    또는 별도 프로세스: python hand_emulator.py serve --devices 4 --port 9101 --rate 1000
+    """
+    def __init__(self, devices=1, port=9001, host="127.0.0.1", rate_hz=72.0, fmt="v1",
+                 loss=0.0, jitter_ms=0.0, reorder=0.0, seed=0):
+        if fmt not in ("v1", "v2"):
+            raise ValueError(f"지원하지 않는 fmt: {fmt} (가능: 'v1', 'v2')")
+        self.n_devices = devices
+        self.port = port
+        self.host = host
+        self.rate_hz = rate_hz
+        self.fmt = fmt
+        self.loss = loss
+        self.jitter = jitter_ms / 1000.0
+        self.reorder = reorder
+        self._rng = np.random.default_rng(seed)
+        self.devices = []
+        self._open = False
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.t_start = None
+
+    def open(self):
+        """장치 소켓 바인드 (start/run이 자동 호출)"""
+        if not self._open:
+            self._open = True
+            self.t_start = time.monotonic()
+            # 장치끼리 전송 시각이 겹치지 않도록 한 주기 안에서 고르게 분산
+            self.devices = [_Device(i, self.host, self.port + i, self.rate_hz, self.fmt,
+                                    self.t_start + i / (self.rate_hz * self.n_devices))
+                            for i in range(self.n_devices)]
+        return self
+
+    def close(self):
+        """소켓 닫기 (stats()용 장치 정보는 유지)"""
+        for d in self.devices:
+            d.sock.close()
+        self._open = False
+
+    def _poll_pings(self, timeout):
+        socks = [d.sock for d in self.devices]
+        readable, _, _ = select.select(socks, [], [], max(0.0, timeout))
+        if not readable:
+            return
+        now = time.monotonic()
+        for d in self.devices:
+            if d.sock not in readable:
+                continue
+            while True:
+                try:
+                    data, addr = d.sock.recvfrom(64)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError:
+                    break
+                if data[:4] == PING:
+                    d.subscribers[addr] = now
+
+    def run(self, duration=None):
+        """현재 스레드에서 실행 (duration초 또는 stop()까지)"""
+        self.open()
+        wall_offset = time.time() - time.monotonic()
+        pending = []  # (전송 예정 시각, 순번, 장치, 패킷)
+        counter = 0
+        rng = self._rng
+        t_end = None if duration is None else time.monotonic() + duration
+        while not self._stop_event.is_set() and (t_end is None or time.monotonic() < t_end):
+            now = time.monotonic()
+            for d in self.devices:
+                if d.next_gen < now - 1.0:
+                    d.next_gen = now  # 멈췄다 재개한 경우 밀린 패킷을 몰아 보내지 않음
+                while d.next_gen <= now:
+                    t_gen = d.next_gen
+                    d.next_gen += d.period
+                    for addr in [a for a, t in d.subscribers.items() if now - t > SUBSCRIBER_TTL]:
+                        del d.subscribers[addr]
+                    if not d.subscribers:
+                        continue
+                    d.generated += 1
+                    if self.loss and rng.random() < self.loss:
+                        d.lost += 1
+                        continue
+                    due = t_gen + (rng.exponential(self.jitter) if self.jitter else 0.0)
+                    if self.reorder and rng.random() < self.reorder:
+                        due += 1.5 * d.period
+                        d.reordered += 1
+                    packet = d.packet(t_gen - self.t_start, t_gen + wall_offset)
+                    heapq.heappush(pending, (due, counter, d, packet))
+                    counter += 1
+            while pending and pending[0][0] <= now:
+                _, _, d, packet = heapq.heappop(pending)
+                for addr in d.subscribers:
+                    try:
+                        d.sock.sendto(packet, addr)
+                        d.sent += 1
+                    except OSError:
+                        d.send_errors += 1
+            next_event = min(d.next_gen for d in self.devices)
+            if pending:
+                next_event = min(next_event, pending[0][0])
+            self._poll_pings(next_event - time.monotonic())
+        self.close()
+
+    def start(self):
+        """백그라운드 스레드에서 실행 → self"""
+        self.open()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run, name="headset-emulator", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def stats(self):
+        return {"generated": sum(d.generated for d in self.devices), "sent": sum(d.sent for d in self.devices),
+                "lost": sum(d.lost for d in self.devices), "reordered": sum(d.reordered for d in self.devices),
+                "send_errors": sum(d.send_errors for d in self.devices)}
+
+
+def _thread_cpu_seconds(native_ids):
+    """스레드들의 누적 CPU 시간 (Linux /proc, 없으면 None)"""
+    total = 0
+    try:
+        for tid in native_ids:
+            with open(f"/proc/self/task/{tid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            total += int(fields[11]) + int(fields[12])  # utime, stime (clock ticks)
+    except (OSError, IndexError, ValueError):
+        return None
+    return total / os.sysconf("SC_CLK_TCK")
+
+
+def run_load_test(rate_hz, devices, fmt="v1", loss=0.0, jitter_ms=0.0, reorder=0.0, seconds=3.0,
+                  emu_port=19101, recv_port=19201, sample_hz=500.0):
+    """
+    에뮬레이터 프로세스 1개 + 이 프로세스의 XRHandReceiver (장치마다 1개)를 loopback으로 연결해 측정
+
+    - latency: 패킷 timestamp(에뮬레이터 생성 시각) → 수신 스레드 on_packet 호출까지 (같은 PC라 시계 동일)
+    - freshness: sample_hz로 get()을 호출했을 때 돌려받은 패킷의 나이 (제어 루프가 실제로 보는 지연)
+    - receiver CPU: XRHandReceiver 수신/ping 스레드의 CPU 시간 / 경과 시간 (Linux /proc, 1코어 = 100%)
+    """
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from XRHandReceiver import XRHandReceiver
+    import subprocess
+
+    cmd = [sys.executable, os.path.abspath(__file__), "serve", "--devices", str(devices), "--port", str(emu_port),
+           "--rate", str(rate_hz), "--format", fmt, "--loss", str(loss), "--jitter-ms", str(jitter_ms),
+           "--reorder", str(reorder), "--seconds", str(seconds + 10.0)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    try:
+        if "READY" not in proc.stdout.readline():
+            raise RuntimeError("에뮬레이터 시작 실패")
+        capacity = int(rate_hz * devices * (seconds + 5.0)) + 1024
+        latency = np.empty(capacity)
+        count = [0]
+        recording = [False]
+
+        def on_packet(data):
+            if not recording[0]:
+                return
+            ts = hand_codec.packet_timestamp(data)
+            i = count[0]
+            if ts is not None and i < capacity:
+                latency[i] = time.time() - ts
+                count[0] = i + 1
+
+        receivers = []
+        for i in range(devices):
+            r = XRHandReceiver("127.0.0.1", server_port=recv_port + i, headset_port=emu_port + i)
+            r.on_packet = on_packet
+            receivers.append(r.start())
+
+        # 첫 ping → 전송 시작까지 대기
+        t_wait = time.monotonic() + 3.0
+        while any(r.get() is None for r in receivers) and time.monotonic() < t_wait:
+            time.sleep(0.01)
+        time.sleep(0.2)
+
+        ages = []
+        period = 1.0 / sample_hz
+        tids = [t.native_id for r in receivers for t in r._threads]
+        cpu0 = _thread_cpu_seconds(tids)
+        recording[0] = True
+        t0 = time.monotonic()
+        deadline = t0
+        while time.monotonic() - t0 < seconds:
+            deadline += period
+            now_wall = time.time()
+            for r in receivers:
+                ts = hand_codec.packet_timestamp(r.get())
+                if ts is not None:
+                    ages.append(now_wall - ts)
+            time.sleep(max(0.0, deadline - time.monotonic()))
+        elapsed = time.monotonic() - t0
+        recording[0] = False
+        cpu1 = _thread_cpu_seconds(tids)
+        for r in receivers:
+            r.stop()
+    finally:
+        proc.terminate()
+        proc.wait(timeout=5.0)
+
+    lat = latency[:count[0]] * 1000.0
+    ages = np.array(ages) * 1000.0
+    expected = rate_hz * devices * elapsed
+    pct = lambda a, q: float(np.percentile(a, q)) if len(a) else float("nan")
+    return {
+        "rate_hz": rate_hz, "devices": devices, "format": fmt, "loss": loss, "jitter_ms": jitter_ms, "reorder": reorder,
+        "rx_per_s": count[0] / elapsed, "rx_ratio": count[0] / expected if expected else 0.0,
+        "cpu": (cpu1 - cpu0) / elapsed if cpu0 is not None and cpu1 is not None else None,
+        "latency_p50_ms": pct(lat, 50), "latency_p99_ms": pct(lat, 99), "latency_max_ms": float(lat.max()) if len(lat) else float("nan"),
+        "age_p50_ms": pct(ages, 50), "age_p99_ms": pct(ages, 99),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import itertools
+
+    parser = argparse.ArgumentParser(description="Headset emulator / XRHandReceiver load test")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    serve = sub.add_parser("serve", help="에뮬레이터만 실행 (ping을 보낸 수신기에 손 패킷 전송)")
+    serve.add_argument("--devices", type=int, default=1)
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=9001, help="장치 i는 port + i")
+    serve.add_argument("--rate", type=float, default=72.0)
+    serve.add_argument("--format", choices=("v1", "v2"), default="v1")
+    serve.add_argument("--loss", type=float, default=0.0)
+    serve.add_argument("--jitter-ms", type=float, default=0.0)
+    serve.add_argument("--reorder", type=float, default=0.0)
+    serve.add_argument("--seconds", type=float, default=None)
+
+    load = sub.add_parser("loadtest", help="에뮬레이터 프로세스 ↔ XRHandReceiver loopback 부하 테스트 (설정 조합마다 측정)")
+    load.add_argument("--rates", default="72,250,1000")
+    load.add_argument("--devices", default="1,4")
+    load.add_argument("--formats", default="v1")
+    load.add_argument("--loss", default="0")
+    load.add_argument("--jitter-ms", default="0")
+    load.add_argument("--reorder", default="0")
+    load.add_argument("--seconds", type=float, default=3.0)
+    load.add_argument("--sample-hz", type=float, default=500.0)
+    load.add_argument("--port", type=int, default=19101)
+    args = parser.parse_args()
+
+    if args.cmd == "serve":
+        emu = HeadsetEmulator(args.devices, args.port, args.host, args.rate, args.format,
+                              args.loss, args.jitter_ms, args.reorder).open()
+        print(f"READY {args.host}:{args.port}-{args.port + args.devices - 1}", flush=True)
+        try:
+            emu.run(args.seconds)
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    floats = lambda s: [float(x) for x in s.split(",")]
+    configs = itertools.product(floats(args.rates), [int(x) for x in args.devices.split(",")], args.formats.split(","),
+                                floats(args.loss), floats(args.jitter_ms), floats(args.reorder))
+    print(f"{'rate':>6} {'dev':>3} {'fmt':>3} {'loss':>5} {'jit':>5} {'reord':>5} | {'rx/s':>7} {'rx%':>6} {'CPU':>6} "
+          f"| {'lat p50':>7} {'p99':>6} {'max':>6} | {'age p50':>7} {'p99':>6}  (ms)")
+    for rate, dev, fmt, loss, jit, reorder in configs:
+        r = run_load_test(rate, dev, fmt, loss, jit, reorder, args.seconds, args.port, args.port + 100, args.sample_hz)
+        cpu = f"{r['cpu'] * 100:5.1f}%" if r["cpu"] is not None else "   n/a"
+        print(f"{rate:6g} {dev:3d} {fmt:>3} {loss:5g} {jit:5g} {reorder:5g} | {r['rx_per_s']:7.0f} {r['rx_ratio'] * 100:5.1f}% {cpu} "
+              f"| {r['latency_p50_ms']:7.2f} {r['latency_p99_ms']:6.2f} {r['latency_max_ms']:6.2f} "
+              f"| {r['age_p50_ms']:7.2f} {r['age_p99_ms']:6.2f}", flush=True)
@@ -0,0 +1,431 @@
+import time
+import threading
+from collections import deque
+import numpy as np
+
+import hand_codec
+import stream_metrics
+
+POSES = hand_codec.POSES
+
+# sample() 결과 상태
+NO_DATA = 0       # 아직 수신한 패킷 없음 (출력 버퍼 갱신 안 함)
+INTERPOLATED = 1  # 앞뒤 패킷 사이 보간
+EXTRAPOLATED = 2  # 마지막 두 패킷으로 외삽 (max_extrapolation 이내)
+HELD = 3          # 외삽 한계를 넘어 한계 시점 pose 유지
+TIMEOUT = 4       # 마지막 패킷 수신 후 timeout초 경과 (on_timeout="hold"면 pose 유지, "stop"이면 갱신/콜백 안 함)
+STATUS_NAMES = ("no_data", "interpolated", "extrapolated", "held", "timeout")
+
+_MIN_THETA = 1e-4  # slerp 각도 하한: sin(uθ)/sinθ → u (θ→0)의 수치 불안정 회피, 오차 ~θ² 수준
+
+
+class HandResampler:
+    """
+    손 패킷(72~90 Hz, 지터 있음) → 고정 주기(기본 500 Hz) 손/헤드 pose 출력
+
+    - 시각 기준: time.monotonic(). 패킷의 장치 timestamp를 최근 clock_window초 동안의 최소 (수신 시각 - timestamp)로
+      호스트 시각으로 옮겨 네트워크 지터를 제거 (use_device_time=False면 수신 시각 그대로 사용)
+    - 출력 시각 = now - delay: 보통 앞뒤 패킷 사이이므로 보간 (위치 lerp, 쿼터니언 slerp, 53개 pose 벡터화)
+      다음 패킷이 늦으면 마지막 두 패킷으로 최대 max_extrapolation초 외삽 후 그 pose 유지 (HELD)
+    - 패킷이 timeout초 동안 없으면 TIMEOUT: on_timeout="hold"는 마지막 pose를 계속 출력, "stop"은 출력 중단
+    - 영 쿼터니언(추적 안 됨) 관절은 보간하지 않고 최신 패킷 값을 그대로 사용
+    - 출력 버퍼 pose (53, 7) float64 (v1 패킷과 같은 배치: pos 3 + quat x, y, z, w, Unity 좌표계)는 미리 할당하고
+      sample()은 ufunc out= 연산만 사용 → 주기마다 NumPy 배열을 새로 만들지 않음
+
+    사용법:
+        rs = HandResampler(rate_hz=500, on_pose=lambda t, pose, status: controller.set_target(pose))
+        rs.attach(receiver)          # receiver.on_packet 훅으로 패킷 입력 (기존 훅도 함께 호출)
+        rs.start()                   # 500 Hz 스레드가 pose 갱신 + on_pose 호출
+        rs.read(my_buffer)           # 또는 다른 스레드에서 최신 pose를 my_buffer (53, 7)로 복사 → 상태
+        # 제어 루프가 직접 주기를 관리하면 start() 없이 매 주기 status, pose = rs.sample()
+    """
+    def __init__(self, rate_hz=500.0, delay=0.02, max_extrapolation=0.03, timeout=0.25, on_timeout="hold",
+                 on_pose=None, use_device_time=True, clock_window=2.0, history=4):
+        if on_timeout not in ("hold", "stop"):
+            raise ValueError(f"지원하지 않는 on_timeout: {on_timeout} (가능: 'hold', 'stop')")
+        self.rate_hz = rate_hz
+        self.delay = delay
+        self.max_extrapolation = max_extrapolation
+        self.timeout = timeout
+        self.on_timeout = on_timeout
+        self.on_pose = on_pose
+        self.use_device_time = use_device_time
+        self.clock_window = clock_window
+
+        # 최근 패킷 ring (수신 스레드가 기록, _lock 보호)
+        self._lock = threading.Lock()
+        self._k = max(2, history)
+        self._times = np.zeros(self._k)                 # 호스트 monotonic 시각
+        self._pos = np.zeros((self._k, POSES, 3))
+        self._quat = np.zeros((self._k, POSES, 4))
+        self._valid = np.zeros((self._k, POSES), dtype=bool)
+        self._count = 0                                 # 지금까지 넣은 패킷 수 (ring 위치 = serial % k)
+        self._last_arrival = None
+        self._offsets = deque()                         # (수신 시각, 수신 시각 - 장치 timestamp)
+
+        # 현재 보간 구간 (패킷 a → b, 유지 구간은 a == b): (a, b)가 바뀔 때만 다시 계산
+        self._seg = None
+        self._t0 = 0.0
+        self._inv_dt = 0.0
+        self._p0 = np.zeros((POSES, 3))
+        self._dp = np.zeros((POSES, 3))
+        self._q0 = np.zeros((POSES, 4))
+        self._q1 = np.zeros((POSES, 4))
+        # slerp 각도는 쿼터니언 성분 수만큼 펼쳐 둠: 주기마다 같은 모양 연속 배열끼리만 연산
+        # (열 broadcast나 pose[:, 3:] 같은 strided out=는 NumPy가 내부 버퍼를 할당함)
+        self._theta = np.zeros((POSES, 4))
+        self._inv_sin = np.zeros((POSES, 4))
+        self._dot = np.zeros(POSES)
+        self._sign = np.zeros(POSES)
+        self._mask = np.zeros(POSES, dtype=bool)
+        self._w0 = np.zeros((POSES, 4))
+        self._w1 = np.zeros((POSES, 4))
+        self._pos_out = np.zeros((POSES, 3))
+        self._quat_out = np.zeros((POSES, 4))
+
+        # 출력 버퍼
+        self.pose = np.zeros((POSES, 7))
+        self.flat = self.pose.reshape(-1)  # (371,) 보기: parse()의 left_raw/right_raw/head_raw와 같은 배치
+        self._out_pos = self.pose[:, :3]
+        self._out_quat = self.pose[:, 3:]
+        self.status = NO_DATA
+        self.sample_time = None
+        self._out_lock = threading.Lock()
+
+        self.ticks = 0
+        self.deadline_misses = 0
+        self.packets = 0
+        self.dropped_packets = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._m_status = [stream_metrics.counter("hand_resampler_ticks_total", "상태별 리샘플 출력 수", status=name)
+                          for name in STATUS_NAMES]
+        self._m_misses = stream_metrics.counter("hand_resampler_deadline_misses_total", "주기 마감 시각을 놓쳐 건너뛴 출력 수")
+        self._m_dropped = stream_metrics.counter("hand_resampler_dropped_packets_total", "중복/순서가 뒤바뀌어 버린 패킷 수")
+
+    # ------------------------------------------------------------------
+    # 입력
+    def attach(self, receiver):
+        """receiver.on_packet 훅으로 수신한 모든 패킷 입력 (기존 훅이 있으면 함께 호출)"""
+        prev = receiver.on_packet
+        if prev is None:
+            receiver.on_packet = self.push_packet
+        else:
+            def hook(data):
+                prev(data)
+                self.push_packet(data)
+            receiver.on_packet = hook
+
+    def push_packet(self, data, arrival=None):
+        """v1/v2 손 패킷(bytes) 1개 입력 (형식이 다르면 False)"""
+        decoded = hand_codec.decode_packet(data)
+        if decoded is None:
+            return False
+        ts, floats, _ = decoded
+        return self.push(floats, ts, arrival)
+
+    def push(self, floats, device_time, arrival=None):
+        """(371,) 손 배열 + 장치 timestamp 입력 (arrival: 수신 시각 time.monotonic(), 기본 지금) → 사용 여부"""
+        arrival = time.monotonic() if arrival is None else arrival
+        if self.use_device_time:
+            offsets = self._offsets
+            offsets.append((arrival, arrival - device_time))
+            while offsets[0][0] < arrival - self.clock_window:
+                offsets.popleft()
+            t = device_time + min(o for _, o in offsets)
+        else:
+            t = arrival
+        poses = np.asarray(floats, dtype=np.float64).reshape(POSES, 7)
+        with self._lock:
+            if self._count:
+                newest = self._times[(self._count - 1) % self._k]
+                if t <= newest:
+                    if t < newest - 1.0:
+                        # 송신 측 재시작 등으로 시각이 크게 되돌아감 → 처음부터
+                        self._count = 0
+                        self._seg = None
+                        self._offsets.clear()
+                        self._offsets.append((arrival, arrival - device_time))
+                        t = arrival
+                    else:
+                        self.dropped_packets += 1
+                        self._m_dropped.inc()
+                        return False
+            slot = self._count % self._k
+            self._times[slot] = t
+            self._pos[slot] = poses[:, :3]
+            q = poses[:, 3:]
+            norm = np.linalg.norm(q, axis=1)
+            self._valid[slot] = norm > 1e-6
+            np.divide(q, np.where(self._valid[slot], norm, 1.0)[:, None], out=self._quat[slot])
+            self._count += 1
+            self._last_arrival = arrival
+            self.packets += 1
+        return True
+
+    # ------------------------------------------------------------------
+    # 출력
+    def _set_segment(self, a, b):
+        """패킷 a → b 보간 구간 준비 (slerp 각도/부호 정렬, _lock 안에서 호출)"""
+        sa, sb = a % self._k, b % self._k
+        self._seg = (a, b)
+        self._t0 = self._times[sa]
+        self._inv_dt = 1.0 / (self._times[sb] - self._t0)
+        np.copyto(self._p0, self._pos[sa])
+        np.subtract(self._pos[sb], self._pos[sa], out=self._dp)
+        np.copyto(self._q0, self._quat[sa])
+        np.copyto(self._q1, self._quat[sb])
+        # 한쪽이라도 추적 안 된 관절은 b 값을 그대로 (보간 없음)
+        np.logical_and(self._valid[sa], self._valid[sb], out=self._mask)
+        np.logical_not(self._mask, out=self._mask)
+        np.copyto(self._p0, self._pos[sb], where=self._mask[:, None])
+        np.copyto(self._dp, 0.0, where=self._mask[:, None])
+        np.copyto(self._q0, self._q1, where=self._mask[:, None])
+        # q와 -q는 같은 회전 → 짧은 경로가 되도록 q1 부호 정렬
+        np.einsum("ij,ij->i", self._q0, self._q1, out=self._dot)
+        np.copysign(1.0, self._dot, out=self._sign)
+        self._q1 *= self._sign[:, None]
+        np.abs(self._dot, out=self._dot)
+        np.minimum(self._dot, 1.0, out=self._dot)
+        np.arccos(self._dot, out=self._dot)
+        np.maximum(self._dot, _MIN_THETA, out=self._dot)
+        self._theta[:] = self._dot[:, None]
+        np.sin(self._theta, out=self._inv_sin)
+        np.reciprocal(self._inv_sin, out=self._inv_sin)
+
+    def _evaluate(self, u):
+        """현재 구간의 비율 u (0=a, 1=b, 1 초과=외삽) pose를 출력 버퍼에 기록"""
+        np.multiply(self._dp, u, out=self._pos_out)
+        np.add(self._pos_out, self._p0, out=self._pos_out)
+        np.multiply(self._theta, 1.0 - u, out=self._w0)
+        np.sin(self._w0, out=self._w0)
+        np.multiply(self._w0, self._inv_sin, out=self._w0)
+        np.multiply(self._theta, u, out=self._w1)
+        np.sin(self._w1, out=self._w1)
+        np.multiply(self._w1, self._inv_sin, out=self._w1)
+        np.multiply(self._q0, self._w0, out=self._quat_out)
+        np.multiply(self._q1, self._w1, out=self._w1)
+        np.add(self._quat_out, self._w1, out=self._quat_out)
+        np.copyto(self._out_pos, self._pos_out)
+        np.copyto(self._out_quat, self._quat_out)
+
+    def sample(self, now=None):
+        """
+        now(time.monotonic(), 기본 지금) 기준 pose를 self.pose에 계산 → (상태, self.pose)
+        - 반환한 pose는 다음 sample()에서 덮어쓰므로 보관하려면 복사 (다른 스레드에서는 read() 사용)
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            n = self._count
+            if n == 0:
+                return NO_DATA, self.pose
+            timed_out = self.timeout is not None and now - self._last_arrival > self.timeout
+            if timed_out and self.on_timeout == "stop":
+                self.status = TIMEOUT
+                return TIMEOUT, self.pose
+            t = now - self.delay
+            newest = n - 1
+            oldest = max(0, n - self._k)
+            if n == 1:
+                a = b = newest
+            else:
+                # t 이전의 가장 최근 패킷 a (ring 안에서), 구간 a → a+1 (최신이면 마지막 두 패킷으로 외삽)
+                a = newest
+                while a > oldest and self._times[a % self._k] > t:
+                    a -= 1
+                a = min(a, newest - 1)
+                b = a + 1
+            if self._seg is None or self._seg[0] != a or self._seg[1] != b:
+                if a == b:
+                    self._set_segment_hold(a)
+                else:
+                    self._set_segment(a, b)
+            u = (t - self._t0) * self._inv_dt
+            if a == b:
+                status, u = HELD, 0.0
+            elif u <= 1.0:
+                status, u = INTERPOLATED, max(u, 0.0)
+            else:
+                u_max = 1.0 + self.max_extrapolation * self._inv_dt
+                status = EXTRAPOLATED if u <= u_max else HELD
+                u = min(u, u_max)
+        if timed_out:
+            status = TIMEOUT
+        self.status = status
+        self.sample_time = now
+        self._evaluate(u)
+        return status, self.pose
+
+    def _set_segment_hold(self, a):
+        """패킷 1개뿐: 그 pose 유지 (θ=최소값, q0=q1)"""
+        sa = a % self._k
+        self._seg = (a, a)
+        self._t0 = self._times[sa]
+        self._inv_dt = 0.0
+        np.copyto(self._p0, self._pos[sa])
+        self._dp.fill(0.0)
+        np.copyto(self._q0, self._quat[sa])
+        np.copyto(self._q1, self._quat[sa])
+        self._theta.fill(_MIN_THETA)
+        self._inv_sin.fill(1.0 / np.sin(_MIN_THETA))
+
+    def read(self, out):
+        """최신 출력 pose를 out (53, 7)에 복사 → 상태 (start()로 돌리는 중 다른 스레드에서 사용)"""
+        with self._out_lock:
+            np.copyto(out, self.pose)
+            return self.status
+
+    # ------------------------------------------------------------------
+    # 고정 주기 스레드
+    def _loop(self):
+        period = 1.0 / self.rate_hz
+        deadline = time.monotonic()
+        while not self._stop_event.is_set():
+            delay = deadline - time.monotonic()
+            if delay > 0 and self._stop_event.wait(delay):
+                break
+            now = deadline
+            deadline += period
+            behind = time.monotonic() - deadline
+            if behind > period:
+                missed = int(behind // period)
+                deadline += missed * period
+                self.deadline_misses += missed
+                self._m_misses.inc(missed)
+            with self._out_lock:
+                status, pose = self.sample(now)
+            self.ticks += 1
+            self._m_status[status].inc()
+            if status == NO_DATA or (status == TIMEOUT and self.on_timeout == "stop"):
+                continue
+            if self.on_pose is not None:
+                try:
+                    self.on_pose(now, pose, status)
+                except Exception as e:
+                    print(f"[WARN] HandResampler on_pose 오류: {e!r}")
+
+    def start(self):
+        """rate_hz 주기 스레드 시작 (time.monotonic() 절대 마감 시각 기준, 드리프트 없음) → self"""
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._loop, name="hand-resampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def stats(self):
+        return {"ticks": self.ticks, "deadline_misses": self.deadline_misses, "packets": self.packets,
+                "dropped_packets": self.dropped_packets, "status": STATUS_NAMES[self.status]}
+
+
+if __name__ == "__main__":
+    # 지터가 있는 합성 손 패킷 → 500 Hz 출력: 주기 지터, 주기당 처리 시간/할당, 실제 동작 대비 오차, 최신값 유지 방식과 비교
+    import argparse
+    import tracemalloc
+
+    parser = argparse.ArgumentParser(description="Fixed-rate hand pose resampler benchmark")
+    parser.add_argument("--rate", type=float, default=500.0)
+    parser.add_argument("--packet-hz", type=float, default=72.0)
+    parser.add_argument("--jitter-ms", type=float, default=4.0, help="패킷 수신 지연 지터 (지수 분포 평균)")
+    parser.add_argument("--loss", type=float, default=0.02, help="패킷 손실률")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    motion = hand_codec.SyntheticHandMotion()
+    rng = np.random.default_rng(1)
+
+    # 0) 회귀 확인: 패킷 1개일 때 sample()로 만든 유지 구간이 두 번째 패킷 후 보간 구간으로 바뀌는지
+    check = HandResampler(use_device_time=False, delay=0.0)
+    p0, p1 = motion(0.0).reshape(-1), motion(0.5).reshape(-1)
+    check.push(p0, 0.0, arrival=10.0)
+    check.sample(10.0)
+    check.push(p1, 0.1, arrival=10.1)
+    status, pose = check.sample(10.05)
+    expect = (p0.reshape(POSES, 7)[:, :3] + p1.reshape(POSES, 7)[:, :3]) / 2
+    assert status == INTERPOLATED and np.abs(pose[:, :3] - expect).max() < 1e-9, "유지 → 보간 구간 전환 실패"
+
+    # 1) 시뮬레이션 시각으로 오프라인 평가 (실시간 스레드 지터와 분리)
+    rs = HandResampler(rate_hz=args.rate)
+    period = 1.0 / args.packet_hz
+    send_times = np.arange(0.0, args.seconds, period)
+    arrivals = send_times + 0.003 + rng.exponential(args.jitter_ms / 1000.0, len(send_times))
+    keep = rng.random(len(send_times)) >= args.loss
+    events = sorted(zip(arrivals[keep], send_times[keep]))
+    ticks = np.arange(0.1, args.seconds, 1.0 / args.rate)
+    err_pos, err_ang, steps_rs, steps_hold, counts = [], [], [], [], np.zeros(len(STATUS_NAMES), int)
+    latest, prev_rs, prev_hold = None, None, None
+    k = 0
+    for now in ticks:
+        while k < len(events) and events[k][0] <= now:
+            arr, ts = events[k]
+            latest = motion(ts)
+            rs.push(latest.reshape(-1), ts + 1000.0, arrival=arr)  # 장치 시계는 임의 오프셋
+            k += 1
+        status, pose = rs.sample(now)
+        counts[status] += 1
+        if status == NO_DATA:
+            continue
+        truth = motion(now - rs.delay)
+        err_pos.append(np.abs(pose[:, :3] - truth[:, :3]).max() * 1000.0)
+        dot = np.abs(np.einsum("ij,ij->i", pose[:, 3:], truth[:, 3:])) / np.linalg.norm(pose[:, 3:], axis=1)
+        err_ang.append(np.degrees(2 * np.arccos(np.clip(dot, -1.0, 1.0))).max())
+        if prev_rs is not None:
+            steps_rs.append(np.abs(pose[:, :3] - prev_rs).max() * 1000.0)
+            steps_hold.append(np.abs(latest[:, :3] - prev_hold).max() * 1000.0)
+        prev_rs, prev_hold = pose[:, :3].copy(), latest[:, :3].copy()
+
+    print(f"[정확도] 패킷 {args.packet_hz:g} Hz (지터 평균 {args.jitter_ms:g} ms, 손실 {args.loss * 100:g}%) → {args.rate:g} Hz, "
+          f"delay {rs.delay * 1000:g} ms 기준 실제 동작 대비 위치 오차 p99 {np.percentile(err_pos, 99):.2f} mm, "
+          f"회전 오차 p99 {np.percentile(err_ang, 99):.3f}°")
+    print("         상태: " + ", ".join(f"{STATUS_NAMES[i]} {c}" for i, c in enumerate(counts) if c))
+    print(f"[평활도] 연속 출력 간 최대 위치 변화 p99: 리샘플 {np.percentile(steps_rs, 99):.3f} mm / "
+          f"최신 패킷 유지 {np.percentile(steps_hold, 99):.3f} mm (유지 방식은 {np.mean(np.array(steps_hold) == 0) * 100:.0f}% 주기가 같은 값 반복 후 점프)")
+
+    # 2) 주기당 처리 시간 / 할당
+    n = 20000
+    t0 = time.perf_counter()
+    for i in range(n):
+        rs.sample(ticks[-1] - 0.01 + i * 1e-7)
+    per_tick = (time.perf_counter() - t0) / n
+    tracemalloc.start()
+    rs.sample(ticks[-1] - 0.01)
+    base, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for i in range(n):
+        rs.sample(ticks[-1] - 0.01 + i * 1e-7)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"[주기당] sample() {per_tick * 1e6:.1f} µs (예산 {1e6 / args.rate:.0f} µs), "
+          f"{n}회 동안 추가 메모리 최대 {peak - base} bytes (출력 1개 = {rs.pose.nbytes} bytes, "
+          f"구간이 바뀌는 패킷 주기에만 작은 임시 객체)")
+
+    # 3) 실시간 스레드: 실제 패킷 송신 스레드 + 500 Hz 출력
+    tick_times = []
+    rs = HandResampler(rate_hz=args.rate, on_pose=lambda t, pose, status: tick_times.append(time.monotonic()))
+    stop = threading.Event()
+
+    def feeder():
+        t_start = time.monotonic()
+        i = 0
+        while not stop.is_set():
+            t_send = t_start + i * period
+            if stop.wait(max(0.0, t_send - time.monotonic()) + rng.exponential(args.jitter_ms / 1000.0)):
+                break
+            rs.push(motion(t_send - t_start).reshape(-1), t_send)
+            i += 1
+
+    th = threading.Thread(target=feeder, daemon=True)
+    th.start()
+    rs.start()
+    time.sleep(args.seconds)
+    rs.stop()
+    stop.set()
+    th.join()
+    intervals = np.diff(tick_times) * 1000.0
+    print(f"[실시간] {len(tick_times) / args.seconds:.1f} Hz 출력, 간격 평균 {intervals.mean():.3f} ms, "
+          f"std {intervals.std():.3f} ms, p99 {np.percentile(intervals, 99):.3f} ms, 마감 놓침 {rs.deadline_misses}")
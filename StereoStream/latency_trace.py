@@ -0,0 +1,125 @@
+import threading
+import time
+import numpy as np
+
+# UdpImageSender 단계 (초 단위 구간, time.time() 벽시계 기준)
+SENDER_STAGES = ("capture_to_enqueue", "queue_wait", "resize", "encode", "send", "capture_to_sent")
+# UdpImageReceiver 단계
+RECEIVER_STAGES = ("capture_to_encoded", "encoded_to_first_packet", "reassembly", "capture_to_reassembled")
+
+
+class LatencyTracer:
+    """
+    프레임별 단계 지연 시간 링 버퍼 + 백분위 요약
+
+    사용법:
+        tracer = LatencyTracer(SENDER_STAGES)
+        tracer.record((t1 - t0, t2 - t1, ...))   # 단계 순서대로 초 단위 값
+        print(tracer.format_summary())
+    """
+    def __init__(self, stages, capacity=1024):
+        self.stages = tuple(stages)
+        self.capacity = int(capacity)
+        self._buf = np.full((self.capacity, len(self.stages)), np.nan, dtype=np.float64)
+        self._n = 0
+        self._lock = threading.Lock()
+
+    def record(self, values):
+        """단계별 값(초) 1행 기록. 값이 없는 단계는 None 또는 nan"""
+        with self._lock:
+            row = self._buf[self._n % self.capacity]
+            for i, v in enumerate(values):
+                row[i] = np.nan if v is None else v
+            self._n += 1
+
+    def __len__(self):
+        return min(self._n, self.capacity)
+
+    def clear(self):
+        with self._lock:
+            self._buf.fill(np.nan)
+            self._n = 0
+
+    def summary(self, percentiles=(50, 95, 99)):
+        """단계별 {"mean", "p50", "p95", "p99", "max", "count"} (ms 단위)"""
+        with self._lock:
+            data = self._buf[:len(self)].copy()
+        out = {}
+        for i, name in enumerate(self.stages):
+            col = data[:, i]
+            col = col[~np.isnan(col)] * 1000.0
+            if col.size == 0:
+                out[name] = {"count": 0}
+                continue
+            stat = {"count": int(col.size), "mean": float(col.mean()), "max": float(col.max())}
+            for p, v in zip(percentiles, np.percentile(col, percentiles)):
+                stat[f"p{p}"] = float(v)
+            out[name] = stat
+        return out
+
+    def format_summary(self):
+        lines = []
+        for name, st in self.summary().items():
+            if not st["count"]:
+                continue
+            lines.append(f"  {name:<24} p50 {st['p50']:7.2f} ms | p95 {st['p95']:7.2f} ms"
+                         f" | p99 {st['p99']:7.2f} ms | max {st['max']:7.2f} ms (n={st['count']})")
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # capture → enqueue → resize → encode → send → 재조립 loopback 지연 분석
+    import argparse
+    from StereoStreamer import UdpImageSender
+    from StereoReceiver import UdpImageReceiver
+
+    parser = argparse.ArgumentParser(description="StereoStream loopback latency breakdown")
+    parser.add_argument("--camera", default=None, help="RealSense 이름 키워드 (없으면 합성 영상)")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--foveated", action="store_true")
+    args = parser.parse_args()
+
+    receiver = UdpImageReceiver(0, trace=True)
+    receiver.open()
+    sender = UdpImageSender("127.0.0.1", receiver.port, 1280, 480, trace=True, foveated=args.foveated)
+    sender.open()
+    sender.connect()
+
+    cam = None
+    if args.camera:
+        from camera_datacollection import RealsenseCamera
+        cam = RealsenseCamera(name_keyword=args.camera, height=480, width=640, fps=args.fps,
+                              use_color=False, use_streo=True, reset_on_start=False)
+        cam.start_reader()
+
+    frame = np.zeros((480, 1280), dtype=np.uint8)
+    xx = np.arange(1280, dtype=np.uint16)
+    t_end = time.monotonic() + args.seconds
+    k = 0
+    try:
+        while time.monotonic() < t_end:
+            if cam is not None:
+                if not cam.frame_queue:
+                    time.sleep(0.001)
+                    continue
+                frames = cam.frame_queue.popleft()
+                frame[:, :640] = frames[2]
+                frame[:, 640:] = frames[3]
+                sender.send_image(frame, capture_ts=frames.meta["capture_time"])
+            else:
+                capture_ts = time.time()
+                frame[:] = ((xx + 4 * k) & 0xFF).astype(np.uint8)
+                sender.send_image(frame, capture_ts=capture_ts)
+                k += 1
+                time.sleep(1.0 / args.fps)
+    finally:
+        time.sleep(0.2)
+        print("[송신측]")
+        print(sender.tracer.format_summary())
+        print("[수신측]")
+        print(receiver.tracer.format_summary())
+        sender.close()
+        receiver.close()
+        if cam is not None:
+            cam.release()
@@ -0,0 +1,231 @@
+import time
+import queue
+import threading
+from collections import deque
+import numpy as np
+
+
+class TimestampMatcher:
+    """
+    카메라별 프레임 스트림을 타임스탬프 기준으로 묶는 동기화 로직 (스레드/장치 무관, 단독 시험 가능)
+
+    - push(name, ts, item)로 카메라별 버퍼에 넣고, 모든 카메라의 선두 프레임이
+      tolerance(초) 안에 들어오면 한 세트로 내보냄
+    - 선두 프레임 중 가장 이른 프레임이 가장 늦은 선두와 tolerance 이상 차이 나면
+      그 프레임은 짝을 찾을 수 없으므로 버림
+    - 중복/소폭 역행 타임스탬프는 그 프레임만 버리고, tolerance보다 크게 역행하면 버퍼 전체를 비우고 다시 시작
+    - 한 카메라가 멈추면 다른 카메라 버퍼는 buffer_size까지만 보관하고 오래된 것부터 버림
+    """
+    def __init__(self, names, tolerance=0.010, buffer_size=8, history=1024):
+        self.names = list(names)
+        self.tolerance = tolerance
+        self._buffers = {name: deque() for name in self.names}
+        self.buffer_size = buffer_size
+
+        self.matched = 0
+        self.dropped = {name: 0 for name in self.names}
+        self._skew = np.zeros(history, dtype=np.float64)
+        self._skew_n = 0
+
+    def push(self, name, ts, item):
+        """프레임 1개 추가 → 새로 완성된 세트 목록 [(ts_ref, {name: item}, skew)]"""
+        buf = self._buffers[name]
+        if buf and ts <= buf[-1][0]:
+            if buf[-1][0] - ts <= self.tolerance:
+                # 중복/살짝 뒤바뀐 타임스탬프 → 이 프레임만 버림
+                self.dropped[name] += 1
+                return []
+            # tolerance보다 크게 역행 (카메라 재시작 등) → 이전 버퍼를 비우고 다시 시작
+            self.dropped[name] += len(buf)
+            buf.clear()
+        buf.append((ts, item))
+        if len(buf) > self.buffer_size:
+            buf.popleft()
+            self.dropped[name] += 1
+        return self._match()
+
+    def _match(self):
+        out = []
+        bufs = self._buffers
+        while all(bufs[n] for n in self.names):
+            heads = [bufs[n][0][0] for n in self.names]
+            t_lo = min(heads)
+            t_hi = max(heads)
+            if t_hi - t_lo <= self.tolerance:
+                items = {n: bufs[n].popleft()[1] for n in self.names}
+                skew = t_hi - t_lo
+                self._skew[self._skew_n % len(self._skew)] = skew
+                self._skew_n += 1
+                self.matched += 1
+                out.append((t_lo, items, skew))
+            else:
+                lo = self.names[heads.index(t_lo)]
+                bufs[lo].popleft()
+                self.dropped[lo] += 1
+        return out
+
+    def skew_stats(self):
+        """최근 세트의 카메라 간 최대 시각 차이 (ms)"""
+        n = min(self._skew_n, len(self._skew))
+        if n == 0:
+            return {"count": 0}
+        s = self._skew[:n] * 1000.0
+        return {"count": n, "mean": float(s.mean()), "p50": float(np.percentile(s, 50)),
+                "p95": float(np.percentile(s, 95)), "max": float(s.max())}
+
+
+class MultiCameraSync:
+    """
+    여러 카메라(RealsenseCamera / camera_sources 소스)의 프레임을 타임스탬프로 묶어
+    세트를 bounded queue로 내보내는 관리자
+
+    - 별도 스케줄러/폴링 스레드 없음: 카메라마다 on_frames 훅으로 프레임이 도착하는 즉시 matcher에 넣음
+      (callback 모드 RealsenseCamera는 librealsense 콜백 스레드에서 바로 처리 → 장치 수와 무관하게 추가 스레드 0개,
+      poll 모드 카메라 / camera_sources 소스는 각자의 reader 스레드에서 처리)
+      기존 on_frames 훅은 함께 호출하고 stop()에서 되돌림
+    - callback 모드 RealsenseCamera는 FrameRing 슬롯 view를 복사 없이 넘기므로, matcher(buffer_size) + 출력 큐
+      (out_queue_size) + 소비자가 들고 있는 세트 1개 동안 덮어써지지 않도록
+      ring_slots >= buffer_size + out_queue_size + 3 이어야 함 (부족하면 생성 시 ValueError)
+    - timestamp_key: 비교할 meta 키. 기본 "capture_time"(global_time 도메인이면 장치 간 비교 가능)
+      align_clocks=True면 카메라별 시계 차이를 min(host_time - ts)로 추정해 보정
+      (hardware_clock / "hw_timestamp_us"처럼 장치마다 기준이 다른 타임스탬프용)
+    - 출력 큐가 가득 차면 가장 오래된 세트를 버림 (sets_dropped)
+
+    사용법:
+        sync = MultiCameraSync({"d435": cam1, "l515": cam2}, tolerance_ms=10)
+        sync.start()
+        ts, frames, skew = sync.get(timeout=1.0)   # frames["d435"] -> FrameSet
+    """
+    def __init__(self, cameras: dict, tolerance_ms=10.0, timestamp_key="capture_time", align_clocks=False,
+                 timestamp_scale=1.0, buffer_size=8, out_queue_size=4):
+        """timestamp_scale: meta 값 → 초 변환 배율 (예: hw_timestamp_us면 1e-6, timestamp_ms면 1e-3)"""
+        self.cameras = dict(cameras)
+        need = buffer_size + out_queue_size + 3
+        for name, cam in self.cameras.items():
+            ring = getattr(cam, "ring", None)
+            if ring is not None and ring.slots < need:
+                raise ValueError(f"'{name}' FrameRing 슬롯 {ring.slots}개로는 세트가 소비되기 전에 덮어써집니다. "
+                                 f"ring_slots를 {need} 이상으로 하거나 buffer_size/out_queue_size를 줄이세요.")
+        self.timestamp_key = timestamp_key
+        self.timestamp_scale = timestamp_scale
+        self.align_clocks = align_clocks
+        self.matcher = TimestampMatcher(self.cameras.keys(), tolerance_ms / 1000.0, buffer_size)
+        self._offsets = {name: None for name in self.cameras}
+        self.frames_in = {name: 0 for name in self.cameras}
+        self.sets_dropped = 0
+        self._out = queue.Queue(maxsize=out_queue_size)
+        self._lock = threading.Lock()  # 여러 카메라 스레드가 matcher를 함께 사용
+        self._hooks = {}               # name -> 기존 on_frames 훅
+
+    def start(self, start_readers=True):
+        """카메라 on_frames 훅 연결 (+ poll 모드 카메라의 reader 스레드 시작) → self"""
+        for name, cam in self.cameras.items():
+            if name in self._hooks:
+                continue
+            prev = cam.on_frames
+            self._hooks[name] = prev
+            cam.on_frames = self._make_hook(name, prev)
+        if start_readers:
+            for cam in self.cameras.values():
+                if cam.is_opened and cam.reader_thread is None:
+                    cam.start_reader()  # callback 모드 RealsenseCamera는 아무 것도 하지 않음
+        return self
+
+    def _make_hook(self, name, prev):
+        if prev is None:
+            return lambda frames: self.push(name, frames)
+
+        def hook(frames):
+            prev(frames)
+            self.push(name, frames)
+        return hook
+
+    def push(self, name, frames):
+        """카메라 name의 FrameSet 1개 입력 (on_frames 훅이 호출, 직접 호출해도 됨)"""
+        with self._lock:
+            self.frames_in[name] += 1
+            ts = self._timestamp(name, frames)
+            if ts is None:
+                return
+            for matched in self.matcher.push(name, ts, frames):
+                self._emit(matched)
+
+    def _timestamp(self, name, frames):
+        meta = frames.meta
+        ts = meta.get(self.timestamp_key)
+        if ts is None:
+            return None
+        ts = ts * self.timestamp_scale
+        if self.align_clocks:
+            d = meta["host_time"] - ts
+            off = self._offsets[name]
+            if off is None or d < off:
+                self._offsets[name] = off = d
+            ts += off
+        return ts
+
+    def _emit(self, matched):
+        while True:
+            try:
+                self._out.put_nowait(matched)
+                return
+            except queue.Full:
+                try:
+                    self._out.get_nowait()
+                    self.sets_dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """(기준 시각, {name: FrameSet}, skew초) — timeout 초과 시 None"""
+        try:
+            return self._out.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stats(self):
+        return {"frames_in": dict(self.frames_in), "sets_matched": self.matcher.matched,
+                "sets_dropped": self.sets_dropped, "frames_dropped": dict(self.matcher.dropped),
+                "skew_ms": self.matcher.skew_stats()}
+
+    def stop(self, release=False):
+        """on_frames 훅을 원래대로 되돌림 (release=True면 카메라도 종료)"""
+        for name, prev in self._hooks.items():
+            self.cameras[name].on_frames = prev
+        self._hooks = {}
+        if release:
+            for cam in self.cameras.values():
+                cam.release()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Multi-camera timestamp sync")
+    parser.add_argument("--cameras", nargs="*", default=None,
+                        help="RealSense 이름 키워드 목록 (없으면 지터가 있는 합성 카메라 2대)")
+    parser.add_argument("--tolerance-ms", type=float, default=10.0)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    if args.cameras:
+        from camera_datacollection import RealsenseCamera
+        cams = {name: RealsenseCamera(name_keyword=name, height=480, width=640, fps=30, use_color=True,
+                                      reset_on_start=False) for name in args.cameras}
+    else:
+        from camera_sources import SyntheticCamera
+        cams = {
+            "cam_a": SyntheticCamera(240, 320, fps=30, jitter_ms=1.0, seed=1),
+            "cam_b": SyntheticCamera(240, 320, fps=30, offset_ms=4.0, jitter_ms=2.0, drop_rate=0.05, seed=2),
+        }
+
+    sync = MultiCameraSync(cams, tolerance_ms=args.tolerance_ms).start()
+    t_end = time.monotonic() + args.seconds
+    try:
+        while time.monotonic() < t_end:
+            sync.get(timeout=0.5)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sync.stop(release=True)
+    print(sync.stats())
@@ -0,0 +1,305 @@
+import time
+import threading
+from collections import deque
+import numpy as np
+import cv2
+
+import stream_metrics
+
+DROP_OLDEST = "drop_oldest"  # 가득 차면 가장 오래된 항목을 버림 (실시간 스트리밍 기본값: 항상 최신 프레임 처리)
+DROP_NEWEST = "drop_newest"  # 가득 차면 새 항목을 버림
+BLOCK = "block"              # 가득 차면 자리가 날 때까지 대기 (기록처럼 손실이 없어야 하는 경우)
+_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+_EMPTY = object()
+
+
+class BoundedQueue:
+    """단계 사이 bounded queue (정책에 따라 버리거나 대기)"""
+    def __init__(self, maxsize=1, policy=DROP_OLDEST):
+        if policy not in _POLICIES:
+            raise ValueError(f"지원하지 않는 policy: {policy} (가능: {_POLICIES})")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                if self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                if self.policy == DROP_OLDEST:
+                    self._items.popleft()
+                    self.dropped += 1
+                else:
+                    self._cond.wait_for(lambda: len(self._items) < self.maxsize or self._closed)
+                    if self._closed:
+                        return False
+            self._items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """항목 1개 (timeout 또는 close 시 _EMPTY)"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                return _EMPTY
+            if not self._items:
+                return _EMPTY
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def open(self):
+        with self._cond:
+            self._closed = False
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class Stage:
+    """
+    파이프라인 단계 1개 = 입력 큐 + 전용 스레드 + fn(item) -> 다음 단계로 넘길 항목 (None이면 넘기지 않음)
+    - busy_s: fn 실행에 쓴 누적 시간 → utilization = busy_s / 경과 시간 (1에 가까우면 이 단계가 병목)
+    """
+    def __init__(self, name, fn, queue_size=1, policy=DROP_OLDEST):
+        self.name = name
+        self.fn = fn
+        self.queue = BoundedQueue(queue_size, policy)
+        self.items = 0
+        self.errors = 0
+        self.busy_s = 0.0
+        self._m_items = stream_metrics.counter("pipeline_stage_items_total", "단계가 처리한 항목 수", stage=name)
+        self._m_busy = stream_metrics.counter("pipeline_stage_busy_seconds_total", "단계 처리 누적 시간", stage=name)
+        self._m_dropped = stream_metrics.gauge("pipeline_stage_dropped", "입력 큐에서 버린 항목 수", stage=name,
+                                               fn=lambda q=self.queue: q.dropped)
+
+    def process(self, item):
+        t0 = time.perf_counter()
+        try:
+            out = self.fn(item)
+        except Exception as e:
+            self.errors += 1
+            if self.errors == 1:
+                print(f"[WARN] 파이프라인 단계 '{self.name}' 오류: {e!r}")
+            out = None
+        dt = time.perf_counter() - t0
+        self.items += 1
+        self.busy_s += dt
+        self._m_items.inc()
+        self._m_busy.inc(dt)
+        return out
+
+
+class PipelineRunner:
+    """
+    source → stage → stage → ... 실행기 (단계마다 전용 스레드, 단계 사이 bounded queue)
+
+    - source: read() -> (ok, item)인 카메라(RealsenseCamera / camera_sources) 또는 item(없으면 None)을 반환하는 함수
+      카메라 read()는 새 프레임이 올 때까지 대기하므로 fps=None이면 카메라 고유 속도로 동작
+    - fps: 주면 time.monotonic() 기준 절대 마감 시각(t0 + k/fps)마다 source를 호출
+      (처리 시간 + sleep이 누적되지 않아 드리프트 없음, 한 주기 이상 늦으면 밀린 주기를 건너뛰고 deadline_misses에 기록)
+    - 뒤 단계가 느리면 입력 큐 정책(DROP_OLDEST 기본)에 따라 버리므로 source는 멈추지 않음
+
+    사용법:
+        runner = PipelineRunner(cam, [Stage("compose", SideBySideComposer(480, 640)),
+                                      sender_stage(sender)])
+        runner.run(report_interval=5.0)   # Ctrl+C까지 실행하며 주기적으로 단계별 통계 출력
+    """
+    def __init__(self, source, stages, fps=None):
+        self.source = source
+        self.stages = list(stages)
+        self.fps = fps
+        self.frames = 0
+        self.read_failures = 0
+        self.deadline_misses = 0
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._t_start = None
+        self._m_frames = stream_metrics.counter("pipeline_source_frames_total", "source에서 읽은 항목 수")
+        self._m_misses = stream_metrics.counter("pipeline_deadline_misses_total", "fps 마감 시각을 놓쳐 건너뛴 주기 수")
+
+    def _read(self):
+        if hasattr(self.source, "read"):
+            ok, item = self.source.read()
+            return item if ok else None
+        return self.source()
+
+    def _source_loop(self):
+        first = self.stages[0].queue if self.stages else None
+        period = 1.0 / self.fps if self.fps else None
+        deadline = time.monotonic()
+        while not self._stop_event.is_set():
+            if period is not None:
+                delay = deadline - time.monotonic()
+                if delay > 0 and self._stop_event.wait(delay):
+                    break
+                deadline += period
+                behind = time.monotonic() - deadline
+                if behind > period:
+                    missed = int(behind // period)
+                    deadline += missed * period
+                    self.deadline_misses += missed
+                    self._m_misses.inc(missed)
+            item = self._read()
+            if item is None:
+                self.read_failures += 1
+                # 열리지 않은 카메라 / 끝난 재생 소스가 즉시 실패를 반환해도 CPU를 점유하지 않도록
+                self._stop_event.wait(0.01)
+                continue
+            self.frames += 1
+            self._m_frames.inc()
+            if first is not None:
+                first.put(item)
+
+    def _stage_loop(self, index):
+        stage = self.stages[index]
+        nxt = self.stages[index + 1].queue if index + 1 < len(self.stages) else None
+        while not self._stop_event.is_set():
+            item = stage.queue.get(timeout=0.1)
+            if item is _EMPTY:
+                continue
+            out = stage.process(item)
+            if out is not None and nxt is not None:
+                nxt.put(out)
+
+    def start(self):
+        self._stop_event.clear()
+        for stage in self.stages:
+            stage.queue.open()
+        self._t_start = time.monotonic()
+        self._threads = [threading.Thread(target=self._source_loop, name="pipeline-source", daemon=True)]
+        self._threads += [threading.Thread(target=self._stage_loop, args=(i,), name=f"pipeline-{s.name}", daemon=True)
+                          for i, s in enumerate(self.stages)]
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        for stage in self.stages:
+            stage.queue.close()
+        for t in self._threads:
+            t.join(timeout=timeout)
+        self._threads = []
+
+    def run(self, duration=None, report_interval=None):
+        """start 후 duration초(None이면 Ctrl+C까지) 대기, report_interval초마다 stats 한 줄 출력. 끝나면 stop"""
+        self.start()
+        t_end = None if duration is None else time.monotonic() + duration
+        t_report = time.monotonic()
+        try:
+            while t_end is None or time.monotonic() < t_end:
+                time.sleep(0.1)
+                if report_interval and time.monotonic() - t_report >= report_interval:
+                    t_report = time.monotonic()
+                    print(self.format_stats())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stats(self):
+        elapsed = max(time.monotonic() - self._t_start, 1e-9) if self._t_start is not None else 0.0
+        out = {"elapsed_s": elapsed, "frames": self.frames,
+               "fps": self.frames / elapsed if elapsed else 0.0,
+               "read_failures": self.read_failures, "deadline_misses": self.deadline_misses, "stages": {}}
+        for s in self.stages:
+            out["stages"][s.name] = {
+                "items": s.items, "dropped": s.queue.dropped, "errors": s.errors,
+                "utilization": s.busy_s / elapsed if elapsed else 0.0,
+                "mean_ms": s.busy_s / s.items * 1000.0 if s.items else 0.0,
+            }
+        return out
+
+    def format_stats(self):
+        st = self.stats()
+        parts = [f"[파이프라인] source {st['fps']:.1f} fps"]
+        for name, s in st["stages"].items():
+            parts.append(f"{name} {s['mean_ms']:.2f} ms ({s['utilization'] * 100:.0f}%, drop {s['dropped']})")
+        return " | ".join(parts)
+
+
+class SideBySideComposer:
+    """
+    FrameSet의 IR1/IR2(흑백)를 좌우로 붙인 BGR 영상 + 캡처 시각 (compose 단계용)
+
+    - 출력 버퍼를 pool 개 미리 할당해 돌려 가며 사용 (프레임마다 할당하지 않고,
+      UdpImageSender 큐/워커가 아직 인코딩 중인 버퍼를 덮어쓰지 않도록 충분히 크게: 기본 4)
+    - streams: FrameSet에서 사용할 좌/우 인덱스 (기본 (2, 3) = streo1, streo2)
+    - rectifier: stereo_rectify.StereoRectifier를 주면 좌/우를 정렬(rectify)해서 합성 (선택, 기본 없음)
+      (StereoRectifier.rectify_side_by_side가 pool 버퍼에 바로 기록)
+    """
+    def __init__(self, height, width, pool=4, streams=(2, 3), rectifier=None):
+        self.height = height
+        self.width = width
+        self.streams = streams
+        self.rectifier = rectifier
+        self._pool = [np.zeros((height, width * 2, 3), dtype=np.uint8) for _ in range(pool)]
+        self._next = 0
+
+    def __call__(self, frames):
+        left, right = frames[self.streams[0]], frames[self.streams[1]]
+        if left is None or right is None:
+            return None
+        buf = self._pool[self._next]
+        self._next = (self._next + 1) % len(self._pool)
+        w = self.width
+        if self.rectifier is not None:
+            self.rectifier.rectify_side_by_side(left, right, (w, self.height), out=buf)
+        else:
+            for img, dst in ((left, buf[:, :w]), (right, buf[:, w:])):
+                if img.ndim == 2:
+                    cv2.cvtColor(img, cv2.COLOR_GRAY2BGR, dst=dst)  # 브로드캐스트 대입보다 빠름
+                else:
+                    dst[...] = img
+        meta = getattr(frames, "meta", None) or {}
+        return buf, meta.get("capture_time")
+
+
+def sender_stage(sender, name="send", queue_size=1, on_sent=None):
+    """(image, capture_ts) 또는 image를 UdpImageSender.send_image로 넘기는 단계 (인코딩/전송은 sender 워커 스레드)"""
+    def send(item):
+        img, capture_ts = item if isinstance(item, tuple) else (item, None)
+        sender.send_image(img, capture_ts)
+        if on_sent is not None:
+            on_sent(img)
+    return Stage(name, send, queue_size, DROP_OLDEST)
+
+
+if __name__ == "__main__":
+    # 합성 카메라 → compose → loopback UdpImageSender: 카메라 fps 유지 여부와 단계별 사용률 확인
+    import argparse
+    from StereoStreamer import UdpImageSender
+    from camera_sources import SyntheticCamera
+
+    parser = argparse.ArgumentParser(description="Frame-paced pipeline benchmark")
+    parser.add_argument("--fps", type=float, default=60.0)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    cam = SyntheticCamera(args.height, args.width, fps=args.fps)
+    sender = UdpImageSender("127.0.0.1", 9003, args.width * 2, args.height)
+    sender.open()
+    runner = PipelineRunner(cam, [Stage("compose", SideBySideComposer(args.height, args.width)),
+                                  sender_stage(sender)])
+    try:
+        runner.run(duration=args.seconds, report_interval=2.0)
+    finally:
+        sender.close()
+        cam.release()
+    st = sender.stats()
+    print(f"[결과] 카메라 {args.fps:g} fps → source {runner.stats()['fps']:.1f} fps, "
+          f"sender 전송 {st['frames_sent']} / 입력 {st['frames_in']} (워커 drop {st['dropped_frames']})")
@@ -0,0 +1,135 @@
+import numpy as np
+import cv2
+
+
+class StereoRectifier:
+    """
+    RealSense IR 스테레오 쌍을 위한 정렬(rectify) + 크롭 + 스케일 결합 remap 테이블
+
+    - 카메라 내부/외부 파라미터로 cv2.stereoRectify를 한 번만 수행하고,
+      출력 해상도별로 (정렬 → 크롭 → 스케일)을 하나로 합친 remap 테이블을 캐시합니다.
+    - 매 프레임은 눈마다 cv2.remap 1회를 미리 할당한 출력 버퍼에 수행합니다.
+
+    사용법:
+        rectifier = StereoRectifier.from_realsense(cam)
+        left, right = rectifier.rectify(s1, s2, out_size=(640, 480))
+        # 또는 side-by-side 버퍼에 바로 합성
+        sbs = rectifier.rectify_side_by_side(s1, s2, out_size=(640, 480))
+    """
+    def __init__(self, K1, D1, K2, D2, R, T, image_size, alpha=0.0, crop=None,
+                 interpolation=cv2.INTER_LINEAR):
+        """
+        - K1, K2: 3x3 카메라 행렬 / D1, D2: 왜곡 계수 (k1, k2, p1, p2, k3)
+        - R, T: 왼쪽(IR1) → 오른쪽(IR2) 카메라 회전(3x3) / 이동(3) (RealSense extrinsics와 동일한 방향)
+        - image_size: 입력 영상 크기 (w, h)
+        - alpha: cv2.stereoRectify alpha (0이면 유효 픽셀만 남도록 확대, 1이면 전체 보존)
+        - crop: 정렬된 영상 좌표계에서 잘라낼 영역 (x, y, w, h), None이면 전체
+        """
+        self.K1 = np.asarray(K1, dtype=np.float64)
+        self.D1 = np.asarray(D1, dtype=np.float64)
+        self.K2 = np.asarray(K2, dtype=np.float64)
+        self.D2 = np.asarray(D2, dtype=np.float64)
+        self.R = np.asarray(R, dtype=np.float64).reshape(3, 3)
+        self.T = np.asarray(T, dtype=np.float64).reshape(3, 1)
+        self.image_size = (int(image_size[0]), int(image_size[1]))
+        self.interpolation = interpolation
+
+        self.R1, self.R2, self.P1, self.P2, self.Q, roi1, roi2 = cv2.stereoRectify(
+            self.K1, self.D1, self.K2, self.D2, self.image_size, self.R, self.T,
+            flags=cv2.CALIB_ZERO_DISPARITY, alpha=alpha
+        )
+        self.crop = tuple(crop) if crop is not None else (0, 0) + self.image_size
+
+        self._maps = {}     # out_size -> (map1_l, map2_l, map1_r, map2_r)
+        self._buffers = {}  # (out_size, dtype, channels) -> (left, right, side_by_side)
+
+    @staticmethod
+    def intrinsics_to_cv(intrinsics):
+        """pyrealsense2 intrinsics → (K, D, (w, h))"""
+        K = np.array([[intrinsics.fx, 0.0, intrinsics.ppx],
+                      [0.0, intrinsics.fy, intrinsics.ppy],
+                      [0.0, 0.0, 1.0]])
+        D = np.array(list(intrinsics.coeffs)[:5], dtype=np.float64)
+        return K, D, (intrinsics.width, intrinsics.height)
+
+    @classmethod
+    def from_realsense(cls, camera, **kwargs):
+        """use_streo=True로 열린 RealsenseCamera의 IR1/IR2 파라미터로 생성"""
+        if camera.ir1_intrinsics is None or camera.ir2_intrinsics is None or camera.ir1_to_ir2_extrinsics is None:
+            raise RuntimeError("IR 스테레오 파라미터가 없습니다. use_streo=True로 카메라를 여세요.")
+        K1, D1, size = cls.intrinsics_to_cv(camera.ir1_intrinsics)
+        K2, D2, _ = cls.intrinsics_to_cv(camera.ir2_intrinsics)
+        ext = camera.ir1_to_ir2_extrinsics
+        # RealSense extrinsics rotation은 column-major 9개 값
+        R = np.array(ext.rotation, dtype=np.float64).reshape(3, 3).T
+        T = np.array(ext.translation, dtype=np.float64)
+        return cls(K1, D1, K2, D2, R, T, size, **kwargs)
+
+    def _output_camera_matrix(self, P, out_size):
+        """정렬 투영행렬 P에 크롭/스케일을 합성한 3x3 새 카메라 행렬"""
+        cx0, cy0, cw, ch = self.crop
+        sx = out_size[0] / float(cw)
+        sy = out_size[1] / float(ch)
+        S = np.array([[sx, 0.0, -sx * cx0],
+                      [0.0, sy, -sy * cy0],
+                      [0.0, 0.0, 1.0]])
+        return S @ P[:3, :3]
+
+    def maps(self, out_size):
+        """출력 해상도(w, h)의 결합 remap 테이블 (최초 1회 생성 후 캐시)"""
+        out_size = (int(out_size[0]), int(out_size[1]))
+        maps = self._maps.get(out_size)
+        if maps is None:
+            m1l, m2l = cv2.initUndistortRectifyMap(
+                self.K1, self.D1, self.R1, self._output_camera_matrix(self.P1, out_size),
+                out_size, cv2.CV_16SC2)
+            m1r, m2r = cv2.initUndistortRectifyMap(
+                self.K2, self.D2, self.R2, self._output_camera_matrix(self.P2, out_size),
+                out_size, cv2.CV_16SC2)
+            maps = (m1l, m2l, m1r, m2r)
+            self._maps[out_size] = maps
+        return maps
+
+    def _get_buffers(self, out_size, img):
+        channels = img.shape[2:]
+        key = (out_size, img.dtype.str, channels)
+        bufs = self._buffers.get(key)
+        if bufs is None:
+            w, h = out_size
+            sbs = np.zeros((h, 2 * w) + channels, dtype=img.dtype)
+            bufs = (np.zeros((h, w) + channels, dtype=img.dtype),
+                    np.zeros((h, w) + channels, dtype=img.dtype),
+                    sbs)
+            self._buffers[key] = bufs
+        return bufs
+
+    def rectify(self, left, right, out_size=None):
+        """
+        좌/우 영상을 정렬된 출력 버퍼에 remap
+        반환 배열은 내부 버퍼이므로 다음 호출 시 덮어써집니다 (필요하면 copy).
+        """
+        out_size = tuple(out_size) if out_size is not None else self.crop[2:]
+        m1l, m2l, m1r, m2r = self.maps(out_size)
+        out_l, out_r, _ = self._get_buffers(out_size, left)
+        cv2.remap(left, m1l, m2l, self.interpolation, dst=out_l)
+        cv2.remap(right, m1r, m2r, self.interpolation, dst=out_r)
+        return out_l, out_r
+
+    def rectify_side_by_side(self, left, right, out_size=None, out=None):
+        """
+        정렬된 좌/우 영상을 [left | right] side-by-side 버퍼로 합성 (UdpImageSender 입력용)
+        - 눈마다 remap 1회를 side-by-side 버퍼의 좌/우 절반에 바로 기록 (중간 버퍼 복사 없음)
+        - out: 기록할 (h, 2w[, c]) 버퍼 (입력과 같은 dtype), None이면 내부 버퍼 (다음 호출 시 덮어씀)
+          흑백 입력에 3채널 out을 주면 내부 흑백 버퍼에 remap한 뒤 cvtColor로 out에 BGR 기록
+        """
+        out_size = tuple(out_size) if out_size is not None else self.crop[2:]
+        m1l, m2l, m1r, m2r = self.maps(out_size)
+        gray_to_bgr = out is not None and left.ndim == 2 and out.ndim == 3
+        sbs = self._get_buffers(out_size, left)[2] if out is None or gray_to_bgr else out
+        w = out_size[0]
+        cv2.remap(left, m1l, m2l, self.interpolation, dst=sbs[:, :w])
+        cv2.remap(right, m1r, m2r, self.interpolation, dst=sbs[:, w:])
+        if gray_to_bgr:
+            cv2.cvtColor(sbs, cv2.COLOR_GRAY2BGR, dst=out)
+            return out
+        return sbs
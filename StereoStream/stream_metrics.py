@@ -0,0 +1,256 @@
+import bisect
+import threading
+
+# 초 단위 지연/처리 시간용 기본 구간 (0.5 ms ~ 1 s)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.033, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class _Sharded:
+    """
+    스레드별 셀(shard)에만 쓰는 잠금 없는 누적기
+    - 각 셀은 자기 스레드만 갱신하므로 경쟁 없이 += 가능, 읽을 때 모든 셀을 합산
+    - 종료된 스레드의 셀도 남겨 두어 누적값이 줄어들지 않음
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+
+    def _new_cell(self):
+        raise NotImplementedError
+
+    def _cell(self):
+        cell = getattr(self._local, "cell", None)
+        if cell is None:
+            cell = self._local.cell = self._new_cell()
+            self._shards.append(cell)  # list.append는 원자적
+        return cell
+
+
+class Counter(_Sharded):
+    """단조 증가 카운터"""
+    kind = "counter"
+
+    def _new_cell(self):
+        return [0]
+
+    def inc(self, n=1):
+        self._cell()[0] += n
+
+    @property
+    def value(self):
+        return sum(c[0] for c in list(self._shards))
+
+
+class Gauge:
+    """현재 값 (set은 단일 대입이라 잠금 불필요). fn을 주면 출력할 때마다 fn()을 호출"""
+    kind = "gauge"
+
+    def __init__(self, fn=None):
+        self._value = 0.0
+        self._fn = fn
+
+    def set(self, value):
+        self._value = value
+
+    def set_function(self, fn):
+        self._fn = fn
+
+    @property
+    def value(self):
+        if self._fn is not None:
+            try:
+                return float(self._fn())
+            except Exception:
+                return float("nan")
+        return self._value
+
+
+class Histogram(_Sharded):
+    """고정 구간 히스토그램 (셀 = 구간별 개수 + [+Inf] + 합계)"""
+    kind = "histogram"
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        super().__init__()
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_cell(self):
+        return [0] * (len(self.buckets) + 2)
+
+    def observe(self, value):
+        cell = self._cell()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def snapshot(self):
+        """(누적 구간 개수 목록(+Inf 포함), 합계, 전체 개수)"""
+        n = len(self.buckets) + 1
+        counts = [0] * n
+        total = 0.0
+        for cell in list(self._shards):
+            for i in range(n):
+                counts[i] += cell[i]
+            total += cell[-1]
+        cumulative = []
+        acc = 0
+        for c in counts:
+            acc += c
+            cumulative.append(acc)
+        return cumulative, total, acc
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    body = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                    for k, v in items)
+    return "{" + body + "}"
+
+
+def _format_value(v):
+    if v != v:
+        return "NaN"
+    if v in (float("inf"), float("-inf")):
+        return "+Inf" if v > 0 else "-Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class MetricsRegistry:
+    """
+    이름 + 라벨별 메트릭 모음 (같은 이름/라벨로 다시 요청하면 기존 객체 반환)
+
+    사용법:
+        frames = REGISTRY.counter("camera_frames_total", "수신 프레임 수", camera="d405")
+        frames.inc()
+        REGISTRY.histogram("stereo_encode_seconds", "인코딩 시간").observe(0.004)
+        print(REGISTRY.render())        # Prometheus text format
+    """
+    def __init__(self):
+        self._lock = threading.Lock()  # 등록 시에만 사용 (갱신 경로는 잠금 없음)
+        self._families = {}  # name -> (kind, help, {labels tuple: metric})
+
+    def _get(self, cls, name, help, labels, **kwargs):
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        family = self._families.get(name)
+        if family is not None and key in family[2]:
+            return family[2][key]
+        with self._lock:
+            family = self._families.setdefault(name, (cls.kind, help, {}))
+            if family[0] != cls.kind:
+                raise ValueError(f"메트릭 {name}이(가) 이미 {family[0]}로 등록되어 있습니다.")
+            metric = family[2].get(key)
+            if metric is None:
+                metric = family[2][key] = cls(**kwargs)
+            return metric
+
+    def counter(self, name, help="", **labels) -> Counter:
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help="", fn=None, **labels) -> Gauge:
+        gauge = self._get(Gauge, name, help, labels)
+        if fn is not None:
+            gauge.set_function(fn)
+        return gauge
+
+    def histogram(self, name, help="", buckets=DEFAULT_BUCKETS, **labels) -> Histogram:
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            families = [(name, kind, help, list(series.items()))
+                        for name, (kind, help, series) in sorted(self._families.items())]
+        for name, kind, help, series in families:
+            if help:
+                lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in series:
+                if kind == "histogram":
+                    cumulative, total, count = metric.snapshot()
+                    bounds = [repr(float(b)) for b in metric.buckets] + ["+Inf"]
+                    for le, c in zip(bounds, cumulative):
+                        lines.append(f"{name}_bucket{_format_labels(labels, ('le', le))} {c}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(metric.value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name, help="", **labels) -> Counter:
+    return REGISTRY.counter(name, help, **labels)
+
+
+def gauge(name, help="", fn=None, **labels) -> Gauge:
+    return REGISTRY.gauge(name, help, fn, **labels)
+
+
+def histogram(name, help="", buckets=DEFAULT_BUCKETS, **labels) -> Histogram:
+    return REGISTRY.histogram(name, help, buckets, **labels)
+
+
+def start_http_server(port=9100, host="127.0.0.1", registry=REGISTRY):
+    """
+    GET /metrics 로 Prometheus text format을 제공하는 HTTP 서버를 데몬 스레드로 시작
+    - 기본은 localhost만 허용 (원격 수집은 host="0.0.0.0")
+    - 반환된 서버의 shutdown()으로 종료
+    """
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler  # 엔드포인트를 쓸 때만 import
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    # 합성 카메라 → loopback UdpImageSender 스트림을 돌리며 /metrics 제공
+    import time
+    import argparse
+    import numpy as np
+
+    parser = argparse.ArgumentParser(description="Metrics endpoint demo")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--seconds", type=float, default=30.0)
+    args = parser.parse_args()
+
+    # StereoStreamer가 import한 모듈과 같은 REGISTRY를 쓰도록 __main__이 아닌 모듈로 다시 import
+    import stream_metrics
+    from StereoStreamer import UdpImageSender
+    from camera_sources import SyntheticCamera
+
+    server = stream_metrics.start_http_server(args.port)
+    print(f"[INFO] http://127.0.0.1:{args.port}/metrics")
+    cam = SyntheticCamera(480, 640, fps=30)
+    sender = UdpImageSender("127.0.0.1", 9003, 1280, 480)
+    sender.open()
+    t_end = time.monotonic() + args.seconds
+    try:
+        while time.monotonic() < t_end:
+            ok, (_, _, s1, s2) = cam.read()
+            if ok:
+                sender.send_image(np.hstack([s1, s2]))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sender.close()
+        cam.release()
+        server.shutdown()
@@ -0,0 +1,151 @@
+from fractions import Fraction
+import numpy as np
+
+try:
+    # pip install av
+    import av
+    _USE_PYAV = True
+except ImportError:
+    av = None
+    _USE_PYAV = False
+
+# 확장 헤더 Codec 필드 값 (CODEC_JPEG = 0은 StereoStreamer에 정의)
+CODEC_H264 = 1
+CODEC_HEVC = 2
+
+_ENCODERS = {
+    "h264": ("libx264", CODEC_H264),
+    "hevc": ("libx265", CODEC_HEVC),
+}
+_DECODERS = {
+    CODEC_H264: "h264",
+    CODEC_HEVC: "hevc",
+}
+
+
+class VideoEncoder:
+    """
+    PyAV(libx264/libx265) 저지연 소프트웨어 인코더
+
+    - preset=ultrafast, tune=zerolatency, B-frame 없음 → 입력 1프레임당 출력 1 access unit (Annex-B)
+    - keyframe_interval 프레임마다 IDR 프레임을 강제하여 패킷 손실 후 복구
+    - request_keyframe()으로 다음 프레임을 즉시 IDR로 인코딩 (수신측 요청용)
+    - 입력 해상도가 바뀌면 인코더를 다시 생성 (adaptive 모드의 배율 변경 대응)
+    """
+    def __init__(self, codec="h264", fps=30, bitrate=4_000_000, keyframe_interval=60,
+                 preset="ultrafast", threads=0):
+        if not _USE_PYAV:
+            raise RuntimeError("PyAV 모듈이 없습니다. pip install av 후 사용하세요.")
+        if codec not in _ENCODERS:
+            raise ValueError(f"지원하지 않는 codec: {codec} (가능: {list(_ENCODERS)})")
+        self.codec_name, self.codec_id = _ENCODERS[codec]
+        self.fps = int(round(fps))
+        self.bitrate = int(bitrate)
+        self.keyframe_interval = int(keyframe_interval)
+        self.preset = preset
+        self.threads = threads
+        self._ctx = None
+        self._size = None
+        self._count = 0
+        self._force_key = True
+
+    def _open(self, width, height):
+        ctx = av.CodecContext.create(self.codec_name, "w")
+        ctx.width = width
+        ctx.height = height
+        ctx.pix_fmt = "yuv420p"
+        ctx.time_base = Fraction(1, self.fps)
+        ctx.framerate = Fraction(self.fps, 1)
+        ctx.bit_rate = self.bitrate
+        ctx.gop_size = self.keyframe_interval
+        ctx.max_b_frames = 0
+        ctx.thread_count = self.threads
+        if self.codec_name == "libx264":
+            ctx.options = {"preset": self.preset, "tune": "zerolatency",
+                           "x264-params": "repeat-headers=1"}
+        else:
+            ctx.options = {"preset": self.preset, "tune": "zerolatency",
+                           "x265-params": "repeat-headers=1:log-level=error"}
+        ctx.open()
+        self._ctx = ctx
+        self._size = (width, height)
+        self._count = 0
+        self._force_key = True
+
+    def request_keyframe(self):
+        self._force_key = True
+
+    def set_bitrate(self, bitrate):
+        """목표 비트레이트 변경 (다음 IDR부터 적용되도록 인코더 재생성)"""
+        self.bitrate = int(bitrate)
+        self._ctx = None
+
+    def encode(self, img: np.ndarray):
+        """
+        BGR(HxWx3) 또는 흑백(HxW) 영상 1장 인코딩
+        Returns:
+            (data: bytes, keyframe: bool) — 출력이 없으면 (b"", False)
+        """
+        h, w = img.shape[:2]
+        # yuv420p는 짝수 해상도만 지원
+        if (w | h) & 1:
+            img = img[:h & ~1, :w & ~1]
+            h, w = img.shape[:2]
+        if self._ctx is None or self._size != (w, h):
+            self._open(w, h)
+
+        frame = av.VideoFrame.from_ndarray(img, format="gray" if img.ndim == 2 else "bgr24")
+        frame = frame.reformat(format="yuv420p")
+        frame.pts = self._count
+        if self._force_key or self._count % self.keyframe_interval == 0:
+            frame.pict_type = av.video.frame.PictureType.I
+            self._force_key = False
+        self._count += 1
+
+        packets = self._ctx.encode(frame)
+        if not packets:
+            return b"", False
+        keyframe = any(p.is_keyframe for p in packets)
+        data = b"".join(bytes(p) for p in packets)
+        return data, keyframe
+
+    def close(self):
+        if self._ctx is not None:
+            try:
+                self._ctx.encode(None)
+            except Exception:
+                pass
+            self._ctx = None
+
+
+class VideoDecoder:
+    """
+    H.264/HEVC access unit 디코더 (UdpImageReceiver용)
+    - 손실로 참조 프레임이 끊기면(mark_loss) 다음 keyframe까지 디코딩을 건너뜀
+    """
+    def __init__(self, codec_id=CODEC_H264, threads=0):
+        if not _USE_PYAV:
+            raise RuntimeError("PyAV 모듈이 없습니다. pip install av 후 사용하세요.")
+        self.codec_id = codec_id
+        self._ctx = av.CodecContext.create(_DECODERS[codec_id], "r")
+        self._ctx.thread_count = threads
+        self._ctx.options = {"flags": "low_delay"}
+        self.waiting_keyframe = True
+
+    def mark_loss(self):
+        self.waiting_keyframe = True
+
+    def decode(self, data: bytes, keyframe: bool):
+        """access unit 1개 디코딩 → BGR 영상 (keyframe 대기 중이거나 출력이 없으면 None)"""
+        if self.waiting_keyframe:
+            if not keyframe:
+                return None
+            self.waiting_keyframe = False
+        try:
+            frames = self._ctx.decode(av.Packet(data))
+        except av.error.FFmpegError:
+            self.waiting_keyframe = True
+            return None
+        if not frames:
+            return None
+        return frames[-1].to_ndarray(format="bgr24")
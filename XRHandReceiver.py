@@ -1,25 +1,156 @@
 from os import name
+import os
+import sys
+import logging
+import importlib.util
 import socket
 import struct
 import numpy as np
 import threading
 import time
 from collections import deque
-from scipy.spatial.transform import Rotation as R
+
+_STREAM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "StereoStream")
+
+
+def _stream_module(module):
+    """
+    StereoStream/<module>.py를 sys.path를 바꾸지 않고 파일 경로로 로드
+    - 같은 파일이 이미 import되어 있으면 그 모듈을 사용 → StereoStream 모듈들과 메트릭 레지스트리 공유
+    - 그 이름이 비어 있을 때만 sys.modules에 등록 (앱에 같은 이름의 다른 모듈이 있으면 건드리지 않음)
+    """
+    path = os.path.join(_STREAM_DIR, module + ".py")
+    mod = sys.modules.get(module)
+    if mod is not None and os.path.abspath(getattr(mod, "__file__", None) or "") == path:
+        return mod
+    register = mod is None
+    spec = importlib.util.spec_from_file_location(module if register else f"_xrhand_{module}", path)
+    mod = importlib.util.module_from_spec(spec)
+    if register:
+        sys.modules[module] = mod
+    try:
+        spec.loader.exec_module(mod)
+    except BaseException:
+        if register:
+            del sys.modules[module]
+        raise
+    return mod
+
+
+stream_metrics = _stream_module("stream_metrics")
+hand_codec = _stream_module("hand_codec")
+
+logger = logging.getLogger("XRHandReceiver")
+
+# v2 순번이 이만큼 넘게 되돌아가거나, 늦은 패킷이 이만큼 연속이면 송신 측 재시작으로 보고 순번을 다시 맞춤
+SEQ_RESYNC_DISTANCE = 1000
+SEQ_RESYNC_LATE = 8
+
+# scipy(Rotation)는 import만 0.2초 이상 걸리므로 update_hand처럼 실제로 필요한 곳에서만 불러옴
+R = None
+
+
+def _scipy_rotation():
+    global R
+    if R is None:
+        from scipy.spatial.transform import Rotation
+        R = Rotation
+    return R
+
+
+def quat_to_rotmat(q):
+    """쿼터니언 (x, y, z, w) → 3x3 회전 행렬 (scipy Rotation.from_quat(q).as_matrix()와 동일, 정규화 포함)"""
+    x, y, z, w = np.asarray(q, dtype=np.float64)
+    n = x * x + y * y + z * z + w * w
+    if n < 1e-12:
+        raise ValueError("Found zero norm quaternions in `quat`.")
+    s = 2.0 / n
+    xx, yy, zz = x * x * s, y * y * s, z * z * s
+    xy, xz, yz = x * y * s, x * z * s, y * z * s
+    wx, wy, wz = w * x * s, w * y * s, w * z * s
+    return np.array([
+        [1.0 - (yy + zz), xy - wz, xz + wy],
+        [xy + wz, 1.0 - (xx + zz), yz - wx],
+        [xz - wy, yz + wx, 1.0 - (xx + yy)],
+    ])
+
+
+class RateLimitedLogger:
+    """
+    같은 key의 로그를 interval초에 한 번만 출력 (사이에 생략한 횟수를 다음 출력에 표시)
+    - 생략 시에는 메시지 포맷팅 없이 dict 조회 + 시각 비교만 함 → 손이 추적을 벗어나 매 프레임 무효여도 부담 없음
+    - 계산이 드는 인자는 callable로 넘기면 실제로 출력할 때만 호출 (예: lambda: np.count_nonzero(mask))
+    """
+    def __init__(self, logger, interval=1.0):
+        self.logger = logger
+        self.interval = interval
+        self._state = {}  # key -> [마지막 출력 시각, 생략 횟수]
+
+    def log(self, level, key, msg, *args):
+        now = time.monotonic()
+        state = self._state.get(key)
+        if state is not None and now - state[0] < self.interval:
+            state[1] += 1
+            return False
+        if state is not None and state[1]:
+            msg += " (지난 %.1f초 동안 %d회 생략)"
+            args += (now - state[0], state[1])
+        self._state[key] = [now, 0]
+        self.logger.log(level, msg, *(a() if callable(a) else a for a in args))
+        return True
+
+    def warning(self, key, msg, *args):
+        return self.log(logging.WARNING, key, msg, *args)
+
+    def error(self, key, msg, *args):
+        return self.log(logging.ERROR, key, msg, *args)
+
 
 class XRHandReceiver:
+    """
+    헤드셋 손/헤드 pose UDP 수신기
+
+    - 생성만으로는 소켓/스레드를 만들지 않음: start()(또는 기존 connect())로 바인드 후 ping/수신 스레드 시작,
+      stop()으로 정지 → 수신 없이 parse/변환 함수만 쓰는 경우(EpisodeReader 등)에 부담 없음
+    - 좌표 변환은 NumPy만 사용하고 scipy는 update_hand에서 처음 사용할 때 import
+    - 패킷 형식은 v1(HND0, 1500 bytes)과 양자화된 v2(HND2, 546 bytes, StereoStream/hand_codec.py)를 자동 판별
+    - parse()는 관절별 유효성 플래그/마스크를 함께 반환하고, 경고는 logging("XRHandReceiver")으로 key별 초당 1회만 출력
+    """
     def __init__(self,
                  server_ip="192.168.0.133",
                  server_port=9001,
-                 buffer_size=1500):
+                 buffer_size=1500,
+                 headset_port=None):
         self.server_ip = server_ip
         self.server_port = server_port
+        # ping 대상 포트 (기본: 헤드셋도 server_port 사용, 같은 PC의 에뮬레이터처럼 포트가 다를 때만 지정)
+        self.headset_port = server_port if headset_port is None else headset_port
         self.buffer_size = buffer_size
         self.sock = None
         self.packet_queue = deque(maxlen=1)
+        self.on_packet = None  # 선택: 수신한 모든 패킷(bytes)마다 호출되는 콜백 (예: EpisodeRecorder.attach_hand)
         self.connected = False
         self._lock = threading.Lock()
 
+        # Prometheus 메트릭 (stream_metrics.start_http_server로 노출)
+        port = str(server_port)
+        self._m_packets = stream_metrics.counter("xrhand_packets_total", "수신한 UDP 패킷 수", port=port)
+        self._m_malformed = stream_metrics.counter("xrhand_malformed_packets_total", "크기/HND0·HND1 마커가 맞지 않는 패킷 수", port=port)
+        self._m_recv_errors = stream_metrics.counter("xrhand_receive_errors_total", "수신 소켓 오류 수 (시간 초과 제외)", port=port)
+        self._m_ping_errors = stream_metrics.counter("xrhand_ping_errors_total", "ping 전송 오류 수", port=port)
+        self._m_callback_errors = stream_metrics.counter("xrhand_callback_errors_total", "on_packet 콜백 예외 수", port=port)
+        self._m_latency = stream_metrics.histogram(
+            "xrhand_relative_latency_seconds",
+            "헤드셋 timestamp 대비 수신 지연 - 지금까지의 최소 지연 (시계 동기화 없이 지연 증가/지터 추적)", port=port)
+        self._m_interval = stream_metrics.histogram("xrhand_packet_interval_seconds", "패킷 수신 간격", port=port)
+        self._m_seq_gaps = stream_metrics.counter("xrhand_seq_gap_packets_total", "v2 순번 건너뜀으로 확인한 손실(또는 늦게 도착) 패킷 수", port=port)
+        self._m_out_of_order = stream_metrics.counter("xrhand_out_of_order_packets_total", "v2 순번이 이전 패킷보다 작은(늦게 도착한/중복) 패킷 수", port=port)
+        self._m_seq_resyncs = stream_metrics.counter("xrhand_seq_resyncs_total", "송신 측 재시작 등으로 v2 순번이 크게 되돌아가 다시 맞춘 횟수", port=port)
+        self._min_offset = None
+        self._last_rx = None
+        self._last_seq = None
+        self._late_run = 0  # 연속으로 늦게 도착한 v2 패킷 수
+
         self.RM_U2R = np.array([
             [0, 0, 1],
             [-1, 0, 0],
@@ -49,46 +180,121 @@ class XRHandReceiver:
         self.previous_pos_list = [];
         self.previous_quat_list = [];
 
-        # 쓰레드 시작
-        self._start_threads()
-
+        self._stop_event = threading.Event()
+        self._threads = []
+        self._log = RateLimitedLogger(logger)
+
+
+    def start(self):
+        """UDP 소켓 바인드 + ping/수신 쓰레드 시작 (이미 시작했으면 그대로) → self"""
+        if not self.connected:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024 * 1024)  # 1MB
+            self.sock.bind(("0.0.0.0", self.server_port))
+            self.sock.settimeout(1.0)
+            self.connected = True
+        if not self._threads:
+            self._stop_event.clear()
+            self._threads = [threading.Thread(target=self._ping_loop, daemon=True),
+                             threading.Thread(target=self._receiver_loop, daemon=True)]
+            for t in self._threads:
+                t.start()
+        return self
 
     def connect(self):
-        """UDP 소켓 연결 및 바인드"""
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024 * 1024)  # 1MB
-        self.sock.bind(("0.0.0.0", self.server_port))
-        self.sock.settimeout(1.0)
-        self.connected = True
-
-    def _start_threads(self):
-        """Ping 및 수신 쓰레드 실행"""
-        threading.Thread(target=self._ping_loop, daemon=True).start()
-        threading.Thread(target=self._receiver_loop, daemon=True).start()
+        """UDP 소켓 연결 및 바인드 (기존 코드 호환: start()와 같음)"""
+        self.start()
+
+    def stop(self):
+        """쓰레드 정지 후 소켓 닫기"""
+        self._stop_event.set()
+        self.connected = False
+        if self.sock is not None:
+            try:
+                # 자기 포트로 빈 패킷을 보내 recvfrom 대기(timeout 1초)를 바로 깨움
+                self.sock.sendto(b"", ("127.0.0.1", self.server_port))
+            except OSError:
+                pass
+        for t in self._threads:
+            t.join(timeout=2.0)
+        self._threads = []
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
 
     def _ping_loop(self):
-        while True:
-            if not self.connected:
-                time.sleep(0.5)
-                continue
+        while not self._stop_event.is_set():
             try:
-                self.sock.sendto(b"ping", (self.server_ip, self.server_port))
+                self.sock.sendto(b"ping", (self.server_ip, self.headset_port))
             except Exception:
-                pass
-            time.sleep(0.5)
+                self._m_ping_errors.inc()
+            self._stop_event.wait(0.5)
 
     def _receiver_loop(self):
-        while True:
-            if not self.connected:
-                time.sleep(0.1)
-                continue
+        while not self._stop_event.is_set():
             try:
                 data, _ = self.sock.recvfrom(8192)
-                with self._lock:
-                    self.packet_queue.clear()
-                    self.packet_queue.append(data)
+            except socket.timeout:
+                continue
             except Exception:
-                pass
+                self._m_recv_errors.inc()
+                time.sleep(0.01)  # 닫힌 소켓 등에서 빈 루프가 CPU를 점유하지 않도록
+                continue
+            if self._stop_event.is_set():
+                break
+            self._record_packet(data)
+            with self._lock:
+                self.packet_queue.clear()
+                self.packet_queue.append(data)
+            if self.on_packet is not None:
+                try:
+                    self.on_packet(data)
+                except Exception:
+                    self._m_callback_errors.inc()
+
+    def _record_packet(self, data):
+        """수신 패킷 메트릭 갱신 (수신 스레드)"""
+        now = time.time()
+        self._m_packets.inc()
+        if self._last_rx is not None:
+            self._m_interval.observe(now - self._last_rx)
+        self._last_rx = now
+        version = hand_codec.packet_version(data, v1_size=self.buffer_size)
+        if version == 0:
+            self._m_malformed.inc()
+            return
+        if version == 2:
+            self._track_seq(struct.unpack_from("<I", data, 4)[0])
+            offset = now - struct.unpack_from("<d", data, 8)[0]
+        else:
+            offset = now - struct.unpack_from("d", data, 4)[0]
+        if self._min_offset is None or offset < self._min_offset:
+            self._min_offset = offset
+        self._m_latency.observe(offset - self._min_offset)
+
+    def _track_seq(self, seq):
+        """
+        v2 순번으로 손실/순서 뒤바뀜 집계 (수신 스레드)
+        - 앞으로 건너뛴 순번만 손실로 셈 (패킷당 최대 1000)
+        - 이미 지난 순번(늦게 도착/중복)은 out_of_order로 따로 세고 _last_seq는 그대로 유지
+          (uint32 넘침은 앞쪽 거리 ahead가 작은 양수라 늦은 패킷으로 오인하지 않음)
+        - 송신 측 재시작으로 순번이 되돌아가면 이후 모든 패킷이 "늦은" 패킷이 되므로, 뒤로 SEQ_RESYNC_DISTANCE
+          넘게 되돌아가거나 늦은 패킷이 SEQ_RESYNC_LATE개 연속이면 그 순번으로 다시 맞춤 (seq_resyncs 집계)
+        """
+        ahead = 1 if self._last_seq is None else (seq - self._last_seq) & 0xFFFFFFFF
+        if ahead == 0 or ahead >= 0x80000000:
+            self._late_run += 1
+            if (0x100000000 - ahead) & 0xFFFFFFFF > SEQ_RESYNC_DISTANCE or self._late_run >= SEQ_RESYNC_LATE:
+                self._m_seq_resyncs.inc()
+                self._last_seq = seq
+                self._late_run = 0
+            else:
+                self._m_out_of_order.inc()
+            return
+        self._late_run = 0
+        if ahead > 1:
+            self._m_seq_gaps.inc(min(ahead - 1, 1000))
+        self._last_seq = seq
 
     def get(self):
         """가장 최근의 패킷 반환 (없으면 None)"""
@@ -99,15 +305,14 @@ class XRHandReceiver:
         """
         Unity 좌표계 기준의 위치와 쿼터니언을
         로봇 좌표계 기준으로 변환
+        - 영/NaN 쿼터니언이면 회전 행렬은 NaN (예외 없음, 경고는 초당 1회)
         """
         pos_robot = self.RM_U2R @ position
-        if np.linalg.norm(position) < 1e-6:
-            print("Warning: Zero position vector received. position={}".format(position))
-        if np.linalg.norm(quaternion) < 1e-6:
-            print("Warning: Zero quaternion vector received. quaternion={}".format(quaternion))
-
-        rot_unity = R.from_quat(quaternion)
-        rot_robot = self.RM_U2R @ rot_unity.as_matrix() @ self.RM_U2R.T
+        n = float(np.dot(quaternion, quaternion))
+        if not n >= 1e-12:
+            self._log.warning("zero_quat", "Zero quaternion vector received. quaternion=%s", quaternion)
+            return pos_robot, np.full((3, 3), np.nan)
+        rot_robot = self.RM_U2R @ quat_to_rotmat(quaternion) @ self.RM_U2R.T
         return pos_robot, rot_robot
     
     def get_finger_robotTM_by_parsed(self, parsed:dict, parts_name= "left" ,bone_name = "thumb", index=0):
@@ -119,13 +324,13 @@ class XRHandReceiver:
         data_length = 7;# pos(3) + quat(4)
         
         if not (parts_name == "left" or parts_name == "right"):
-            print("Error: parts_name should be 'left' or 'right'");
+            self._log.error("parts_name", "parts_name should be 'left' or 'right' (got %r)", parts_name)
             return None;
         if bone_name not in self.bone_indexs:
-            print("Error: bone_name should be one of ", list(self.bone_indexs.keys()));
+            self._log.error("bone_name", "bone_name should be one of %s (got %r)", lambda: list(self.bone_indexs.keys()), bone_name)
             return None;
         if  index >= len(self.bone_indexs[bone_name]):
-            print("Error: index out of range for bone ", bone_name);
+            self._log.error("bone_index", "index %d out of range for bone %s", index, bone_name)
             return None;
             
         bone_idx = self.bone_indexs[bone_name][index];
@@ -154,11 +359,22 @@ class XRHandReceiver:
         return head_TM
 
     def parse(self, data):
-        """HND0/HND1 검증 및 구조 파싱 + 로봇 좌표계 변환 포함"""
-        if data is None or len(data) != self.buffer_size or data[:4] != b"HND0" or data[-4:] != b"HND1":
+        """
+        v1(HND0/HND1) / v2(HND2) 판별 및 구조 파싱 + 로봇 좌표계 변환 포함 (v2는 "seq" 포함)
+        - "flags": 관절 53개(왼손 26, 오른손 26, 헤드 1) uint8 플래그 (hand_codec.FLAG_*, 0이면 정상)
+        - "left_valid"/"right_valid" (26,) bool, "head_valid" bool, "left_tracked"/"right_tracked" (손목 유효 여부)
+          → 무효 관절은 건너뛰거나 이전 값을 유지하면 됨 (손목/헤드가 무효면 *_robot의 pos/rotmat에 NaN이 있을 수 있음)
+        """
+        decoded = hand_codec.decode_packet(data, v1_size=self.buffer_size)
+        if decoded is None:
             return None
-        ts = struct.unpack("d", data[4:12])[0]
-        arr = np.frombuffer(data[12:-4], dtype=np.float32)
+        ts, arr, seq = decoded
+        flags = hand_codec.validate_poses(arr)
+        valid = flags == 0
+        if not valid.all():
+            self._log.warning("invalid_poses", "무효 관절 %d/%d개 %s (left_tracked=%s, right_tracked=%s)",
+                              lambda: np.count_nonzero(~valid), len(valid), lambda: hand_codec.describe_flags(flags),
+                              lambda: bool(valid[hand_codec.WRIST_LEFT]), lambda: bool(valid[hand_codec.WRIST_RIGHT]))
         arr_l = arr[:182]
         arr_r = arr[182:-7]
         arr_h = arr[-7:]
@@ -177,6 +393,13 @@ class XRHandReceiver:
 
         return {
             "timestamp": ts,
+            "seq": seq,
+            "flags": flags,
+            "left_valid": valid[:26],
+            "right_valid": valid[26:52],
+            "head_valid": bool(valid[52]),
+            "left_tracked": bool(valid[hand_codec.WRIST_LEFT]),
+            "right_tracked": bool(valid[hand_codec.WRIST_RIGHT]),
             "left_raw": arr_l,
             "right_raw": arr_r,
             "head_raw": arr_h,
@@ -208,6 +431,7 @@ class XRHandReceiver:
         Returns:
             np.ndarray: 관절 각도 벡터 (라디안 단위, 1D 배열)
             np.ndarray: 정규화된 관절 각도 벡터 (0~1 범위)
+            (parse() 결과에서 해당 손이 추적되지 않으면(*_tracked=False) 계산 없이 둘 다 NaN)
         -------------------------------------------------------------------------
         
         Description of RH56F1 mapping:
@@ -265,6 +489,10 @@ class XRHandReceiver:
             return angle
         
 
+        if parsed.get(hand_type + "_tracked") is False:
+            nan = np.full(6, np.nan)
+            return nan, nan.copy()
+
         Thumb1_idx = 1
         Thumb3_idx = 3
         Index4_idx  = 4
@@ -322,6 +550,7 @@ class XRHandReceiver:
     #TODO:JWL2000
     def update_hand(self, raw_data, type="rel"):
         root_pos = raw_data[0:3]
+        R = _scipy_rotation()
         root_rot = R.from_quat((raw_data[3:7]))
 
         points_unity = [root_pos]
@@ -362,4 +591,57 @@ class XRHandReceiver:
         ring_points = points[17:21]
         points = np.vstack([index_points, middle_points, ring_points, thumb_points]) 
         # ============================CUSTOM=============================  
-        return p_EE_w, points
\ No newline at end of file
+        return p_EE_w, points
+
+if __name__ == "__main__":
+    # 헤드리스(수신기만) 사용 시 cold start 측정: python -X importtime으로 import 비용 + 생성/start 시간
+    import argparse
+    import subprocess
+
+    parser = argparse.ArgumentParser(description="XRHandReceiver cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=19001)
+    parser.add_argument("--top", type=int, default=8, help="cumulative 기준 상위 모듈 출력 개수")
+    args = parser.parse_args()
+
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    def importtime(stmt):
+        """새 인터프리터에서 stmt 실행 → {모듈: cumulative us}"""
+        out = subprocess.run([sys.executable, "-X", "importtime", "-c", stmt],
+                             cwd=here, capture_output=True, text=True, check=True)
+        cumulative = {}
+        for line in out.stderr.splitlines():
+            if not line.startswith("import time:") or "cumulative" in line:
+                continue
+            _, cum, module = line[len("import time:"):].split("|")
+            module = module.strip()
+            cumulative[module] = max(cumulative.get(module, 0), int(cum))
+        return cumulative
+
+    for stmt, target in (("import XRHandReceiver", "XRHandReceiver"),
+                         ("import XRHandVisualizer", "XRHandVisualizer")):
+        totals = []
+        for _ in range(args.runs):
+            cum = importtime(stmt)
+            totals.append(cum.get(target, 0))
+        heavy = [m for m in ("scipy", "PyQt5", "pyqtgraph", "http.server") if m in cum]
+        print(f"[import] {stmt}: 중앙값 {np.median(totals) / 1000:.1f} ms "
+              f"(최소 {min(totals) / 1000:.1f} ms), 무거운 모듈 로드: {heavy or '없음'}")
+        top = sorted(((v, k) for k, v in cum.items() if k != target and "." not in k), reverse=True)[:args.top]
+        print("         상위: " + ", ".join(f"{k} {v / 1000:.1f} ms" for v, k in top))
+
+    # 프로세스 시작 → import → 생성 → start() 까지 (인터프리터 자체 기동 포함)
+    stmt = ("import time; t0 = time.perf_counter(); from XRHandReceiver import XRHandReceiver; "
+            "t1 = time.perf_counter(); r = XRHandReceiver(server_ip='127.0.0.1', server_port=%d).start(); "
+            "t2 = time.perf_counter(); r.stop(); print(t1 - t0, t2 - t1)" % args.port)
+    walls, imports, starts = [], [], []
+    for _ in range(args.runs):
+        t0 = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", stmt], cwd=here, capture_output=True, text=True, check=True)
+        walls.append(time.perf_counter() - t0)
+        t_imp, t_start = map(float, out.stdout.split())
+        imports.append(t_imp)
+        starts.append(t_start)
+    print(f"[cold start] 프로세스 전체 {np.median(walls) * 1000:.1f} ms | import {np.median(imports) * 1000:.1f} ms "
+          f"| 생성+start() {np.median(starts) * 1000:.2f} ms (중앙값, {args.runs}회)")